@@ -0,0 +1,284 @@
+"""Analog-storm search: the historical storms most similar to a partial track
+
+Every storm of a catalog is resampled once onto a regular 6-hour grid from
+its first fix, and its latitude, longitude, pressure and wind are
+normalized by the catalog-wide mean and spread into a signature. A query
+(the current storm so far) is compared with the same-length start of every
+signature that lasted at least as long:
+
+    euclidean  the resampled points are compared step by step
+    dtw        dynamic time warping within a Sakoe-Chiba band of a few steps
+
+Euclidean distances of all candidates take one vectorized pass. For DTW,
+an LB_Keogh lower bound against the query envelope orders the candidates
+and prunes every one whose bound exceeds the k-th best distance found so
+far; the survivors are warped in batches, vectorized across storms.
+Distances are root mean squares per step in units of catalog spread.
+
+Usage:
+    python analogs.py --catalog ibtracs.csv --storm HAIYAN --fixes 12 --count 5
+"""
+import argparse
+
+import numpy as np
+
+from track_store import TrackStore, elapsed_minutes
+
+SIGNATURE_CHANNELS = ("lat", "lng", "pressure", "wind")
+
+# Resampling interval and length of the signatures (64 steps = 16 days)
+SIGNATURE_STEP_MINUTES = 360
+MAX_SIGNATURE_STEPS = 64
+
+# Relative weight of each channel after normalization
+DEFAULT_WEIGHTS = (1.0, 1.0, 1.0, 1.0)
+
+DEFAULT_ANALOGS = 5
+
+# Sakoe-Chiba band half-width of DTW, in signature steps
+DEFAULT_WINDOW = 2
+
+# Candidates warped per vectorized DTW pass
+DTW_BATCH = 512
+
+SEARCH_METHODS = ("dtw", "euclidean")
+
+
+def resample(time, columns, offsets, step_minutes=SIGNATURE_STEP_MINUTES, max_steps=MAX_SIGNATURE_STEPS):
+    """Columns of every storm linearly interpolated onto a regular grid from its first fix
+
+    time and columns hold the concatenated fixes of the storms delimited by
+    offsets. Storms with missing times are assumed to be evenly spaced by
+    step_minutes. Returns (values, n_steps): values has shape
+    (n_storms, max_steps, n_columns) and is NaN after the n_steps grid
+    points of each storm.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    starts = offsets[:-1]
+    n_storms = len(lengths)
+    elapsed, duration = elapsed_minutes(time, offsets, step_minutes)
+    n_steps = np.where(lengths > 0, np.minimum(duration // step_minutes + 1, max_steps), 0)
+
+    # One searchsorted over per-storm bands of keys finds the fix before every grid point
+    span = int(duration.max(initial=0)) + 1
+    keys = np.repeat(np.arange(n_storms), lengths) * span + elapsed
+    grid_rank = np.repeat(np.arange(n_storms), n_steps)
+    k = np.arange(int(n_steps.sum())) - np.repeat(np.cumsum(n_steps) - n_steps, n_steps)
+    offset = k * step_minutes
+    row = np.searchsorted(keys, grid_rank * span + offset, side="right") - 1
+    following = np.minimum(row + 1, (starts + lengths - 1)[grid_rank])
+    interval = (elapsed[following] - elapsed[row]).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(interval > 0, (offset - elapsed[row]) / interval, 0.0)
+
+    values = np.full((n_storms, max_steps, len(columns)), np.nan, dtype=np.float32)
+    for c, column in enumerate(columns):
+        column = np.asarray(column, dtype=np.float64)
+        values[grid_rank, k, c] = column[row] + (column[following] - column[row]) * fraction
+    return values, n_steps
+
+
+def query_envelope(query, window):
+    """Upper and lower envelope of query within window steps, per channel"""
+    padded = np.pad(query, ((window, window), (0, 0)), mode="edge")
+    windows = np.lib.stride_tricks.sliding_window_view(padded, 2 * window + 1, axis=0)
+    return windows.max(axis=-1), windows.min(axis=-1)
+
+
+def lb_keogh(candidates, upper, lower):
+    """LB_Keogh lower bound of the squared DTW cost of every candidate signature"""
+    above = np.maximum(candidates - upper, 0)
+    below = np.maximum(lower - candidates, 0)
+    return (above * above + below * below).sum(axis=(1, 2))
+
+
+def dtw_cost(candidates, query, window):
+    """Squared DTW cost of each candidate against query within a Sakoe-Chiba band
+
+    candidates has shape (n, m, channels) and query (m, channels). The band
+    is stored diagonal-relative: column o of row i is candidate step
+    i + o - window, so the recurrence runs over m * (2 * window + 1) cells,
+    each vectorized across the candidates.
+    """
+    n, m, _ = candidates.shape
+    width = 2 * window + 1
+    j = np.arange(m)[:, None] + np.arange(width)[None, :] - window
+    valid = (j >= 0) & (j < m)
+    diff = candidates[:, np.clip(j, 0, m - 1)] - query[None, :, None, :]
+    cost = np.where(valid, (diff * diff).sum(axis=-1), np.inf)
+
+    previous = np.full((width, n), np.inf)
+    current = np.full((width, n), np.inf)
+    for i in range(m):
+        for o in range(width):
+            if not valid[i, o]:
+                current[o] = np.inf
+                continue
+            if i == 0 and o == window:
+                best = 0.0
+            else:
+                best = previous[o]
+                if o + 1 < width:
+                    best = np.minimum(best, previous[o + 1])
+                if o > 0:
+                    best = np.minimum(best, current[o - 1])
+            current[o] = cost[:, i, o] + best
+        previous, current = current, previous
+    return previous[window]
+
+
+class AnalogMatches:
+    """Storms found by AnalogIndex.search, from the most similar"""
+    def __init__(self, indices, names, distances, method, steps, candidates, compared):
+        self.indices = indices
+        self.names = names
+        self.distances = distances
+        self.method = method
+        # Query length in signature steps, storms long enough to compare and
+        # storms whose full distance was computed
+        self.steps = steps
+        self.candidates = candidates
+        self.compared = compared
+
+    def __len__(self):
+        return len(self.indices)
+
+    def __iter__(self):
+        return iter(zip(self.names, self.distances.tolist()))
+
+
+class AnalogIndex:
+    """Normalized fixed-interval signatures of every storm of a TrackStore"""
+    def __init__(self, store, weights=DEFAULT_WEIGHTS, step_minutes=SIGNATURE_STEP_MINUTES,
+                 max_steps=MAX_SIGNATURE_STEPS):
+        self.store = store
+        self.step_minutes = step_minutes
+        self.max_steps = max_steps
+        values, self.n_steps = resample(store.time, self.columns(store.lat, store.lng, store.pressure, store.wind),
+                                        store.offsets, step_minutes, max_steps)
+
+        # Channels scaled to unit spread, then weighted; gaps count as the catalog mean
+        self.mean = np.nanmean(values, axis=(0, 1))
+        spread = np.nanstd(values, axis=(0, 1))
+        self.scale = np.asarray(weights, dtype=np.float32) / np.where(spread > 0, spread, 1.0)
+        self.signatures = np.nan_to_num((values - self.mean) * self.scale).astype(np.float32)
+
+    @classmethod
+    def for_store(cls, store):
+        """Index of store, built once and cached alongside its arrays"""
+        index = store.derived.get("analogs")
+        if index is None:
+            index = store.derived["analogs"] = cls(store)
+        return index
+
+    @staticmethod
+    def columns(lat, lng, pressure, wind):
+        return (lat, np.asarray(lng, dtype=np.float64) % 360.0, pressure, wind)
+
+    def query_signature(self, lats, lngs, pressures, winds, times=None):
+        """Signature of a partial track; fixes without times are taken as 6-hourly"""
+        if times is None:
+            times = np.full(len(lats), np.datetime64("NaT"), dtype="datetime64[m]")
+        values, n_steps = resample(np.asarray(times), self.columns(lats, lngs, pressures, winds),
+                                   [0, len(lats)], self.step_minutes, self.max_steps)
+        return np.nan_to_num((values[0, :n_steps[0]] - self.mean) * self.scale).astype(np.float32)
+
+    def search(self, query, count=DEFAULT_ANALOGS, method="dtw", window=DEFAULT_WINDOW, exclude=None):
+        """The count storms closest to a query signature
+
+        Queries longer than the signatures are compared over their first
+        max_steps steps. exclude is a storm index (e.g. the query storm
+        itself) or a sequence of them.
+        """
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"Unknown analog search method: {method}")
+        query = np.asarray(query, dtype=np.float32)[:self.max_steps]
+        m = len(query)
+        candidates = np.flatnonzero(self.n_steps >= max(m, 1))
+        if exclude is not None:
+            candidates = np.setdiff1d(candidates, np.atleast_1d(exclude))
+        count = min(count, len(candidates))
+        if m == 0 or count == 0:
+            return self._matches(candidates[:0], np.empty(0), method, m, len(candidates), 0)
+
+        signatures = self.signatures[candidates, :m]
+        diff = signatures - query
+        euclidean = (diff * diff).sum(axis=(1, 2))
+        if method == "euclidean" or m == 1:
+            best = np.argpartition(euclidean, count - 1)[:count]
+            return self._matches(candidates[best], euclidean[best], method, m, len(candidates),
+                                 len(candidates))
+
+        # DTW never exceeds the Euclidean cost (the diagonal lies in the band),
+        # so the k-th smallest Euclidean cost bounds the k-th best DTW cost
+        window = min(window, m - 1)
+        threshold = np.partition(euclidean, count - 1)[count - 1]
+        upper, lower = query_envelope(query, window)
+        bound = lb_keogh(signatures, upper, lower)
+        order = np.flatnonzero(bound <= threshold)
+        order = order[np.argsort(bound[order], kind="stable")]
+
+        best = np.empty(0, dtype=np.int64)
+        best_cost = np.empty(0)
+        compared = 0
+        for start in range(0, len(order), DTW_BATCH):
+            batch = order[start:start + DTW_BATCH]
+            batch = batch[bound[batch] <= threshold]
+            if not len(batch):
+                break
+            cost = dtw_cost(signatures[batch], query, window)
+            compared += len(batch)
+            best = np.concatenate([best, batch])
+            best_cost = np.concatenate([best_cost, cost])
+            if len(best) > count:
+                keep = np.argpartition(best_cost, count - 1)[:count]
+                best, best_cost = best[keep], best_cost[keep]
+            if len(best) == count:
+                threshold = min(threshold, best_cost.max())
+        return self._matches(candidates[best], best_cost, method, m, len(candidates), compared)
+
+    def _matches(self, indices, cost, method, steps, candidates, compared):
+        order = np.argsort(cost, kind="stable")
+        indices = indices[order]
+        distances = np.sqrt(np.asarray(cost, dtype=np.float64)[order] / max(steps, 1))
+        return AnalogMatches(indices, [self.store.names[i] for i in indices], distances, method, steps,
+                             candidates, compared)
+
+    def storm_analogs(self, storm, fixes=None, count=DEFAULT_ANALOGS, method="dtw", window=DEFAULT_WINDOW):
+        """Analogs of the first fixes of a catalog storm (name or index), excluding itself"""
+        index = self.store.name_index[storm] if isinstance(storm, str) else int(storm)
+        track = self.store.storm(index)
+        end = len(track) if fixes is None else fixes
+        query = self.query_signature(track.lat[:end], track.lng[:end], track.pressure[:end], track.wind[:end],
+                                     track.time[:end])
+        return self.search(query, count, method, window, exclude=index)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Historical storms most similar to a storm's first fixes")
+    parser.add_argument("--catalog", help="best-track file (default: the sample storms)")
+    parser.add_argument("--format", help="catalog format (detected from the file when omitted)")
+    parser.add_argument("--storm", required=True, help="storm to find analogs of")
+    parser.add_argument("--fixes", type=int, help="compare only the first FIXES fixes (default: all)")
+    parser.add_argument("--count", type=int, default=DEFAULT_ANALOGS, help="analogs to list")
+    parser.add_argument("--method", choices=SEARCH_METHODS, default="dtw")
+    parser.add_argument("--window", type=int, default=DEFAULT_WINDOW, help="DTW band half-width in 6-hour steps")
+    args = parser.parse_args(argv)
+
+    if args.catalog:
+        import best_track
+        store = best_track.open_catalog(args.catalog, fmt=args.format)
+    else:
+        from core import SAMPLE_TYPHOONS
+        store = TrackStore.from_typhoon_data(SAMPLE_TYPHOONS)
+    matches = AnalogIndex.for_store(store).storm_analogs(args.storm, args.fixes, args.count, args.method,
+                                                         args.window)
+    print(f"Analogs of {args.storm} over {matches.steps} steps ({matches.method}, "
+          f"{matches.compared} of {matches.candidates} storms compared in full):")
+    for name, distance in matches:
+        print(f"  {name:<24} {distance:.3f}")
+
+
+if __name__ == "__main__":
+    main()
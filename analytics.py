@@ -0,0 +1,383 @@
+"""Intensity events and statistics of every storm of a catalog
+
+One vectorized pass over the columnar fixes of a range of storms finds
+
+    rapid intensification / weakening  wind change over the next 24 hours of
+                                       at least RAPID_CHANGE_KMH (30 kt)
+    past 24-hour wind change           what is known at each fix, for playback
+    lifetime maximum intensity         peak wind, lowest pressure and when
+    hours in each intensity category   each fix counts until the next one
+    pressure-wind outliers             fixes far off the catalog's
+                                       wind-pressure relationship
+
+The wind 24 hours after and before each fix is interpolated with one
+searchsorted over per-storm bands of elapsed minutes. The wind-pressure relationship is the
+least-squares fit of log(wind) against log(P_ENVIRONMENT - pressure) over
+the whole catalog, combined from per-chunk moments. Large catalogs are
+processed in storm chunks by a process pool, like swath.grid_catalog.
+
+Usage:
+    python analytics.py --catalog ibtracs.csv --output stats.npz
+"""
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from track_store import INTENSITY_LEVELS, TrackStore, elapsed_minutes, storm_chunks
+
+# Wind change over RAPID_CHANGE_HOURS that counts as rapid intensification or weakening
+RAPID_CHANGE_KMH = 55.6
+RAPID_CHANGE_HOURS = 24
+
+# Ambient pressure (hPa) of the wind-pressure relationship
+P_ENVIRONMENT = 1010.0
+
+# Residual of a pressure-wind outlier, in standard deviations of the fit
+OUTLIER_SIGMA = 3.0
+
+# Fixes per chunk; one chunk takes well under a second, so catalogs smaller
+# than this are processed in this process
+DEFAULT_CHUNK_FIXES = 1000000
+
+# Spacing assumed for storms without fix times
+DEFAULT_STEP_MINUTES = 360
+
+_worker = None
+
+
+def _segment_max(values, starts, lengths):
+    """Per-storm nanmax and the row where it is reached first (-1 for no valid value)"""
+    filled = np.where(np.isnan(values), -np.inf, values)
+    nonempty = lengths > 0
+    peak = np.full(len(lengths), -np.inf)
+    if nonempty.any():
+        peak[nonempty] = np.maximum.reduceat(filled, starts[nonempty])
+    reached = (filled == np.repeat(peak, lengths)) & np.isfinite(filled)
+    rows = np.where(reached, np.arange(len(values)), len(values))
+    first = np.full(len(lengths), len(values))
+    if nonempty.any():
+        first[nonempty] = np.minimum.reduceat(rows, starts[nonempty])
+    peak[~np.isfinite(peak)] = np.nan
+    return peak, np.where(first < len(values), first, -1)
+
+
+def _runs(flags, rank, n_storms):
+    """Number of runs of consecutive True flags within each storm"""
+    begins = flags.copy()
+    begins[1:] &= ~(flags[:-1] & (rank[1:] == rank[:-1]))
+    return np.bincount(rank[begins], minlength=n_storms)
+
+
+def _wind_shifted(wind, keys, elapsed, last, minutes):
+    """Wind interpolated minutes after each fix (before it when negative) and its fractional row
+
+    keys are the banded elapsed minutes; the caller masks fixes whose shifted
+    time falls outside their storm.
+    """
+    row = np.searchsorted(keys, keys + minutes, side="right") - 1
+    following = np.minimum(row + 1, last)
+    interval = (elapsed[following] - elapsed[row]).astype(np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        fraction = np.where(interval > 0, (elapsed + minutes - elapsed[row]) / interval, 0.0)
+    return wind[row] + (wind[following] - wind[row]) * fraction, row + fraction
+
+
+def wind_pressure_moments(pressure, wind):
+    """Sums of the log-log wind-pressure fit over the valid fixes"""
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x = np.log(P_ENVIRONMENT - np.asarray(pressure, dtype=np.float64))
+        y = np.log(np.asarray(wind, dtype=np.float64))
+    valid = np.isfinite(x) & np.isfinite(y)
+    x, y = x[valid], y[valid]
+    return np.array([len(x), x.sum(), y.sum(), (x * x).sum(), (x * y).sum(), (y * y).sum()])
+
+
+def fit_wind_pressure(moments):
+    """(intercept, slope, residual sd) of log(wind) = a + b * log(P_ENVIRONMENT - pressure)"""
+    n, sx, sy, sxx, sxy, syy = moments
+    denominator = n * sxx - sx * sx
+    if n < 3 or denominator <= 0:
+        return np.nan, np.nan, np.nan
+    b = (n * sxy - sx * sy) / denominator
+    a = (sy - b * sx) / n
+    residual = syy - 2 * a * sy - 2 * b * sxy + n * a * a + 2 * a * b * sx + b * b * sxx
+    return a, b, float(np.sqrt(max(residual, 0.0) / (n - 2)))
+
+
+def storm_statistics(store, first=0, stop=None):
+    """Events and statistics of storms first:stop, as a dict of per-storm and per-fix arrays
+
+    Rows of the per-fix arrays are relative to the first fix of storm first.
+    """
+    stop = len(store.offsets) - 1 if stop is None else stop
+    offsets = store.offsets[first:stop + 1] - store.offsets[first]
+    rows = slice(int(store.offsets[first]), int(store.offsets[stop]))
+    wind = np.asarray(store.wind[rows], dtype=np.float64)
+    pressure = np.asarray(store.pressure[rows], dtype=np.float64)
+    codes = np.asarray(store.intensity[rows], dtype=np.int64)
+    lengths = np.diff(offsets)
+    starts = offsets[:-1]
+    n_storms = len(lengths)
+    n_rows = len(wind)
+    rank = np.repeat(np.arange(n_storms), lengths)
+    last = np.repeat(starts + lengths - 1, lengths)
+    elapsed, duration = elapsed_minutes(store.time[rows], offsets, DEFAULT_STEP_MINUTES)
+
+    # Wind RAPID_CHANGE_HOURS after and before each fix, interpolated between the fixes around it
+    window = RAPID_CHANGE_HOURS * 60
+    span = int(duration.max(initial=0)) + window + 1
+    keys = rank * span + elapsed
+    inside = elapsed + window <= duration[rank]
+    wind_later, row_later = _wind_shifted(wind, keys, elapsed, last, window)
+    change = np.where(inside, wind_later - wind, np.nan)
+    # Fractional position of the fix RAPID_CHANGE_HOURS later within the storm, for the profiles
+    step_later = np.where(inside, row_later - np.repeat(starts, lengths), np.nan)
+    wind_earlier, _ = _wind_shifted(wind, keys, elapsed, last, -window)
+    past_change = np.where(elapsed >= window, wind - wind_earlier, np.nan)
+
+    with np.errstate(invalid="ignore"):
+        intensifying = change >= RAPID_CHANGE_KMH
+        weakening = change <= -RAPID_CHANGE_KMH
+    # Strongest 24-hour intensification and weakening, both as positive km/h
+    max_change, _ = _segment_max(change, starts, lengths)
+    min_change, _ = _segment_max(-change, starts, lengths)
+
+    peak_wind, peak_row = _segment_max(wind, starts, lengths)
+    lowest_pressure, _ = _segment_max(-pressure, starts, lengths)
+    peak_code = np.full(n_storms, -1)
+    peak_code[peak_row >= 0] = codes[peak_row[peak_row >= 0]]
+
+    # Each fix counts towards its category until the next fix of the storm
+    hours = np.zeros(n_rows)
+    hours[:-1] = np.diff(elapsed) / 60.0
+    hours[last == np.arange(n_rows)] = 0.0
+    category_hours = np.bincount(rank * len(INTENSITY_LEVELS) + codes, weights=hours,
+                                 minlength=n_storms * len(INTENSITY_LEVELS)).reshape(n_storms, -1)
+
+    return {
+        "wind_change_24h": change,
+        "step_24h": step_later,
+        "wind_change_past_24h": past_change,
+        "rapid_intensification": intensifying,
+        "rapid_weakening": weakening,
+        "ri_events": _runs(intensifying, rank, n_storms),
+        "rw_events": _runs(weakening, rank, n_storms),
+        "max_intensification": max_change,
+        "max_weakening": min_change,
+        "lmi_wind": peak_wind,
+        "lmi_pressure": -lowest_pressure,
+        "lmi_row": np.where(peak_row >= 0, peak_row - starts, -1),
+        "lmi_code": peak_code,
+        "duration_hours": duration / 60.0,
+        "category_hours": category_hours,
+        "moments": wind_pressure_moments(pressure, wind),
+    }
+
+
+def _init_worker(catalog, catalog_format, store):
+    """Open the catalog (memory-mapped from its cache) once per worker process"""
+    global _worker
+    if store is None:
+        import best_track
+        store = best_track.open_catalog(catalog, fmt=catalog_format)
+    _worker = store
+
+
+def _statistics_chunk(first, stop):
+    return storm_statistics(_worker, first, stop)
+
+
+class CatalogStats:
+    """Intensity events and statistics of every storm and fix of a store"""
+    PER_FIX = ("wind_change_24h", "step_24h", "wind_change_past_24h", "rapid_intensification",
+               "rapid_weakening", "pressure_wind_residual", "pressure_wind_outlier")
+    PER_STORM = ("ri_events", "rw_events", "max_intensification", "max_weakening", "lmi_wind", "lmi_pressure",
+                 "lmi_row", "lmi_code", "duration_hours", "category_hours", "outliers")
+
+    def __init__(self, names, offsets, fit, **columns):
+        self.names = names
+        self.offsets = offsets
+        # (intercept, slope, residual sd) of the catalog wind-pressure fit
+        self.fit = fit
+        for name in self.PER_FIX + self.PER_STORM:
+            setattr(self, name, columns[name])
+
+    @classmethod
+    def compute(cls, store=None, catalog=None, catalog_format=None, workers=None,
+                chunk_fixes=DEFAULT_CHUNK_FIXES):
+        """Statistics of a store or catalog path, in parallel storm chunks
+
+        With a path every worker memory-maps the parsed cache instead of
+        receiving the arrays. workers=1 computes in this process.
+        """
+        if store is None:
+            import best_track
+            store = best_track.open_catalog(catalog, fmt=catalog_format)
+        chunks = storm_chunks(store.offsets, chunk_fixes)
+        workers = workers or os.cpu_count() or 1
+        if workers == 1 or len(chunks) <= 1:
+            parts = [storm_statistics(store, first, stop) for first, stop in chunks]
+        else:
+            shipped = None if catalog else TrackStore(store.names, store.offsets, store.lat, store.lng,
+                                                      store.pressure, store.wind, store.intensity,
+                                                      store.timestamp, store.time)
+            with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                     initargs=(catalog, catalog_format, shipped)) as pool:
+                parts = list(pool.map(_statistics_chunk, *zip(*chunks)))
+        return cls.combine(store, parts)
+
+    @classmethod
+    def combine(cls, store, parts):
+        """Join chunk results in storm order and flag pressure-wind outliers"""
+        if parts:
+            columns = {name: np.concatenate([part[name] for part in parts])
+                       for name in parts[0] if name != "moments"}
+            moments = np.sum([part["moments"] for part in parts], axis=0)
+        else:
+            columns = storm_statistics(store)
+            moments = columns.pop("moments")
+        a, b, sd = fit_wind_pressure(moments)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            residual = (np.log(np.asarray(store.wind, dtype=np.float64))
+                        - a - b * np.log(P_ENVIRONMENT - np.asarray(store.pressure, dtype=np.float64)))
+            residual[~np.isfinite(residual)] = np.nan
+            outlier = np.abs(residual) > OUTLIER_SIGMA * sd
+        columns["pressure_wind_residual"] = residual
+        columns["pressure_wind_outlier"] = outlier
+        lengths = np.diff(store.offsets)
+        columns["outliers"] = np.bincount(np.repeat(np.arange(len(lengths)), lengths), weights=outlier,
+                                          minlength=len(lengths)).astype(np.int64)
+        return cls(store.names, store.offsets, (a, b, sd), **columns)
+
+    @classmethod
+    def for_store(cls, store):
+        """Statistics of store, computed once in this process and cached alongside its arrays"""
+        stats = store.derived.get("analytics")
+        if stats is None:
+            stats = store.derived["analytics"] = cls.compute(store, workers=1)
+        return stats
+
+    def storm(self, track):
+        """StormStats of one StormTrack (or LiveTrack) of the store"""
+        part = slice(track.start, track.stop)
+        return StormStats(track.index, wind=track.wind, pressure=track.pressure, intensity=track.intensity,
+                          **{name: getattr(self, name)[part] for name in self.PER_FIX},
+                          **{name: getattr(self, name)[track.index] for name in self.PER_STORM})
+
+    def category_totals(self):
+        """Hours spent in each intensity category over the whole catalog"""
+        return dict(zip(INTENSITY_LEVELS, self.category_hours.sum(axis=0).tolist()))
+
+    def save(self, path):
+        np.savez_compressed(path, names=np.asarray(self.names), offsets=self.offsets, fit=np.asarray(self.fit),
+                            **{name: getattr(self, name) for name in self.PER_FIX + self.PER_STORM})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            columns = {name: data[name] for name in cls.PER_FIX + cls.PER_STORM}
+            return cls(data["names"].tolist(), data["offsets"], tuple(data["fit"].tolist()), **columns)
+
+
+class StormStats:
+    """Events and statistics of one storm; per-fix arrays are views"""
+    def __init__(self, index, **columns):
+        self.index = index
+        for name, value in columns.items():
+            setattr(self, name, value)
+
+    def until(self, frame):
+        """StormStats of what is known at fix frame, for playback
+
+        Only fixes up to frame count, and a 24-hour change only once its
+        window has ended, so RI/RW periods grow as playback passes them and
+        the LMI is the peak so far. Category hours and the duration are left out.
+        """
+        part = slice(0, frame + 1)
+        with np.errstate(invalid="ignore"):
+            known = self.step_24h[part] <= frame
+        change = np.where(known, self.wind_change_24h[part], np.nan)
+        intensifying = self.rapid_intensification[part] & known
+        weakening = self.rapid_weakening[part] & known
+        outlier = self.pressure_wind_outlier[part]
+        wind, pressure, intensity = self.wind[part], self.pressure[part], self.intensity[part]
+
+        starts, lengths = np.zeros(1, dtype=np.int64), np.array([len(wind)])
+        peak_wind, peak_row = _segment_max(np.asarray(wind, dtype=np.float64), starts, lengths)
+        lowest_pressure, _ = _segment_max(-np.asarray(pressure, dtype=np.float64), starts, lengths)
+        max_change, _ = _segment_max(change, starts, lengths)
+        min_change, _ = _segment_max(-change, starts, lengths)
+        peak_row = int(peak_row[0])
+        rank = np.zeros(len(wind), dtype=np.int64)
+        return StormStats(
+            self.index, wind=wind, pressure=pressure, intensity=intensity,
+            wind_change_24h=change, step_24h=np.where(known, self.step_24h[part], np.nan),
+            wind_change_past_24h=self.wind_change_past_24h[part],
+            rapid_intensification=intensifying, rapid_weakening=weakening,
+            pressure_wind_residual=self.pressure_wind_residual[part], pressure_wind_outlier=outlier,
+            ri_events=int(_runs(intensifying, rank, 1)[0]), rw_events=int(_runs(weakening, rank, 1)[0]),
+            max_intensification=max_change[0], max_weakening=min_change[0],
+            lmi_wind=peak_wind[0], lmi_pressure=-lowest_pressure[0], lmi_row=peak_row,
+            lmi_code=int(intensity[peak_row]) if peak_row >= 0 else -1, outliers=int(outlier.sum()),
+        )
+
+    def rapid_periods(self, flags):
+        """(start, end) fix positions of each run of flagged fixes, end being 24 hours after its last fix"""
+        flags = np.asarray(flags, dtype=bool)
+        edges = np.diff(np.concatenate([[False], flags, [False]]).astype(np.int8))
+        begins = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1) - 1
+        return list(zip(begins.tolist(), self.step_24h[ends].tolist()))
+
+    def event_marks(self):
+        """RI and RW periods, LMI fix and outlier fixes: what the profiles mark"""
+        return (self.rapid_periods(self.rapid_intensification), self.rapid_periods(self.rapid_weakening),
+                int(self.lmi_row), np.flatnonzero(self.pressure_wind_outlier).tolist())
+
+    def summary(self, labels=INTENSITY_LEVELS):
+        """Short text lines for the information panel"""
+        lines = []
+        if not np.isnan(self.lmi_wind):
+            lines.append(f"LMI: {labels[self.lmi_code]} {self.lmi_wind:.0f} km/h, {self.lmi_pressure:.0f} hPa")
+        rapid = f"RI: {self.ri_events}, RW: {self.rw_events}"
+        if not np.isnan(self.max_intensification):
+            rapid += f" (max {self.max_intensification:+.0f} km/h/24h)"
+        lines.append(rapid)
+        if self.outliers:
+            lines.append(f"P-W outliers: {self.outliers}")
+        return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Intensity events and statistics of a catalog")
+    parser.add_argument("--catalog", help="best-track file (default: the sample storms)")
+    parser.add_argument("--format", help="catalog format (detected from the file when omitted)")
+    parser.add_argument("--workers", type=int, help="processes (default: CPU count)")
+    parser.add_argument("--chunk-fixes", type=int, default=DEFAULT_CHUNK_FIXES, help="fixes per chunk")
+    parser.add_argument("--output", help="write every statistic to this .npz file")
+    args = parser.parse_args(argv)
+
+    store = None
+    if not args.catalog:
+        from core import SAMPLE_TYPHOONS
+        store = TrackStore.from_typhoon_data(SAMPLE_TYPHOONS)
+    stats = CatalogStats.compute(store, catalog=args.catalog, catalog_format=args.format, workers=args.workers,
+                                 chunk_fixes=args.chunk_fixes)
+    a, b, sd = stats.fit
+    print(f"{len(stats.names)} storms, {len(stats.wind_change_24h)} fixes")
+    print(f"Rapid intensification: {int((stats.ri_events > 0).sum())} storms, {int(stats.ri_events.sum())} events")
+    print(f"Rapid weakening: {int((stats.rw_events > 0).sum())} storms, {int(stats.rw_events.sum())} events")
+    print(f"Wind-pressure fit: wind = {np.exp(a):.2f} * ({P_ENVIRONMENT:.0f} - p) ^ {b:.3f}, "
+          f"{int(stats.outliers.sum())} outlier fixes")
+    for level, hours in stats.category_totals().items():
+        print(f"  {level:<8} {hours:10.0f} h")
+    if args.output:
+        stats.save(args.output)
+        print(f"Statistics written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""Rendering and data-path benchmarks on synthetic typhoon tracks
+
+Usage:
+    python benchmark.py --storms 200 --length 60 --frames 40 --output benchmark.json
+
+Every render mode of TyphoonTracker3D is driven headlessly with the Agg
+backend. The report holds frames per second, per-frame latency percentiles,
+mean time per instrumented stage, storm-switch time, peak traced memory,
+data-path timings and module import times, and is written as JSON so runs
+can be compared between versions.
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from track_store import TrackStore, classify_wind
+
+RENDER_MODES = ("redraw", "blit")
+
+
+def make_synthetic_store(n_storms=100, length=40, seed=0, jitter=0.25):
+    """Synthetic 6-hourly storms drifting west-northwest and recurving
+
+    Lengths vary by +-jitter around length. Pressure deepens to a random
+    minimum and fills again; wind follows pressure with a simple wind-pressure
+    relationship, and intensity codes are derived from the wind.
+    """
+    rng = np.random.default_rng(seed)
+    low = max(2, int(length * (1 - jitter)))
+    high = max(low + 1, int(length * (1 + jitter)) + 1)
+    lengths = rng.integers(low, high, n_storms)
+    offsets = np.zeros(n_storms + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    storm = np.repeat(np.arange(n_storms), lengths)
+    step = np.arange(offsets[-1]) - np.repeat(offsets[:-1], lengths)
+    progress = step / np.repeat(lengths - 1, lengths)
+
+    # Heading turns from west-northwest to northeast as the storm recurves
+    heading = np.radians(-60 + 150 * progress ** 2 * rng.uniform(0.3, 1.0, n_storms)[storm])
+    speed = rng.uniform(0.3, 0.8, n_storms)[storm] + rng.normal(0, 0.05, len(storm))
+    d_lat = speed * np.cos(heading)
+    d_lng = speed * np.sin(heading)
+    d_lat[step == 0] = 0
+    d_lng[step == 0] = 0
+    lat = rng.uniform(5, 20, n_storms)[storm] + _segmented_cumsum(d_lat, offsets)
+    lng = rng.uniform(125, 170, n_storms)[storm] + _segmented_cumsum(d_lng, offsets)
+
+    depth = rng.uniform(20, 120, n_storms)[storm]
+    peak = rng.uniform(0.3, 0.7, n_storms)[storm]
+    shape = np.where(progress < peak, progress / peak, (1 - progress) / (1 - peak))
+    pressure = 1008 - depth * np.clip(shape, 0, 1) + rng.normal(0, 1, len(storm))
+    wind = np.maximum(3.4 * np.clip(1010 - pressure, 0, None) ** 0.644 * 3.6, 30)
+
+    times = (np.datetime64("2000-01-01T00:00") + rng.integers(0, 20 * 365, n_storms)[storm]
+             * np.timedelta64(1, "D") + step * np.timedelta64(6, "h"))
+    timestamp = np.datetime_as_string(times, unit="m").astype("S16")
+    timestamp.view(np.uint8).reshape(-1, 16)[:, 10] = ord(" ")
+    names = [f"Synthetic-{i:05d}" for i in range(n_storms)]
+    return TrackStore(names, offsets, lat, lng, pressure, wind, classify_wind(wind), timestamp)
+
+
+def _segmented_cumsum(values, offsets):
+    total = np.cumsum(values)
+    lengths = np.diff(offsets)
+    base = np.repeat(total[offsets[:-1]] - values[offsets[:-1]], lengths)
+    return total - base
+
+
+def _timed(function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return time.perf_counter() - start, result
+
+
+def _latency_summary(seconds):
+    seconds = np.asarray(seconds)
+    return {
+        "frames": int(len(seconds)),
+        "fps": float(len(seconds) / seconds.sum()) if seconds.sum() > 0 else None,
+        "mean_ms": float(seconds.mean() * 1000),
+        "p50_ms": float(np.percentile(seconds, 50) * 1000),
+        "p90_ms": float(np.percentile(seconds, 90) * 1000),
+        "p99_ms": float(np.percentile(seconds, 99) * 1000),
+        "max_ms": float(seconds.max() * 1000),
+    }
+
+
+def benchmark_data_path(store):
+    """Timings of the catalog-wide NumPy passes"""
+    from analytics import CatalogStats
+    from kinematics import TrackKinematics
+    from spatial_index import TrackIndex
+
+    results = {}
+    results["kinematics_s"], _ = _timed(TrackKinematics.compute, store)
+    results["analytics_s"], _ = _timed(CatalogStats.compute, store, workers=1)
+    results["spatial_index_s"], index = _timed(TrackIndex, store)
+    results["radius_query_s"], _ = _timed(index.radius, 15.0, 130.0, 300.0)
+    results["closest_approach_s"], _ = _timed(index.closest_approach, 15.0, 130.0)
+    return results
+
+
+def benchmark_render_mode(store, render_mode, storms, frames):
+    """Per-frame latency, storm-switch time and peak memory of one render mode"""
+    from main import TyphoonTracker3D
+
+    tracker = TyphoonTracker3D(render_mode=render_mode, store=store, profile=True)
+    figure_s, _ = _timed(tracker.build_figure)
+    switch_times = []
+    limit_times = []
+    frame_times = []
+    for storm in storms:
+        switch, _ = _timed(tracker.load_typhoon_data, storm)
+        switch_times.append(switch)
+        limits, _ = _timed(tracker.update_plot_limits)
+        limit_times.append(limits)
+
+        n = len(tracker.track)
+        for frame in np.unique(np.linspace(0, n - 1, min(frames, n)).astype(int)):
+            elapsed, _ = _timed(tracker.render_frame, int(frame))
+            frame_times.append(elapsed)
+
+    profile = tracker.profiler.summary()
+    tracker.profiler.enabled = False
+
+    # Scrubbing back over frames already shown is served by the frame cache
+    tracker.enable_frame_cache(background=False)
+    tracker.load_typhoon_data(storms[0])
+    scrubbed = range(min(frames, len(tracker.track)))
+    for frame in scrubbed:
+        tracker.show_frame(frame)
+    cached_times = [_timed(tracker.show_frame, frame)[0] for frame in reversed(scrubbed)]
+    tracker.disable_frame_cache()
+
+    # Peak memory of a storm switch plus the last frames of the longest storm
+    longest = storms[int(np.argmax([len(store.storm(storm)) for storm in storms]))]
+    tracemalloc.start()
+    tracker.load_typhoon_data(longest)
+    n = len(tracker.track)
+    for frame in range(max(0, n - frames), n):
+        tracker.render_frame(frame)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    import matplotlib.pyplot as plt
+    plt.close(tracker.fig)
+    return {
+        "frame_latency": _latency_summary(frame_times),
+        "storm_switch_ms": {
+            "mean": float(np.mean(switch_times) * 1000),
+            "max": float(np.max(switch_times) * 1000),
+        },
+        "update_plot_limits_ms": float(np.mean(limit_times) * 1000),
+        "cached_frame_ms": float(np.mean(cached_times) * 1000),
+        "build_figure_ms": figure_s * 1000,
+        "peak_traced_memory_mb": peak / 2 ** 20,
+        "stages_ms": {name: span["mean_ms"] for name, span in profile["spans"].items()},
+        "counters_per_frame": {name: counter["per_frame"] for name, counter in profile["counters"].items()},
+        "errors": len(profile["errors"]),
+    }
+
+
+def benchmark_startup():
+    """Import time of the GUI and core modules, each in a fresh interpreter"""
+    results = {}
+    directory = os.path.dirname(os.path.abspath(__file__))
+    for module in ("core", "main"):
+        code = f"import time; start = time.perf_counter(); import {module}; print(time.perf_counter() - start)"
+        try:
+            output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                    check=True, cwd=directory).stdout
+            results[f"import_{module}_s"] = float(output)
+        except (OSError, ValueError, subprocess.CalledProcessError):
+            results[f"import_{module}_s"] = None
+    return results
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(n_storms=100, length=40, frames=30, storms_rendered=3, render_modes=RENDER_MODES,
+                   seed=0):
+    """Run every benchmark and return the report as a dict"""
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+    import matplotlib as mpl
+
+    tracemalloc.start()
+    build_s, store = _timed(make_synthetic_store, n_storms, length, seed)
+    _, build_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    report = {
+        "revision": _git_revision(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "matplotlib": mpl.__version__,
+        "parameters": {"storms": n_storms, "length": length, "frames": frames,
+                       "storms_rendered": storms_rendered, "seed": seed},
+        "data": {
+            "fixes": store.n_fixes,
+            "store_bytes": store.nbytes,
+            "build_s": build_s,
+            "build_peak_memory_mb": build_peak / 2 ** 20,
+        } | benchmark_data_path(store),
+        "startup": benchmark_startup(),
+        "render": {},
+    }
+    storms = store.names[:storms_rendered]
+    for render_mode in render_modes:
+        report["render"][render_mode] = benchmark_render_mode(store, render_mode, storms, frames)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Typhoon tracker benchmarks")
+    parser.add_argument("--storms", type=int, default=100, help="synthetic storms in the catalog")
+    parser.add_argument("--length", type=int, default=40, help="average fixes per storm")
+    parser.add_argument("--frames", type=int, default=30, help="frames rendered per storm")
+    parser.add_argument("--render-storms", type=int, default=3, help="storms rendered per mode")
+    parser.add_argument("--modes", nargs="+", choices=RENDER_MODES, default=list(RENDER_MODES))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default="benchmark.json", help="JSON report path")
+    args = parser.parse_args(argv)
+
+    report = run_benchmarks(args.storms, args.length, args.frames, args.render_storms, args.modes, args.seed)
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+
+    for render_mode, result in report["render"].items():
+        latency = result["frame_latency"]
+        print(f"{render_mode:>7}: {latency['fps']:.1f} fps, p50 {latency['p50_ms']:.1f} ms, "
+              f"p99 {latency['p99_ms']:.1f} ms, switch {result['storm_switch_ms']['mean']:.1f} ms, "
+              f"cached frame {result['cached_frame_ms']:.1f} ms")
+    print(f"Report written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
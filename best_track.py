@@ -0,0 +1,282 @@
+"""Streaming best-track catalog loader with an on-disk binary cache
+
+Supported formats:
+    ibtracs  IBTrACS v04 CSV (one row per fix, storms keyed by SID)
+    cma      CMA/STI best track text (66666 header line, then fixed-width fixes)
+    jtwc     JTWC/ATCF b-deck (comma separated, BEST lines)
+"""
+import json
+import os
+import shutil
+
+import numpy as np
+
+from track_store import INTENSITY_LEVELS, TRACK_COLUMNS, TrackStore, classify_wind
+
+# Bumped whenever the parsers or the cache layout change
+CACHE_VERSION = 3
+
+# Rows parsed into Python lists before they are packed into NumPy arrays
+CHUNK_SIZE = 65536
+
+KNOT_TO_KMH = 1.852
+MS_TO_KMH = 3.6
+
+# CMA grade -> intensity code; grades 0 (weaker than TD) and 9 (extratropical)
+# are classified from the wind speed instead
+CMA_GRADES = {str(grade): grade - 1 for grade in range(1, len(INTENSITY_LEVELS) + 1)}
+
+
+class _ChunkedColumns:
+    """Accumulate parsed fixes in bounded chunks of typed arrays"""
+    def __init__(self, chunk_size=CHUNK_SIZE):
+        self.chunk_size = chunk_size
+        self.rows = []
+        self.chunks = []
+        self.names = []
+        self.lengths = []
+
+    def start_storm(self, name):
+        self.names.append(name)
+        self.lengths.append(0)
+
+    def append(self, row):
+        """row = (lat, lng, pressure, wind, intensity code or -1, timestamp)"""
+        self.rows.append(row)
+        self.lengths[-1] += 1
+        if len(self.rows) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+        lat, lng, pressure, wind, intensity, timestamp = zip(*self.rows)
+        self.chunks.append((
+            np.array(lat, dtype=TRACK_COLUMNS["lat"]),
+            np.array(lng, dtype=TRACK_COLUMNS["lng"]),
+            np.array(pressure, dtype=TRACK_COLUMNS["pressure"]),
+            np.array(wind, dtype=TRACK_COLUMNS["wind"]),
+            np.array(intensity, dtype=TRACK_COLUMNS["intensity"]),
+            np.array(timestamp, dtype=TRACK_COLUMNS["timestamp"]),
+        ))
+        self.rows = []
+
+    def to_store(self):
+        self.flush()
+
+        # Drop storms without any fix
+        keep = [i for i, length in enumerate(self.lengths) if length > 0]
+        names = _unique_names([self.names[i] for i in keep])
+        offsets = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.cumsum([self.lengths[i] for i in keep], out=offsets[1:])
+
+        if self.chunks:
+            columns = [np.concatenate(parts) for parts in zip(*self.chunks)]
+        else:
+            columns = [np.empty(0, dtype=dtype) for dtype in TRACK_COLUMNS.values()]
+        lat, lng, pressure, wind, intensity, timestamp = columns
+
+        # Fixes without an agency category are classified from their wind
+        unknown = intensity < 0
+        intensity[unknown] = classify_wind(wind[unknown])
+        return TrackStore(names, offsets, lat, lng, pressure, wind, intensity, timestamp)
+
+
+def _unique_names(names):
+    """Disambiguate repeated storm names (e.g. NOT_NAMED) with a counter"""
+    seen = {}
+    unique = []
+    for name in names:
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        unique.append(name if count == 0 else f"{name} #{count + 1}")
+    return unique
+
+
+def _float(text):
+    text = text.strip()
+    try:
+        return float(text) if text else np.nan
+    except ValueError:
+        return np.nan
+
+
+def _pressure(text):
+    """Central pressure in hPa; blank and the 0 placeholder of missing values give NaN"""
+    value = _float(text)
+    return value if value > 0 else np.nan
+
+
+def _ymdh(text):
+    """YYYYMMDDHH -> 'YYYY-MM-DD HH:00'"""
+    return f"{text[0:4]}-{text[4:6]}-{text[6:8]} {text[8:10]}:00"
+
+
+def parse_ibtracs(stream, columns):
+    """Parse an IBTrACS v04 CSV stream"""
+    header = next(stream).strip().split(",")
+    col = {name: i for i, name in enumerate(header)}
+    current_sid = None
+    for line in stream:
+        fields = line.rstrip("\r\n").split(",")
+        if len(fields) < len(header) or not fields[col["SID"]].strip():
+            # Units row right after the header, or a truncated line
+            continue
+        if fields[col["LAT"]].strip() in ("", "degrees_north"):
+            continue
+
+        sid = fields[col["SID"]]
+        if sid != current_sid:
+            current_sid = sid
+            name = fields[col["NAME"]].strip().title()
+            columns.start_storm(f"{name} ({fields[col['SEASON']].strip()})")
+
+        wind = _float(fields[col["WMO_WIND"]])
+        if np.isnan(wind) and "USA_WIND" in col:
+            wind = _float(fields[col["USA_WIND"]])
+        pressure = _pressure(fields[col["WMO_PRES"]])
+        if np.isnan(pressure) and "USA_PRES" in col:
+            pressure = _pressure(fields[col["USA_PRES"]])
+        columns.append((
+            float(fields[col["LAT"]]), float(fields[col["LON"]]) % 360,
+            pressure, wind * KNOT_TO_KMH, -1, fields[col["ISO_TIME"]][:16],
+        ))
+
+
+def parse_cma(stream, columns):
+    """Parse a CMA/STI best-track text stream"""
+    for line in stream:
+        fields = line.split()
+        if not fields:
+            continue
+        if fields[0] == "66666":
+            name = fields[7] if len(fields) > 7 else fields[1]
+            columns.start_storm(name.title())
+            continue
+
+        wind = _float(fields[5]) * MS_TO_KMH if len(fields) > 5 else np.nan
+        columns.append((
+            int(fields[2]) / 10.0, int(fields[3]) / 10.0, _pressure(fields[4]),
+            wind, CMA_GRADES.get(fields[1], -1), _ymdh(fields[0]),
+        ))
+
+
+def _atcf_coordinate(text):
+    """'145N' -> 14.5, '1382E' -> 138.2, '0755W' -> 284.5"""
+    text = text.strip()
+    value = int(text[:-1]) / 10.0
+    hemisphere = text[-1]
+    if hemisphere == "S":
+        return -value
+    if hemisphere == "W":
+        return 360.0 - value
+    return value
+
+
+def parse_jtwc(stream, columns):
+    """Parse a JTWC/ATCF b-deck stream"""
+    current_key = None
+    last_time = None
+    for line in stream:
+        fields = [field.strip() for field in line.split(",")]
+        if len(fields) < 10 or fields[4] != "BEST":
+            continue
+
+        key = (fields[0], fields[1], fields[2][:4])
+        if key != current_key:
+            current_key = key
+            last_time = None
+            name = fields[27] if len(fields) > 27 and fields[27] else "".join(key)
+            columns.start_storm(name.title())
+
+        # Each fix repeats once per wind radii threshold; keep the first row
+        if fields[2] == last_time:
+            continue
+        last_time = fields[2]
+        columns.append((
+            _atcf_coordinate(fields[6]), _atcf_coordinate(fields[7]), _pressure(fields[9]),
+            _float(fields[8]) * KNOT_TO_KMH, -1, _ymdh(fields[2]),
+        ))
+
+
+PARSERS = {
+    "ibtracs": parse_ibtracs,
+    "cma": parse_cma,
+    "jtwc": parse_jtwc,
+}
+
+
+def detect_format(path):
+    """Guess the catalog format from the first non-empty line"""
+    with open(path, encoding="utf-8", errors="replace") as stream:
+        for line in stream:
+            if line.strip():
+                break
+        else:
+            raise ValueError(f"Empty best-track file: {path}")
+
+    if line.startswith("SID,") or ",ISO_TIME," in line:
+        return "ibtracs"
+    if line.split()[0] == "66666":
+        return "cma"
+    if ", BEST," in line or ",BEST," in line:
+        return "jtwc"
+    raise ValueError(f"Unrecognised best-track format: {path}")
+
+
+def parse_catalog(path, fmt=None, chunk_size=CHUNK_SIZE):
+    """Stream-parse a best-track file into a TrackStore"""
+    fmt = fmt or detect_format(path)
+    columns = _ChunkedColumns(chunk_size)
+    with open(path, encoding="utf-8", errors="replace") as stream:
+        PARSERS[fmt](stream, columns)
+    return columns.to_store()
+
+
+def _source_signature(path, fmt):
+    stat = os.stat(path)
+    return {
+        "version": CACHE_VERSION,
+        "source": os.path.abspath(path),
+        "format": fmt,
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def default_cache_dir(path):
+    return os.path.abspath(path) + ".trackcache"
+
+
+def open_catalog(path, fmt=None, cache_dir=None, use_cache=True):
+    """Open a best-track catalog, reusing the memory-mapped cache when valid
+
+    The cache is rebuilt whenever the source file's size or modification
+    time no longer match the ones recorded when it was written.
+    """
+    fmt = fmt or detect_format(path)
+    if not use_cache:
+        return parse_catalog(path, fmt)
+
+    cache_dir = cache_dir or default_cache_dir(path)
+    signature = _source_signature(path, fmt)
+    meta_path = os.path.join(cache_dir, "meta.json")
+    try:
+        with open(meta_path) as meta_file:
+            if json.load(meta_file) == signature:
+                return TrackStore.load(cache_dir)
+    except (OSError, ValueError):
+        pass
+
+    store = parse_catalog(path, fmt)
+
+    # Write next to the final location and swap in, so readers never see a
+    # half-written cache
+    tmp_dir = f"{cache_dir}.tmp{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    store.save(tmp_dir)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as meta_file:
+        json.dump(signature, meta_file)
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.replace(tmp_dir, cache_dir)
+    return TrackStore.load(cache_dir)
@@ -0,0 +1,178 @@
+"""Global simulation clock for time-synchronized playback of several storms
+
+A StormTimeline packs the fix times of its storms into one sorted key
+array: storm rank times the time span, plus minutes since the earliest fix.
+The active fix of every storm at a clock time is then found with a single
+searchsorted over that array, i.e. O(log n) per storm for any seek and
+without rescanning the tracks from the start.
+"""
+import numpy as np
+
+from interpolation import slerp_positions
+from track_store import TIME_DTYPE, concat_ranges, fill_missing_times
+
+# Minutes the clock advances per animation frame
+DEFAULT_STEP_MINUTES = 60
+
+
+def _minutes(time):
+    return np.asarray(np.datetime64(time, "m") if isinstance(time, str) else time,
+                      dtype=TIME_DTYPE).astype(np.int64)
+
+
+def storms_between(store, start=None, end=None):
+    """Indices of storms with a fix between start and end (inclusive), in start order"""
+    lengths = store.lengths
+    nonempty = np.flatnonzero(lengths > 0)
+    first = store.time[store.offsets[:-1][nonempty]]
+    last = store.time[store.offsets[1:][nonempty] - 1]
+    keep = np.ones(len(nonempty), dtype=bool)
+    if start is not None:
+        keep &= last >= np.datetime64(start, "m")
+    if end is not None:
+        keep &= first <= np.datetime64(end, "m")
+    order = np.argsort(first[keep], kind="stable")
+    return nonempty[keep][order]
+
+
+class SimulationClock:
+    """Global playback time advancing in fixed steps from start to end"""
+    def __init__(self, start, end, step_minutes=DEFAULT_STEP_MINUTES):
+        self.start = np.datetime64(start, "m")
+        self.end = max(np.datetime64(end, "m"), self.start)
+        self.step = np.timedelta64(max(1, int(step_minutes)), "m")
+        self.now = self.start
+
+    def __len__(self):
+        return int((self.end - self.start) // self.step) + 1
+
+    def seek(self, time):
+        """Move to time, clamped to [start, end]"""
+        self.now = min(max(np.datetime64(time, "m"), self.start), self.end)
+        return self.now
+
+    def advance(self, steps=1):
+        """Move steps ticks forward (or back when negative)"""
+        return self.seek(self.now + steps * self.step)
+
+    def ticks(self):
+        """Times from now to end, one per step; the clock follows along"""
+        while True:
+            yield self.now
+            if self.now >= self.end:
+                break
+            self.advance()
+
+    def replay(self):
+        """ticks() from the start; for animations that repeat"""
+        self.now = self.start
+        return self.ticks()
+
+    @property
+    def hours(self):
+        """Hours elapsed since the start"""
+        return (self.now - self.start).astype(np.float64) / 60.0
+
+
+class TimelineState:
+    """Every storm of a StormTimeline at one clock time
+
+    index is the fix at or before the time within each storm (-1 before its
+    first fix), row the matching store row, and fraction the position
+    towards the next fix. Positions and values are interpolated there.
+    """
+    def __init__(self, time, index, row, fraction, started, finished, lat, lng, pressure, wind, intensity):
+        self.time = time
+        self.index = index
+        self.row = row
+        self.fraction = fraction
+        self.started = started
+        self.finished = finished
+        self.lat = lat
+        self.lng = lng
+        self.pressure = pressure
+        self.wind = wind
+        self.intensity = intensity
+
+    @property
+    def active(self):
+        """Storms in progress at the time"""
+        return self.started & ~self.finished
+
+
+class StormTimeline:
+    """Binary-search lookup of the active fix of several storms at any time"""
+    def __init__(self, store, indices):
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.starts = store.offsets[self.indices]
+        self.lengths = store.offsets[self.indices + 1] - self.starts
+        self.rows = concat_ranges(self.starts, self.starts + self.lengths)
+
+        # Missing fix times take a neighbouring fix's time; storms without any
+        # valid time sit at the very end of their band and never start
+        offsets = np.append(0, np.cumsum(self.lengths))
+        self.times = fill_missing_times(store.time[self.rows], offsets)
+        undated = np.isnat(self.times)
+        minutes = np.where(undated, 0, self.times.astype(np.int64))
+        dated = minutes[~undated]
+        self.origin = int(dated.min()) if len(dated) else 0
+        self.span = int(dated.max()) - self.origin + 3 if len(dated) else 3
+        offset = np.where(undated, self.span - 1, minutes - self.origin)
+
+        # Fix times within each storm are ascending, and each storm gets its
+        # own band of keys, so the concatenation is sorted as a whole
+        rank = np.repeat(np.arange(len(self.indices)), self.lengths)
+        self.keys = rank * self.span + offset
+        self.first = np.cumsum(self.lengths) - self.lengths
+        last = self.first + np.maximum(self.lengths - 1, 0)
+        nonempty = self.lengths > 0
+        self.start_time = np.full(len(self.indices), np.datetime64("NaT"), dtype=TIME_DTYPE)
+        self.end_time = self.start_time.copy()
+        self.start_time[nonempty] = self.times[self.first[nonempty]]
+        self.end_time[nonempty] = self.times[last[nonempty]]
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def start(self):
+        dated = self.start_time[~np.isnat(self.start_time)]
+        return dated.min() if len(dated) else np.datetime64(self.origin, "m")
+
+    @property
+    def end(self):
+        dated = self.end_time[~np.isnat(self.end_time)]
+        return dated.max() if len(dated) else np.datetime64(self.origin, "m")
+
+    def locate(self, time):
+        """Index of the last fix at or before time in each storm, -1 before its first fix"""
+        offset = np.clip(_minutes(time) - self.origin, -1, self.span - 2)
+        queries = np.arange(len(self.indices)) * self.span + offset
+        return np.searchsorted(self.keys, queries, side="right") - self.first - 1
+
+    def state(self, time):
+        """TimelineState of every storm at time"""
+        time = np.datetime64(time, "m")
+        index = self.locate(time)
+        started = index >= 0
+        finished = time > self.end_time
+        current = np.clip(index, 0, np.maximum(self.lengths - 1, 0))
+        following = np.minimum(current + 1, np.maximum(self.lengths - 1, 0))
+        row = self.starts + current
+        next_row = self.starts + following
+
+        store = self.store
+        # A trailing NaT keeps the lookup of empty storms in bounds
+        times = np.append(self.times, np.datetime64("NaT", "m"))
+        interval = (times[self.first + following] - times[self.first + current]).astype(np.float64)
+        elapsed = (time - times[self.first + current]).astype(np.float64)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            fraction = np.where(started & (interval > 0), np.clip(elapsed / interval, 0.0, 1.0), 0.0)
+
+        lat, lng = slerp_positions(store.lat[row], store.lng[row], store.lat[next_row], store.lng[next_row],
+                                   fraction)
+        pressure = store.pressure[row] + (store.pressure[next_row] - store.pressure[row]) * fraction
+        wind = store.wind[row] + (store.wind[next_row] - store.wind[row]) * fraction
+        return TimelineState(time, index, row, fraction, started, finished, lat, lng, pressure, wind,
+                             store.intensity[row])
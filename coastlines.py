@@ -0,0 +1,373 @@
+"""Coastline layer read from Natural Earth-style shapefiles or GeoJSON
+
+Coastlines are held as one set of coordinate arrays plus a ring offset
+index, like the track store. For a map view they are clipped to the visible
+extent (plus a margin) and simplified to the display resolution with the
+Douglas-Peucker importances of the lod module. Extents and resolutions are
+quantized, and every result is cached in memory and as an .npz file next to
+the source, so zooming back and forth or reopening the viewer reuses earlier
+work. The layer is one static line collection that is refitted only when the
+view moves to another extent or resolution.
+"""
+import json
+import math
+import os
+import shutil
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+import lod
+from track_store import concat_ranges
+
+CACHE_VERSION = 1
+
+# Clipped and simplified views kept in memory per layer
+MEMORY_CACHE_SIZE = 32
+
+# Shapefile shape types holding polylines or polygons (plain, M and Z variants)
+SHAPEFILE_LINE_TYPES = (3, 5, 13, 15, 23, 25)
+
+# The polygon types among them, whose parts are closed rings
+SHAPEFILE_POLYGON_TYPES = (5, 15, 25)
+
+# Hand-drawn outlines used when no coastline file is given
+BUILTIN_COASTLINES = (
+    # Asia (simplified)
+    ((100, 10), (100, 30), (120, 30), (120, 40), (140, 40), (140, 20), (120, 20), (100, 10)),
+    # Philippines (simplified)
+    ((117, 5), (122, 5), (126, 15), (126, 20), (122, 20), (117, 15)),
+)
+
+
+class CoastlineGeometry:
+    """Polylines stored as x/y columns; line i is rows offsets[i]:offsets[i + 1]"""
+    def __init__(self, x, y, offsets):
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_lines(cls, lines):
+        lines = [np.asarray(line, dtype=np.float64).reshape(-1, 2) for line in lines]
+        lines = [line for line in lines if len(line) > 1]
+        offsets = np.zeros(len(lines) + 1, dtype=np.int64)
+        np.cumsum([len(line) for line in lines], out=offsets[1:])
+        points = np.concatenate(lines) if lines else np.empty((0, 2))
+        return cls(points[:, 0], points[:, 1], offsets)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    @property
+    def n_points(self):
+        return len(self.x)
+
+    def paths(self):
+        """One (k, 2) array per line, as views of the coordinate columns"""
+        points = np.column_stack((self.x, self.y))
+        return [points[a:b] for a, b in zip(self.offsets[:-1].tolist(), self.offsets[1:].tolist())]
+
+    def closed(self):
+        """Whether each line ends where it starts, i.e. is a ring"""
+        lengths = np.diff(self.offsets)
+        first = self.offsets[:-1]
+        last = np.maximum(self.offsets[1:] - 1, first)
+        return (lengths > 2) & (self.x[last] == self.x[first]) & (self.y[last] == self.y[first])
+
+
+def _geojson_lines(geometry, polygons=False):
+    if geometry is None:
+        return
+    kind = geometry["type"]
+    coordinates = geometry.get("coordinates")
+    if kind == "LineString" and not polygons:
+        yield coordinates
+    elif kind == "MultiLineString" and not polygons or kind == "Polygon":
+        yield from coordinates
+    elif kind == "MultiPolygon":
+        for polygon in coordinates:
+            yield from polygon
+    elif kind == "GeometryCollection":
+        for part in geometry["geometries"]:
+            yield from _geojson_lines(part, polygons)
+
+
+def read_geojson(path, polygons=False):
+    """Lines and polygon rings of a GeoJSON file; only the rings with polygons=True"""
+    with open(path) as source:
+        data = json.load(source)
+    if data["type"] == "FeatureCollection":
+        geometries = [feature["geometry"] for feature in data["features"]]
+    elif data["type"] == "Feature":
+        geometries = [data["geometry"]]
+    else:
+        geometries = [data]
+    return CoastlineGeometry.from_lines(
+        [np.asarray(line, dtype=np.float64)[:, :2] for geometry in geometries
+         for line in _geojson_lines(geometry, polygons) if len(line) > 1])
+
+
+def read_shapefile(path, polygons=False):
+    """Parts of every polyline or polygon record of an ESRI .shp file; only polygon rings with polygons=True"""
+    with open(path, "rb") as source:
+        data = source.read()
+    if len(data) < 100 or struct.unpack_from(">i", data, 0)[0] != 9994:
+        raise ValueError(f"{path} is not a shapefile")
+
+    lines = []
+    position = 100
+    while position + 12 <= len(data):
+        length = struct.unpack_from(">i", data, position + 4)[0] * 2
+        content = position + 8
+        shape_type = struct.unpack_from("<i", data, content)[0]
+        if shape_type in (SHAPEFILE_POLYGON_TYPES if polygons else SHAPEFILE_LINE_TYPES):
+            n_parts, n_points = struct.unpack_from("<2i", data, content + 36)
+            parts = np.frombuffer(data, "<i4", n_parts, content + 44)
+            points = np.frombuffer(data, "<f8", 2 * n_points, content + 44 + 4 * n_parts).reshape(-1, 2)
+            bounds = np.append(parts, n_points)
+            lines.extend(points[a:b] for a, b in zip(bounds[:-1], bounds[1:]))
+        position = content + length
+    return CoastlineGeometry.from_lines(lines)
+
+
+def read_coastlines(path, polygons=False):
+    """Coastline geometry of a .shp, .geojson or .json file; only polygon rings with polygons=True"""
+    if path.lower().endswith(".shp"):
+        return read_shapefile(path, polygons)
+    return read_geojson(path, polygons)
+
+
+def builtin_geometry(polygons=False):
+    """The hand-drawn outlines; closed into rings with polygons=True"""
+    if polygons:
+        return CoastlineGeometry.from_lines([outline + outline[:1] if outline[0] != outline[-1] else outline
+                                             for outline in BUILTIN_COASTLINES])
+    return CoastlineGeometry.from_lines(BUILTIN_COASTLINES)
+
+
+def clip(geometry, x_min, x_max, y_min, y_max):
+    """Pieces of every line whose segments overlap the box
+
+    Longitudes are matched modulo 360, so a -180..180 source covers an
+    extent such as 100..200 east. Lines are cut where they leave the box;
+    segments are kept whole, as the axes clip the remainder when drawing.
+    """
+    x, y, offsets = geometry.x, geometry.y, geometry.offsets
+    if geometry.n_points < 2:
+        return CoastlineGeometry.from_lines([])
+
+    # Segment i runs from point i to point i + 1 and never crosses a line boundary
+    inner = np.ones(len(x) - 1, dtype=bool)
+    inner[offsets[1:-1] - 1] = False
+    seg_y_min = np.minimum(y[:-1], y[1:])
+    seg_y_max = np.maximum(y[:-1], y[1:])
+    inside_y = inner & (seg_y_max >= y_min) & (seg_y_min <= y_max)
+    seg_x_min = np.minimum(x[:-1], x[1:])
+    seg_x_max = np.maximum(x[:-1], x[1:])
+
+    pieces = []
+    for shift in (-360.0, 0.0, 360.0):
+        if x_max < x.min() + shift or x_min > x.max() + shift:
+            continue
+        keep = inside_y & (seg_x_max + shift >= x_min) & (seg_x_min + shift <= x_max)
+        if not keep.any():
+            continue
+        edges = np.diff(np.concatenate(([False], keep, [False])).astype(np.int8))
+        first = np.flatnonzero(edges == 1)
+        last = np.flatnonzero(edges == -1)
+        rows = concat_ranges(first, last + 1)
+        lengths = last + 1 - first
+        pieces.append((x[rows] + shift, y[rows], lengths))
+
+    if not pieces:
+        return CoastlineGeometry.from_lines([])
+    lengths = np.concatenate([piece[2] for piece in pieces])
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return CoastlineGeometry(np.concatenate([piece[0] for piece in pieces]),
+                             np.concatenate([piece[1] for piece in pieces]), offsets)
+
+
+def simplify(geometry, tolerance):
+    """Douglas-Peucker simplification of every line, endpoints kept"""
+    if geometry.n_points == 0 or tolerance <= 0:
+        return geometry
+    forced = lod.forced_vertices(np.zeros(geometry.n_points, dtype=np.int8), geometry.offsets)
+    importance = lod.douglas_peucker_importance(geometry.x, geometry.y, geometry.offsets, forced)
+    keep = importance >= tolerance
+    lengths = np.add.reduceat(keep, geometry.offsets[:-1]) if len(geometry) else np.empty(0, dtype=np.int64)
+    offsets = np.zeros(len(geometry) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return CoastlineGeometry(geometry.x[keep], geometry.y[keep], offsets)
+
+
+def quantize_view(xlim, ylim, units_per_pixel, margin=0.25, pixel_tolerance=lod.DEFAULT_PIXEL_TOLERANCE):
+    """Cache key of a view: extent snapped outwards to a coarse grid, power-of-two resolution"""
+    x_min, x_max = sorted(xlim)
+    y_min, y_max = sorted(ylim)
+    span = max(x_max - x_min, y_max - y_min, 1e-6)
+    step = 2.0 ** math.ceil(math.log2(span * margin))
+    extent = (
+        math.floor((x_min - span * margin) / step) * step,
+        math.ceil((x_max + span * margin) / step) * step,
+        max(math.floor((y_min - span * margin) / step) * step, -90.0),
+        min(math.ceil((y_max + span * margin) / step) * step, 90.0),
+    )
+    resolution = 2.0 ** math.floor(math.log2(max(units_per_pixel * pixel_tolerance, 1e-9)))
+    return extent + (resolution,)
+
+
+def default_cache_dir(path):
+    return os.path.abspath(path) + ".coastcache"
+
+
+def coastline_collection(layer, **kwargs):
+    """Line collection that refits its paths to the view of its axes before drawing
+
+    matplotlib is imported here, so that reading and caching coastlines
+    (e.g. for swath.resolve_land) does not need it.
+    """
+    from matplotlib.collections import LineCollection
+
+    class CoastlineCollection(LineCollection):
+        def draw(self, renderer):
+            if self.axes is not None:
+                layer.refresh(self.axes)
+            super().draw(renderer)
+
+    return CoastlineCollection([], **kwargs)
+
+
+class CoastlineLayer:
+    """Clipped, simplified and cached coastlines drawn as one static collection
+
+    Without a source the builtin outlines are used. Geometry is read from the
+    source only when a view is missing from both caches.
+    """
+    def __init__(self, source=None, cache_dir=None, use_cache=True,
+                 pixel_tolerance=lod.DEFAULT_PIXEL_TOLERANCE, margin=0.25,
+                 color="k", linewidth=1.0, alpha=0.5, zorder=1):
+        self.source = source
+        self.cache_dir = None
+        if source and use_cache:
+            self.cache_dir = cache_dir or default_cache_dir(source)
+        self.pixel_tolerance = pixel_tolerance
+        self.margin = margin
+        self.memory = OrderedDict()
+        self.key = None
+        self._geometry = None
+        self._disk_ready = False
+        self.style = {"colors": color, "linewidths": linewidth, "alpha": alpha, "zorder": zorder}
+        self._collection = None
+
+    @property
+    def collection(self):
+        """The line collection of the layer, created when first attached"""
+        if self._collection is None:
+            self._collection = coastline_collection(self, **self.style)
+        return self._collection
+
+    @property
+    def geometry(self):
+        if self._geometry is None:
+            self._geometry = read_coastlines(self.source) if self.source else builtin_geometry()
+        return self._geometry
+
+    def attach(self, ax):
+        """Add the collection to ax unless it is already there"""
+        if self.collection.axes is ax:
+            return self.collection
+        if self.collection.axes is not None:
+            self.collection.remove()
+        ax.add_collection(self.collection, autolim=False)
+        return self.collection
+
+    def refresh(self, ax):
+        """Fit the paths to the current limits and size of ax"""
+        units_per_pixel = min(lod.pixel_size(ax))
+        key = quantize_view(ax.get_xlim(), ax.get_ylim(), units_per_pixel, self.margin, self.pixel_tolerance)
+        if key != self.key:
+            self.collection.set_segments(self.view(key).paths())
+            self.key = key
+
+    def view(self, key):
+        """Clipped and simplified geometry of a quantized view, from the caches when possible"""
+        geometry = self.memory.get(key)
+        if geometry is not None:
+            self.memory.move_to_end(key)
+            return geometry
+
+        geometry = self._load_view(key)
+        if geometry is None:
+            x_min, x_max, y_min, y_max, resolution = key
+            geometry = simplify(clip(self.geometry, x_min, x_max, y_min, y_max), resolution)
+            self._save_view(key, geometry)
+
+        self.memory[key] = geometry
+        if len(self.memory) > MEMORY_CACHE_SIZE:
+            self.memory.popitem(last=False)
+        return geometry
+
+    def _signature(self):
+        stat = os.stat(self.source)
+        return {
+            "version": CACHE_VERSION,
+            "source": os.path.abspath(self.source),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+
+    def _prepare_cache(self):
+        """Empty the disk cache when it was written for another version of the source"""
+        if self._disk_ready:
+            return True
+        try:
+            signature = self._signature()
+            meta_path = os.path.join(self.cache_dir, "meta.json")
+            try:
+                with open(meta_path) as meta_file:
+                    recorded = json.load(meta_file)
+            except FileNotFoundError:
+                recorded = None
+            except (OSError, ValueError):
+                recorded = {}
+            if recorded != signature:
+                # Views of an older source are dropped; export workers may
+                # race here, so the signature is swapped in atomically
+                if recorded is not None:
+                    shutil.rmtree(self.cache_dir, ignore_errors=True)
+                os.makedirs(self.cache_dir, exist_ok=True)
+                tmp_path = f"{meta_path}.tmp{os.getpid()}"
+                with open(tmp_path, "w") as meta_file:
+                    json.dump(signature, meta_file)
+                os.replace(tmp_path, meta_path)
+        except OSError:
+            self.cache_dir = None
+            return False
+        self._disk_ready = True
+        return True
+
+    def _view_path(self, key):
+        return os.path.join(self.cache_dir, "_".join(f"{value:g}" for value in key) + ".npz")
+
+    def _load_view(self, key):
+        if self.cache_dir is None or not self._prepare_cache():
+            return None
+        try:
+            with np.load(self._view_path(key)) as data:
+                return CoastlineGeometry(data["x"], data["y"], data["offsets"])
+        except (OSError, KeyError, ValueError):
+            return None
+
+    def _save_view(self, key, geometry):
+        if self.cache_dir is None or not self._prepare_cache():
+            return
+        path = self._view_path(key)
+        tmp_path = f"{path}.tmp{os.getpid()}.npz"
+        try:
+            np.savez(tmp_path, x=geometry.x, y=geometry.y, offsets=geometry.offsets)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass
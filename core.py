@@ -0,0 +1,230 @@
+"""Track data, intensity scale and view logic that need only NumPy
+
+Scripts, analysis jobs and export workers can load storms, describe their
+movement and compute plot limits from here without importing matplotlib or
+building a figure; TyphoonTracker3D adds the views on top of TrackerCore.
+"""
+import numpy as np
+
+import analytics
+import kinematics
+from track_store import INTENSITY_LEVELS, TrackStore
+
+# Playback pace: at DEFAULT_SPEED one best-track fix is shown every FIX_INTERVAL_MS
+FIX_INTERVAL_MS = 800
+DEFAULT_SPEED = 5
+
+# Typhoon data (English version)
+SAMPLE_TYPHOONS = {
+    "Mangkhut": {
+        "name": "Mangkhut",
+        "points": [
+            {"lat": 14.5, "lng": 138.2, "pressure": 1002, "wind": 65, "intensity": "TD", "timestamp": "2018-09-07 00:00"},
+            {"lat": 15.2, "lng": 136.8, "pressure": 998, "wind": 75, "intensity": "TS", "timestamp": "2018-09-07 06:00"},
+            {"lat": 16.1, "lng": 135.3, "pressure": 985, "wind": 95, "intensity": "STS", "timestamp": "2018-09-07 12:00"},
+            {"lat": 17.0, "lng": 133.8, "pressure": 970, "wind": 120, "intensity": "TY", "timestamp": "2018-09-07 18:00"},
+            {"lat": 17.9, "lng": 132.3, "pressure": 955, "wind": 140, "intensity": "TY", "timestamp": "2018-09-08 00:00"},
+            {"lat": 18.8, "lng": 130.8, "pressure": 940, "wind": 160, "intensity": "STY", "timestamp": "2018-09-08 06:00"},
+            {"lat": 19.7, "lng": 129.3, "pressure": 920, "wind": 185, "intensity": "SuperTY", "timestamp": "2018-09-08 12:00"},
+            {"lat": 20.6, "lng": 127.8, "pressure": 905, "wind": 205, "intensity": "SuperTY", "timestamp": "2018-09-08 18:00"},
+            {"lat": 21.5, "lng": 126.3, "pressure": 910, "wind": 195, "intensity": "SuperTY", "timestamp": "2018-09-09 00:00"},
+            {"lat": 22.4, "lng": 124.8, "pressure": 925, "wind": 180, "intensity": "STY", "timestamp": "2018-09-09 06:00"}
+        ]
+    },
+    "Haiyan": {
+        "name": "Haiyan",
+        "points": [
+            {"lat": 6.5, "lng": 155.2, "pressure": 1004, "wind": 55, "intensity": "TD", "timestamp": "2013-11-04 00:00"},
+            {"lat": 7.2, "lng": 153.8, "pressure": 996, "wind": 70, "intensity": "TS", "timestamp": "2013-11-04 06:00"},
+            {"lat": 8.1, "lng": 152.3, "pressure": 980, "wind": 100, "intensity": "STS", "timestamp": "2013-11-04 12:00"},
+            {"lat": 9.0, "lng": 150.8, "pressure": 960, "wind": 130, "intensity": "TY", "timestamp": "2013-11-04 18:00"},
+            {"lat": 9.9, "lng": 149.3, "pressure": 940, "wind": 155, "intensity": "STY", "timestamp": "2013-11-05 00:00"},
+            {"lat": 10.8, "lng": 147.8, "pressure": 920, "wind": 180, "intensity": "SuperTY", "timestamp": "2013-11-05 06:00"},
+            {"lat": 11.7, "lng": 146.3, "pressure": 895, "wind": 215, "intensity": "SuperTY", "timestamp": "2013-11-05 12:00"},
+            {"lat": 12.6, "lng": 144.8, "pressure": 890, "wind": 230, "intensity": "SuperTY", "timestamp": "2013-11-05 18:00"},
+            {"lat": 13.5, "lng": 143.3, "pressure": 895, "wind": 220, "intensity": "SuperTY", "timestamp": "2013-11-06 00:00"},
+            {"lat": 14.4, "lng": 141.8, "pressure": 910, "wind": 200, "intensity": "SuperTY", "timestamp": "2013-11-06 06:00"}
+        ]
+    },
+    "Yutu": {
+        "name": "Yutu",
+        "points": [
+            {"lat": 12.5, "lng": 147.2, "pressure": 1005, "wind": 60, "intensity": "TD", "timestamp": "2018-10-22 00:00"},
+            {"lat": 13.2, "lng": 145.8, "pressure": 995, "wind": 75, "intensity": "TS", "timestamp": "2018-10-22 06:00"},
+            {"lat": 14.1, "lng": 144.3, "pressure": 980, "wind": 100, "intensity": "STS", "timestamp": "2018-10-22 12:00"},
+            {"lat": 15.0, "lng": 142.8, "pressure": 960, "wind": 125, "intensity": "TY", "timestamp": "2018-10-22 18:00"},
+            {"lat": 15.9, "lng": 141.3, "pressure": 940, "wind": 150, "intensity": "STY", "timestamp": "2018-10-23 00:00"},
+            {"lat": 16.8, "lng": 139.8, "pressure": 920, "wind": 175, "intensity": "SuperTY", "timestamp": "2018-10-23 06:00"},
+            {"lat": 17.7, "lng": 138.3, "pressure": 900, "wind": 195, "intensity": "SuperTY", "timestamp": "2018-10-23 12:00"},
+            {"lat": 18.6, "lng": 136.8, "pressure": 910, "wind": 185, "intensity": "SuperTY", "timestamp": "2018-10-23 18:00"},
+            {"lat": 19.5, "lng": 135.3, "pressure": 925, "wind": 170, "intensity": "STY", "timestamp": "2018-10-24 00:00"},
+            {"lat": 20.4, "lng": 133.8, "pressure": 940, "wind": 155, "intensity": "STY", "timestamp": "2018-10-24 06:00"}
+        ]
+    }
+}
+
+# Intensity color mapping
+INTENSITY_COLORS = {
+    "TD": "#1a9850",
+    "TS": "#91cf60",
+    "STS": "#d9ef8b",
+    "TY": "#fee08b",
+    "STY": "#fc8d59",
+    "SuperTY": "#d73027"
+}
+
+# Intensity full names
+INTENSITY_NAMES = {
+    "TD": "Tropical Depression",
+    "TS": "Tropical Storm",
+    "STS": "Severe Tropical Storm",
+    "TY": "Typhoon",
+    "STY": "Severe Typhoon",
+    "SuperTY": "Super Typhoon"
+}
+
+
+def hex_to_rgba(colors, alpha=1.0):
+    """(n, 4) float RGBA array of '#rrggbb' colors"""
+    rgb = [[int(color[i:i + 2], 16) / 255.0 for i in (1, 3, 5)] for color in colors]
+    return np.column_stack((np.asarray(rgb, dtype=np.float64).reshape(-1, 3), np.full(len(rgb), alpha)))
+
+
+def calculate_direction(lat1, lng1, lat2, lng2):
+    """Calculate movement direction on the 16-point compass"""
+    if kinematics.haversine_km(lat1, lng1, lat2, lng2) < kinematics.STATIONARY_KM:
+        return kinematics.compass_name(kinematics.NO_DIRECTION)
+    return kinematics.compass_name(kinematics.compass_index(kinematics.initial_bearing(lat1, lng1, lat2, lng2)))
+
+
+def plot_limits(lngs, lats, pressures, winds, time_points):
+    """Axis limits fitting the given fixes, as (low, high) pairs per quantity
+
+    "pressure" is the range of the 3D pressure axis, "pressure_profile" the
+    inverted range of the pressure profile and "steps" the time-step range
+    of both profiles.
+    """
+    lat_min, lat_max = np.nanmin(lats), np.nanmax(lats)
+    lng_min, lng_max = np.nanmin(lngs), np.nanmax(lngs)
+    pressure_min, pressure_max = np.nanmin(pressures), np.nanmax(pressures)
+    
+    # Add margins to limits
+    lat_margin = max((lat_max - lat_min) * 0.2, 2)
+    lon_margin = max((lng_max - lng_min) * 0.2, 2)
+    pressure_margin = max((pressure_max - pressure_min) * 0.2, 20)
+    
+    return {
+        "lng": (lng_min - lon_margin, lng_max + lon_margin),
+        "lat": (lat_min - lat_margin, lat_max + lat_margin),
+        "pressure": (pressure_min - pressure_margin, pressure_max + pressure_margin),
+        "steps": (-0.5, time_points - 0.5) if time_points > 1 else (-0.5, 0.5),
+        "pressure_profile": (pressure_max + 50, pressure_min - 50),
+        "wind": (0, max(np.nanmax(winds) * 1.2, 100)),
+    }
+
+
+class TrackerCore:
+    """Current storm, its per-fix arrays and the text describing each fix"""
+    def __init__(self, store=None):
+        # Columnar track store; storms are zero-copy slices of its arrays
+        self.store = store if store is not None else TrackStore.from_typhoon_data(SAMPLE_TYPHOONS)
+        
+        self.intensity_colors = dict(INTENSITY_COLORS)
+        self.intensity_names = dict(INTENSITY_NAMES)
+        
+        # Lookup tables indexed by intensity code
+        self.intensity_rgba = hex_to_rgba([self.intensity_colors[level] for level in INTENSITY_LEVELS])
+        self.intensity_labels = [self.intensity_names[level] for level in INTENSITY_LEVELS]
+        
+        # Current state
+        self.current_typhoon = "Mangkhut" if "Mangkhut" in self.store else self.store.names[0]
+        self.track = None
+        self.track_source = None
+        self.current_index = 0
+        # Show the events and statistics of the whole track instead of those known at the current fix
+        self.event_summary = False
+        
+        # Load initial data
+        self.load_typhoon_data(self.current_typhoon)
+        
+    def load_typhoon_data(self, typhoon_name):
+        """Load typhoon data"""
+        self.load_track(self.store.storm(typhoon_name), self.store)
+        
+    def load_track(self, track, source):
+        """Make track, a storm of source (a TrackStore or a LiveTrack), the current storm"""
+        self.current_typhoon = track.name
+        self.track = track
+        self.track_source = source
+        self.current_index = 0
+        self.bind_track_arrays(source)
+        
+    def bind_track_arrays(self, source):
+        """Point the per-fix arrays at the current track, e.g. after a LiveTrack grew"""
+        # Data arrays are views into the track store
+        self.lats = self.track.lat
+        self.lngs = self.track.lng
+        self.pressures = self.track.pressure
+        self.winds = self.track.wind
+        self.intensities = self.track.intensity
+        self.colors = self.intensity_rgba[self.intensities]
+        self.motion = kinematics.TrackKinematics.for_store(source).storm(self.track)
+        self.stats = analytics.CatalogStats.for_store(source).storm(self.track)
+        self.known_stats = None
+        self.steps = np.arange(len(self.track))
+        
+    def plot_limits(self):
+        """Axis limits fitting the current storm"""
+        return plot_limits(self.lngs, self.lats, self.pressures, self.winds, len(self.track))
+    
+    def frame_stats(self, frame):
+        """Storm statistics as known at fix frame, or of the whole track in the summary view"""
+        if self.event_summary:
+            return self.stats
+        if self.known_stats is None or self.known_stats[0] != frame:
+            self.known_stats = (frame, self.stats.until(frame))
+        return self.known_stats[1]
+    
+    def typhoon_info(self, frame, sample=None):
+        """Information text of fix frame, or of an interpolated TrackSample after it"""
+        if frame >= len(self.track):
+            return None
+        if sample is None:
+            pressure, wind = self.pressures[frame], self.winds[frame]
+            lat, lng = self.lats[frame], self.lngs[frame]
+        else:
+            pressure, wind, lat, lng = sample.pressure, sample.wind, sample.lat, sample.lng
+        if sample is None or sample.time is None:
+            time = self.track.timestamp_text(frame)
+        else:
+            time = np.datetime_as_string(sample.time).replace('T', ' ')
+        
+        info_text = (
+            f"Typhoon: {self.track.name}\n"
+            f"Time: {time}\n"
+            f"Intensity: {self.intensity_labels[self.intensities[frame]]}\n"
+            f"Pressure: {pressure:.0f} hPa\n"
+            f"Wind Speed: {wind:.0f} km/h\n"
+            f"Position: {lat:.1f}°N, {lng:.1f}°E"
+        )
+        
+        # Movement from the precomputed track kinematics
+        if frame > 0:
+            direction = kinematics.compass_name(self.motion.direction[frame])
+            info_text += f"\nMovement: {direction}"
+            if not np.isnan(self.motion.speed_kmh[frame]):
+                info_text += f" at {self.motion.speed_kmh[frame]:.0f} km/h"
+            info_text += f"\nDistance: {self.motion.distance_km[frame]:.0f} km"
+        
+        # Intensity events from the catalog statistics, up to this fix
+        change = self.stats.wind_change_past_24h[frame]
+        if not np.isnan(change):
+            event = " (RI)" if change >= analytics.RAPID_CHANGE_KMH else (
+                " (RW)" if change <= -analytics.RAPID_CHANGE_KMH else "")
+            info_text += f"\nPast 24h: {change:+.0f} km/h{event}"
+        info_text += "\n" + "\n".join(self.frame_stats(frame).summary())
+        return info_text
+    
+    def calculate_direction(self, lat1, lng1, lat2, lng2):
+        """Calculate movement direction on the 16-point compass"""
+        return calculate_direction(lat1, lng1, lat2, lng2)
@@ -0,0 +1,192 @@
+"""Headless, parallel export of typhoon animations to video and frame sequences
+
+Frames are rendered with the Agg backend in a pool of worker processes.
+Every worker owns one off-screen TyphoonTracker3D and renders contiguous
+chunks of frames, so the per-storm artists and cached background are reused
+across a chunk. Results come back in submission order and are assembled into
+PNG sequences, GIFs or MP4 files.
+"""
+import io
+import math
+import os
+import shutil
+import subprocess
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+EXPORT_FORMATS = ("png", "gif", "mp4")
+
+# Frames rendered by one task; larger chunks amortise the per-storm setup
+DEFAULT_CHUNK_SIZE = 16
+
+_tracker = None
+
+
+def _init_worker(catalog, catalog_format, render_mode, dpi, coastlines=None, use_cache=True, store=None):
+    """Build the off-screen tracker owned by this worker process
+
+    The catalog is memory-mapped from its cache, or, without the cache, the
+    store parsed by the parent process is passed in.
+    """
+    global _tracker
+    import matplotlib
+    matplotlib.use("Agg", force=True)
+
+    import best_track
+    from main import TyphoonTracker3D
+
+    if store is None and catalog:
+        store = best_track.open_catalog(catalog, fmt=catalog_format, use_cache=use_cache)
+    _tracker = TyphoonTracker3D(render_mode=render_mode, store=store, coastlines=coastlines)
+    if dpi:
+        _tracker.fig.set_dpi(dpi)
+
+
+def _encode_png(rgba):
+    from PIL import Image
+    buffer = io.BytesIO()
+    Image.fromarray(rgba).save(buffer, format="PNG", compress_level=1)
+    return buffer.getvalue()
+
+
+def _render_chunk(storm, frames, frame_dir=None):
+    """Render frames of storm; write them to frame_dir or return PNG bytes"""
+    if _tracker.current_typhoon != storm or _tracker.track is None:
+        _tracker.load_typhoon_data(storm)
+
+    results = []
+    for frame in frames:
+        png = _encode_png(_tracker.render_frame(frame))
+        if frame_dir is None:
+            results.append(png)
+        else:
+            path = os.path.join(frame_dir, f"frame_{frame:05d}.png")
+            with open(path, "wb") as frame_file:
+                frame_file.write(png)
+            results.append(path)
+    return results
+
+
+def _frame_chunks(n_frames, chunk_size):
+    return [range(start, min(start + chunk_size, n_frames)) for start in range(0, n_frames, chunk_size)]
+
+
+def _output_format(output, fmt):
+    if fmt is None:
+        extension = os.path.splitext(output)[1].lower().lstrip(".")
+        fmt = extension if extension in EXPORT_FORMATS else "png"
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    return fmt
+
+
+def _write_gif(path, pngs, fps):
+    from PIL import Image
+    images = [Image.open(io.BytesIO(png)).convert("RGB") for png in pngs]
+    if not images:
+        return
+    images[0].save(path, save_all=True, append_images=images[1:],
+                   duration=int(1000 / fps), loop=0)
+
+
+class _Mp4Writer:
+    """Stream PNG frames into an ffmpeg process"""
+    def __init__(self, path, fps):
+        ffmpeg = shutil.which("ffmpeg")
+        if ffmpeg is None:
+            raise RuntimeError("MP4 export requires ffmpeg on the PATH")
+        self.process = subprocess.Popen(
+            [ffmpeg, "-loglevel", "error", "-y", "-f", "image2pipe", "-framerate", str(fps),
+             "-c:v", "png", "-i", "-", "-c:v", "libx264", "-pix_fmt", "yuv420p",
+             "-vf", "pad=ceil(iw/2)*2:ceil(ih/2)*2", path],
+            stdin=subprocess.PIPE,
+        )
+
+    def write(self, png):
+        self.process.stdin.write(png)
+
+    def close(self):
+        self.process.stdin.close()
+        if self.process.wait() != 0:
+            raise RuntimeError(f"ffmpeg exited with status {self.process.returncode}")
+
+
+def _assemble(output, storm_format, futures, fps):
+    if storm_format == "png":
+        for future in futures:
+            future.result()
+    elif storm_format == "gif":
+        _write_gif(output, [png for future in futures for png in future.result()], fps)
+    else:
+        writer = _Mp4Writer(output, fps)
+        try:
+            for future in futures:
+                for png in future.result():
+                    writer.write(png)
+        finally:
+            writer.close()
+
+
+def export_storms(jobs, fmt=None, workers=None, catalog=None, catalog_format=None,
+                  render_mode="blit", dpi=None, fps=4, chunk_size=DEFAULT_CHUNK_SIZE, coastlines=None,
+                  use_cache=True):
+    """Render every (storm, output) job with one shared process pool
+
+    output is a directory for PNG sequences, or a .gif/.mp4 file. Returns
+    the list of written outputs in job order. With use_cache=False the
+    catalog's cache is neither read nor written: it is parsed once here and
+    the parsed store is sent to every worker.
+    """
+    import best_track
+    from track_store import TrackStore
+
+    # Parse (or validate the cache of) the catalog once before the workers
+    # start, so every worker just memory-maps it
+    if catalog:
+        store = best_track.open_catalog(catalog, fmt=catalog_format, use_cache=use_cache)
+    else:
+        from core import SAMPLE_TYPHOONS
+        store = TrackStore.from_typhoon_data(SAMPLE_TYPHOONS)
+
+    workers = workers or os.cpu_count() or 1
+    # Bound the rendered-but-unassembled frames held in memory
+    max_in_flight = workers * 4
+    outputs = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(catalog, catalog_format, render_mode, dpi, coastlines, use_cache,
+                                       None if use_cache or not catalog else store)) as pool:
+        pending = deque()
+        in_flight = 0
+        jobs = iter(jobs)
+        while True:
+            # Keep the pool busy across storm boundaries
+            while in_flight < max_in_flight:
+                job = next(jobs, None)
+                if job is None:
+                    break
+                storm, output = job
+                storm_format = _output_format(output, fmt)
+                n_frames = len(store.storm(storm))
+                size = min(chunk_size, max(1, math.ceil(n_frames / workers)))
+                frame_dir = None
+                if storm_format == "png":
+                    os.makedirs(output, exist_ok=True)
+                    frame_dir = output
+                futures = [pool.submit(_render_chunk, storm, frames, frame_dir)
+                           for frames in _frame_chunks(n_frames, size)]
+                pending.append((output, storm_format, futures))
+                in_flight += len(futures)
+            if not pending:
+                break
+
+            # Assemble the oldest output from its chunks in frame order
+            output, storm_format, futures = pending.popleft()
+            in_flight -= len(futures)
+            _assemble(output, storm_format, futures, fps)
+            outputs.append(output)
+    return outputs
+
+
+def export_storm(storm, output, **kwargs):
+    """Render a single storm; see export_storms for the options"""
+    return export_storms([(storm, output)], **kwargs)[0]
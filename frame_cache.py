@@ -0,0 +1,212 @@
+"""Rendered-frame cache for instant scrubbing and storm switching
+
+Rendered canvas buffers are kept in an LRU keyed by (storm, frame, size)
+and bounded by a byte budget, so stepping back through a storm or
+returning to a recently viewed one only copies a cached buffer into the
+canvas and blits it. An optional FramePrefetcher renders the frames next
+to the shown one on a background thread with its own off-screen tracker;
+matplotlib is not thread-safe, so the GUI only starts one on request.
+
+Only the band of the figure between the control buttons and the help line
+of the GUI is cached (FRAME_REGION); everything a frame changes lies
+inside it, and the off-screen tracker has neither buttons nor help line.
+"""
+import threading
+import warnings
+from collections import OrderedDict, deque
+
+import numpy as np
+
+# Memory budget of the cache; a 16x12 inch frame at 100 dpi is about 7 MB
+DEFAULT_CACHE_MB = 512
+
+# Frames a prefetcher renders ahead of the shown one (and half as many behind it)
+DEFAULT_PREFETCH = 8
+
+# Milliseconds a cached first frame of a storm stays on screen before its
+# views are rebuilt, so the switch is shown before that work starts
+VIEW_REBUILD_DELAY_MS = 100
+
+# Bottom and top of the cached band in figure coordinates
+FRAME_REGION = (0.07, 0.96)
+
+
+def region_rows(height):
+    """Buffer rows (top, bottom) of FRAME_REGION for a canvas height in pixels"""
+    bottom, top = FRAME_REGION
+    return int(round(height * (1 - top))), int(round(height * (1 - bottom)))
+
+
+def crop_frame(rgba):
+    """Copy of the FRAME_REGION band of an RGBA canvas buffer"""
+    top, bottom = region_rows(rgba.shape[0])
+    return np.array(rgba[top:bottom])
+
+
+def prefetch_order(frame, n_frames, direction=1, count=DEFAULT_PREFETCH):
+    """Frames to render next: count in the scrub direction, then count // 2 behind"""
+    direction = 1 if direction >= 0 else -1
+    ahead = [frame + direction * step for step in range(1, count + 1)]
+    behind = [frame - direction * step for step in range(1, count // 2 + 1)]
+    return [f for f in ahead + behind if 0 <= f < n_frames]
+
+
+class FrameCache:
+    """LRU of rendered frames with a byte budget; safe to share between threads"""
+    def __init__(self, max_bytes=DEFAULT_CACHE_MB * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.frames = OrderedDict()
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __contains__(self, key):
+        return key in self.frames
+
+    def get(self, key):
+        """Cached frame of key, now the most recently used, or None"""
+        with self.lock:
+            frame = self.frames.get(key)
+            if frame is None:
+                self.misses += 1
+                return None
+            self.frames.move_to_end(key)
+            self.hits += 1
+            return frame
+
+    def put(self, key, frame):
+        """Store frame under key, evicting the least recently used frames over budget"""
+        if frame.nbytes > self.max_bytes:
+            return False
+        with self.lock:
+            previous = self.frames.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous.nbytes
+            self.frames[key] = frame
+            self.nbytes += frame.nbytes
+            while self.nbytes > self.max_bytes:
+                _, evicted = self.frames.popitem(last=False)
+                self.nbytes -= evicted.nbytes
+                self.evictions += 1
+        return True
+
+    def discard(self, storm=None):
+        """Drop the frames of storm, or every frame"""
+        with self.lock:
+            keys = [key for key in self.frames if storm is None or key[0] == storm]
+            for key in keys:
+                self.nbytes -= self.frames.pop(key).nbytes
+        return len(keys)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "frames": len(self.frames),
+            "mb": self.nbytes / 2 ** 20,
+            "budget_mb": self.max_bytes / 2 ** 20,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            "evictions": self.evictions,
+        }
+
+
+class FramePrefetcher:
+    """Render requested frames into a FrameCache on a daemon thread
+
+    make_tracker builds the off-screen tracker (see TyphoonTracker3D's
+    offscreen option) on the thread, on the first request. Only the latest
+    request is worked on: a new one supersedes the frames still pending.
+    Rendering errors are kept in errors.
+    """
+    def __init__(self, cache, make_tracker):
+        self.cache = cache
+        self.make_tracker = make_tracker
+        self.tracker = None
+        self.rendered = 0
+        self.errors = deque(maxlen=100)
+        self.thread = None
+        self._condition = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._busy = False
+        self._running = False
+
+    def start(self):
+        self._running = True
+        self.thread = threading.Thread(target=self._run, name="frame-prefetch", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self, timeout=2.0):
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def request(self, storm, frames, size, figsize, dpi):
+        """Render frames of storm at size (pixels), i.e. figsize (inches) at dpi"""
+        with self._condition:
+            self._pending = (storm, list(frames), size, tuple(figsize), dpi)
+            self._generation += 1
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """Block until every requested frame is rendered; False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending is None and not self._busy, timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending is not None or not self._running)
+                if not self._running:
+                    return
+                job, generation = self._pending, self._generation
+                self._pending = None
+                self._busy = True
+            try:
+                self._render_job(job, generation)
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def _render_job(self, job, generation):
+        storm, frames, size, figsize, dpi = job
+        for frame in frames:
+            if self._generation != generation:
+                # Superseded by a newer request
+                return
+            key = (storm, frame, size)
+            if key in self.cache:
+                continue
+            try:
+                rgba = self._render(storm, frame, figsize, dpi)
+            except Exception as error:
+                self.errors.append({"storm": storm, "frame": frame,
+                                    "type": type(error).__name__, "message": str(error)})
+                warnings.warn(f"prefetch of {storm} frame {frame} failed: {error!r}", RuntimeWarning)
+                return
+            if rgba.shape[1::-1] == size:
+                self.cache.put(key, crop_frame(rgba))
+                self.rendered += 1
+
+    def _render(self, storm, frame, figsize, dpi):
+        tracker = self.tracker
+        if tracker is None:
+            tracker = self.tracker = self.make_tracker()
+        fig = tracker.fig
+        if fig.dpi != dpi:
+            fig.set_dpi(dpi)
+        if tuple(fig.get_size_inches()) != figsize:
+            fig.set_size_inches(figsize)
+        if tracker.current_typhoon != storm or tracker.track is None:
+            tracker.load_typhoon_data(storm)
+        return tracker.render_frame(frame)
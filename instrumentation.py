@@ -0,0 +1,215 @@
+"""Low-overhead timing spans, counters and error records for the render loop
+
+A disabled Profiler hands out one shared no-op context manager, so an
+instrumented call site costs a method call and a flag test. When enabled,
+spans are kept as events for Chrome trace export (chrome://tracing or
+Perfetto) and aggregated per name for the JSON summary.
+"""
+import json
+import time
+import traceback
+from collections import deque
+from contextlib import nullcontext
+
+import numpy as np
+
+NULL_SPAN = nullcontext()
+
+# Raw events kept for the Chrome trace; older events are dropped
+DEFAULT_MAX_EVENTS = 200000
+
+# Frames averaged by the on-screen FPS overlay
+FPS_WINDOW = 60
+
+# Frame intervals kept for the percentiles of the summary; its mean and
+# maximum cover every frame
+DEFAULT_MAX_FRAMES = 100000
+
+
+class _Span:
+    """Context manager timing one span"""
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_span(self.name, self.start, time.perf_counter() - self.start)
+        return False
+
+
+class Profiler:
+    """Timed spans, per-frame counters and error records of one tracker"""
+    def __init__(self, enabled=False, max_events=DEFAULT_MAX_EVENTS, max_frames=DEFAULT_MAX_FRAMES):
+        self.enabled = enabled
+        self.max_events = max_events
+        self.max_frames = max_frames
+        self.errors = deque(maxlen=100)
+        self.reset()
+
+    def reset(self):
+        """Drop every collected span, counter and frame time"""
+        self.origin = time.perf_counter()
+        self.events = deque(maxlen=self.max_events)
+        self.spans = {}
+        self.counters = {}
+        self.frame_intervals = deque(maxlen=self.max_frames)
+        # Count, total and maximum of every frame interval
+        self.frame_times = [0, 0.0, 0.0]
+        self.recent_intervals = deque(maxlen=FPS_WINDOW)
+        self.frames = 0
+        self.last_frame_start = None
+        self.previous_artists = set()
+
+    def span(self, name):
+        """Context manager timing name; a shared no-op when disabled"""
+        if not self.enabled:
+            return NULL_SPAN
+        return _Span(self, name)
+
+    def add_span(self, name, start, duration):
+        self.events.append(("X", name, start, duration, self.frames))
+        stats = self.spans.get(name)
+        if stats is None:
+            stats = self.spans[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += duration
+        if duration > stats[2]:
+            stats[2] = duration
+
+    def instrument(self, obj, method, name=None):
+        """Time every call of obj.method as a span while enabled"""
+        original = getattr(obj, method)
+        name = name or method
+        profiler = self
+
+        def timed(*args, **kwargs):
+            if not profiler.enabled:
+                return original(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profiler.add_span(name, start, time.perf_counter() - start)
+
+        setattr(obj, method, timed)
+        return timed
+
+    def count(self, name, value=1):
+        """Add value to a counter and record it as a trace sample"""
+        if not self.enabled:
+            return
+        self.counters[name] = self.counters.get(name, 0) + value
+        self.events.append(("C", name, time.perf_counter(), value, self.frames))
+
+    def count_new_artists(self, axes):
+        """Count artists in axes that were not there at the previous frame"""
+        if not self.enabled:
+            return
+        current = set()
+        for ax in axes:
+            current.update(ax.get_children())
+        self.count("artists_created", len(current - self.previous_artists))
+        self.previous_artists = current
+
+    def begin_frame(self):
+        """Mark the start of a frame; the time between starts gives the frame rate"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        if self.last_frame_start is not None:
+            interval = now - self.last_frame_start
+            self.frame_intervals.append(interval)
+            self.recent_intervals.append(interval)
+            times = self.frame_times
+            times[0] += 1
+            times[1] += interval
+            if interval > times[2]:
+                times[2] = interval
+        self.last_frame_start = now
+        self.frames += 1
+
+    def record_error(self, stage, error):
+        """Keep an exception with its traceback; recorded even when disabled"""
+        record = {
+            "frame": self.frames,
+            "stage": stage,
+            "type": type(error).__name__,
+            "message": str(error),
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__)),
+        }
+        self.errors.append(record)
+        return record
+
+    def status_text(self):
+        """One-line frame rate and latency of the recent frames"""
+        if not self.recent_intervals:
+            return "FPS --"
+        intervals = np.fromiter(self.recent_intervals, dtype=np.float64)
+        text = f"FPS {1.0 / intervals.mean():5.1f}  frame {intervals.mean() * 1000:6.1f} ms"
+        update = self.spans.get("update")
+        if update and update[0]:
+            text += f"  update {update[1] / update[0] * 1000:5.1f} ms"
+        return text
+
+    def summary(self):
+        """Aggregated spans, counters, frame times and errors as a dict
+
+        Frame time percentiles are those of the last max_frames frames.
+        """
+        frames = {"count": self.frames, "fps": None}
+        count, total, longest = self.frame_times
+        if count:
+            intervals = np.fromiter(self.frame_intervals, dtype=np.float64) * 1000
+            frames.update({
+                "fps": float(count / total),
+                "mean_ms": float(total / count * 1000),
+                "p50_ms": float(np.percentile(intervals, 50)),
+                "p90_ms": float(np.percentile(intervals, 90)),
+                "p99_ms": float(np.percentile(intervals, 99)),
+                "max_ms": float(longest * 1000),
+            })
+        return {
+            "enabled": self.enabled,
+            "frames": frames,
+            "spans": {
+                name: {
+                    "count": count,
+                    "total_ms": total * 1000,
+                    "mean_ms": total / count * 1000,
+                    "max_ms": longest * 1000,
+                }
+                for name, (count, total, longest) in self.spans.items()
+            },
+            "counters": {
+                name: {"total": total, "per_frame": total / self.frames if self.frames else None}
+                for name, total in self.counters.items()
+            },
+            "errors": list(self.errors),
+        }
+
+    def chrome_trace(self):
+        """Collected events in the Chrome trace event format"""
+        events = []
+        for kind, name, start, value, frame in self.events:
+            timestamp = (start - self.origin) * 1e6
+            if kind == "X":
+                events.append({"name": name, "ph": "X", "ts": timestamp, "dur": value * 1e6,
+                               "pid": 0, "tid": 0, "args": {"frame": frame}})
+            else:
+                events.append({"name": name, "ph": "C", "ts": timestamp, "pid": 0, "tid": 0,
+                               "args": {name: value}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def write_json(self, path):
+        with open(path, "w") as output:
+            json.dump(self.summary(), output, indent=2)
+
+    def write_chrome_trace(self, path):
+        with open(path, "w") as output:
+            json.dump(self.chrome_trace(), output)
@@ -0,0 +1,132 @@
+"""Lazily generated sub-step samples between best-track fixes
+
+Positions follow the great circle between consecutive fixes, pressure and
+wind a Catmull-Rom spline through the neighbouring fixes. Samples are
+computed vectorized one chunk of segments at a time and yielded one by one,
+so a densified track is never materialised as a whole.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from track_store import fill_missing_times
+
+# index is the last fix at or before the sample, fraction the position
+# (0 <= fraction < 1) along the segment to the next fix
+TrackSample = namedtuple("TrackSample", "index fraction lat lng pressure wind time")
+
+# Segments interpolated per vectorized chunk
+DEFAULT_CHUNK_SEGMENTS = 64
+
+
+def _unit_vectors(lat, lng):
+    lat = np.radians(lat)
+    lng = np.radians(lng)
+    return np.stack((np.cos(lat) * np.cos(lng), np.cos(lat) * np.sin(lng), np.sin(lat)), axis=-1)
+
+
+def slerp_positions(lat0, lng0, lat1, lng1, fraction):
+    """Great-circle interpolation; all arguments broadcast together"""
+    p0 = _unit_vectors(np.asarray(lat0, dtype=np.float64), np.asarray(lng0, dtype=np.float64))
+    p1 = _unit_vectors(np.asarray(lat1, dtype=np.float64), np.asarray(lng1, dtype=np.float64))
+    fraction = np.asarray(fraction, dtype=np.float64)[..., None]
+
+    omega = np.arccos(np.clip(np.sum(p0 * p1, axis=-1, keepdims=True), -1.0, 1.0))
+    sin_omega = np.sin(omega)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        w0 = np.where(sin_omega > 1e-12, np.sin((1 - fraction) * omega) / sin_omega, 1 - fraction)
+        w1 = np.where(sin_omega > 1e-12, np.sin(fraction * omega) / sin_omega, fraction)
+    p = w0 * p0 + w1 * p1
+
+    lat = np.degrees(np.arcsin(np.clip(p[..., 2] / np.linalg.norm(p, axis=-1), -1.0, 1.0)))
+    lng = np.degrees(np.arctan2(p[..., 1], p[..., 0]))
+    # Keep longitudes on the same branch as the track (e.g. 0-360 east)
+    reference = np.asarray(lng0, dtype=np.float64)
+    lng = reference + (lng - reference + 180.0) % 360.0 - 180.0
+    return lat, lng
+
+
+def catmull_rom(values, segment, fraction):
+    """Catmull-Rom spline of values at segment + fraction, clamped at the ends"""
+    values = np.asarray(values, dtype=np.float64)
+    last = len(values) - 1
+    p0 = values[np.clip(segment - 1, 0, last)]
+    p1 = values[segment]
+    p2 = values[np.clip(segment + 1, 0, last)]
+    p3 = values[np.clip(segment + 2, 0, last)]
+    t = fraction
+    t2 = t * t
+    t3 = t2 * t
+    return 0.5 * (2 * p1 + (p2 - p0) * t + (2 * p0 - 5 * p1 + 4 * p2 - p3) * t2
+                  + (3 * p1 - p0 - 3 * p2 + p3) * t3)
+
+
+class TrackInterpolator:
+    """Sub-step samples of one track, generated lazily in chunks
+
+    Iterating yields TrackSample tuples: substeps samples per segment plus
+    the final fix, i.e. (n - 1) * substeps + 1 samples in total.
+    """
+    def __init__(self, lat, lng, pressure, wind, times=None, substeps=10,
+                 chunk_segments=DEFAULT_CHUNK_SEGMENTS):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lng = np.asarray(lng, dtype=np.float64)
+        self.pressure = np.asarray(pressure, dtype=np.float64)
+        self.wind = np.asarray(wind, dtype=np.float64)
+        self.times = None
+        if times is not None:
+            # Missing fix times take a neighbouring fix's time, as in clock.StormTimeline;
+            # a track without any time gets samples without one
+            times = fill_missing_times(times, [0, len(self.lat)])
+            if not np.isnat(times).any():
+                self.times = times
+        self.substeps = max(1, int(substeps))
+        self.chunk_segments = max(1, int(chunk_segments))
+
+    def __len__(self):
+        n = len(self.lat)
+        return (n - 1) * self.substeps + 1 if n else 0
+
+    def chunks(self):
+        """Yield dicts of sample arrays, one chunk of segments at a time"""
+        n = len(self.lat)
+        if n == 0:
+            return
+        fractions = np.arange(self.substeps) / self.substeps
+        for first in range(0, n - 1, self.chunk_segments):
+            segments = np.arange(first, min(first + self.chunk_segments, n - 1))
+            segment = np.repeat(segments, self.substeps)
+            fraction = np.tile(fractions, len(segments))
+            yield self._sample_arrays(segment, fraction)
+
+        # The final fix closes the track
+        yield self._sample_arrays(np.array([n - 1]), np.zeros(1))
+
+    def _sample_arrays(self, segment, fraction):
+        following = np.minimum(segment + 1, len(self.lat) - 1)
+        lat, lng = slerp_positions(self.lat[segment], self.lng[segment],
+                                   self.lat[following], self.lng[following], fraction)
+        samples = {
+            "index": segment,
+            "fraction": fraction,
+            "lat": lat,
+            "lng": lng,
+            "pressure": catmull_rom(self.pressure, segment, fraction),
+            "wind": np.maximum(catmull_rom(self.wind, segment, fraction), 0.0),
+            "time": None,
+        }
+        if self.times is not None:
+            step = (self.times[following] - self.times[segment]).astype(np.float64)
+            samples["time"] = self.times[segment] + np.round(step * fraction).astype("timedelta64[m]")
+        return samples
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            times = chunk["time"]
+            for i in range(len(chunk["index"])):
+                yield TrackSample(
+                    int(chunk["index"][i]), float(chunk["fraction"][i]),
+                    float(chunk["lat"][i]), float(chunk["lng"][i]),
+                    float(chunk["pressure"][i]), float(chunk["wind"][i]),
+                    None if times is None else times[i],
+                )
@@ -0,0 +1,110 @@
+"""Vectorized track kinematics for whole catalogs
+
+Great-circle bearing, 16-point compass direction, translation speed and
+cumulative distance are computed for every fix of every storm in a single
+NumPy pass over the columnar TrackStore arrays.
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0088
+
+COMPASS_POINTS = (
+    "North", "North-Northeast", "Northeast", "East-Northeast",
+    "East", "East-Southeast", "Southeast", "South-Southeast",
+    "South", "South-Southwest", "Southwest", "West-Southwest",
+    "West", "West-Northwest", "Northwest", "North-Northwest",
+)
+
+# Direction code used for the first fix of a storm and for stationary fixes
+NO_DIRECTION = -1
+
+# Moves shorter than this are reported as stationary
+STATIONARY_KM = 1.0
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def initial_bearing(lat1, lng1, lat2, lng2):
+    """Initial great-circle bearing in degrees clockwise from north, in [0, 360)"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lng1, lat2, lng2))
+    d_lng = lng2 - lng1
+    x = np.sin(d_lng) * np.cos(lat2)
+    y = np.cos(lat1) * np.sin(lat2) - np.sin(lat1) * np.cos(lat2) * np.cos(d_lng)
+    return np.degrees(np.arctan2(x, y)) % 360.0
+
+
+def compass_index(bearing):
+    """16-point compass code of a bearing in degrees"""
+    return (np.floor((np.asarray(bearing) + 11.25) / 22.5).astype(np.int64) % 16).astype(np.int8)
+
+
+def compass_name(code):
+    """Direction name of a compass code"""
+    return "Stationary" if code == NO_DIRECTION else COMPASS_POINTS[code]
+
+
+class TrackKinematics:
+    """Per-fix kinematic columns aligned with the rows of a TrackStore
+
+    The first fix of every storm has no previous fix: its bearing and speed
+    are NaN, its direction is NO_DIRECTION and its distances are zero.
+    """
+    def __init__(self, bearing, direction, segment_km, distance_km, speed_kmh):
+        self.bearing = bearing
+        self.direction = direction
+        self.segment_km = segment_km
+        self.distance_km = distance_km
+        self.speed_kmh = speed_kmh
+
+    @classmethod
+    def compute(cls, store):
+        """Compute every column for the whole catalog in one vectorized pass"""
+        lat = store.lat.astype(np.float64)
+        lng = store.lng.astype(np.float64)
+        n = len(lat)
+        starts = store.offsets[:-1][store.lengths > 0]
+
+        # Quantities of the segment ending at each fix, from the previous fix
+        segment_km = np.zeros(n)
+        bearing = np.full(n, np.nan)
+        hours = np.full(n, np.nan)
+        if n > 1:
+            segment_km[1:] = haversine_km(lat[:-1], lng[:-1], lat[1:], lng[1:])
+            bearing[1:] = initial_bearing(lat[:-1], lng[:-1], lat[1:], lng[1:])
+            hours[1:] = np.diff(store.time).astype(np.float64) / 60.0
+
+        # Segments across storm boundaries do not exist
+        segment_km[starts] = 0.0
+        bearing[starts] = np.nan
+        hours[starts] = np.nan
+
+        direction = np.full(n, NO_DIRECTION, dtype=np.int8)
+        moving = segment_km >= STATIONARY_KM
+        direction[moving] = compass_index(bearing[moving])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed_kmh = np.where(hours > 0, segment_km / hours, np.nan)
+
+        # Cumulative distance restarted at the first fix of each storm
+        cumulative = np.cumsum(segment_km)
+        distance_km = cumulative - np.repeat(cumulative[starts], store.lengths[store.lengths > 0])
+        return cls(bearing, direction, segment_km, distance_km, speed_kmh)
+
+    @classmethod
+    def for_store(cls, store):
+        """Kinematics of store, computed once and cached alongside its arrays"""
+        kinematics = store.derived.get("kinematics")
+        if kinematics is None:
+            kinematics = store.derived["kinematics"] = cls.compute(store)
+        return kinematics
+
+    def storm(self, track):
+        """Zero-copy slice of the columns for one StormTrack"""
+        part = slice(track.start, track.stop)
+        return TrackKinematics(self.bearing[part], self.direction[part], self.segment_km[part],
+                               self.distance_km[part], self.speed_kmh[part])
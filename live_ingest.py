@@ -0,0 +1,456 @@
+"""Live advisory ingestion for active storms
+
+An AdvisoryFeed runs an asyncio loop in a background thread that tails
+growing advisory files and accepts advisory lines on a local TCP socket.
+Parsed fixes are put on a thread-safe queue; the GUI drains it from a timer
+and appends them to LiveTracks, whose columns grow by capacity doubling so
+each append is amortized O(1) and the kinematics of only the new fixes are
+computed.
+
+Advisory lines are either JSON objects or comma separated fields
+    name, time, lat, lng, pressure (hPa), wind (km/h)[, intensity]
+with the time as ISO 8601 or YYYYMMDDHH. Without an intensity category the
+fix is classified from its wind. Blank lines and lines starting with # are
+ignored.
+"""
+import asyncio
+import json
+import os
+import queue
+import threading
+from collections import deque
+
+import numpy as np
+
+import kinematics
+from track_store import (INTENSITY_CODES, INTENSITY_LEVELS, TIME_DTYPE, TRACK_COLUMNS, classify_wind,
+                         parse_timestamps)
+
+ADVISORY_FIELDS = ("name", "timestamp", "lat", "lng", "pressure", "wind", "intensity")
+
+# Seconds between size checks of a tailed file
+DEFAULT_POLL_INTERVAL = 1.0
+
+# Milliseconds between GUI drains of the advisory queue
+DEFAULT_DRAIN_INTERVAL_MS = 500
+
+# Rows a new LiveTrack has room for before its first reallocation
+INITIAL_CAPACITY = 64
+
+# Share of a LiveTrack's fixes appended since its level-of-detail importances
+# were computed before they are computed again
+LOD_REFRESH_FRACTION = 0.25
+
+# Per-fix kinematic columns kept next to the track columns
+MOTION_COLUMNS = {
+    "bearing": np.float64,
+    "direction": np.int8,
+    "segment_km": np.float64,
+    "distance_km": np.float64,
+    "speed_kmh": np.float64,
+}
+
+
+def parse_time(text):
+    """Advisory time (ISO 8601 or YYYYMMDDHH) as 'YYYY-MM-DD HH:MM'"""
+    text = text.strip().rstrip("Z")
+    if len(text) == 10 and text.isdigit():
+        text = f"{text[0:4]}-{text[4:6]}-{text[6:8]}T{text[8:10]}"
+    return np.datetime_as_string(np.datetime64(text, "m")).replace("T", " ")
+
+
+def _float(value):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return np.nan
+    return float(value)
+
+
+def parse_advisory(line):
+    """Fix dict of one advisory line, None for blank and comment lines
+
+    Raises ValueError (or KeyError for JSON without a required field) on
+    malformed lines.
+    """
+    line = line.strip()
+    if not line or line.startswith("#"):
+        return None
+    if line.startswith("{"):
+        record = json.loads(line)
+        if "time" in record and "timestamp" not in record:
+            record["timestamp"] = record["time"]
+    else:
+        record = dict(zip(ADVISORY_FIELDS, (field.strip() for field in line.split(","))))
+        if len(record) < len(ADVISORY_FIELDS) - 1:
+            raise ValueError(f"expected at least {len(ADVISORY_FIELDS) - 1} fields: {line!r}")
+
+    wind = _float(record.get("wind"))
+    level = record.get("intensity")
+    if level in INTENSITY_CODES:
+        intensity = INTENSITY_CODES[level]
+    elif level is None or level == "":
+        intensity = int(classify_wind(wind))
+    else:
+        raise ValueError(f"unknown intensity {level!r}, expected one of {', '.join(INTENSITY_LEVELS)}")
+    return {
+        "name": str(record["name"]).strip(),
+        "timestamp": parse_time(str(record["timestamp"])),
+        "lat": float(record["lat"]),
+        "lng": float(record["lng"]) % 360,
+        "pressure": _float(record.get("pressure")),
+        "wind": wind,
+        "intensity": intensity,
+    }
+
+
+class LiveTrack:
+    """Growing track of one active storm
+
+    Columns live in buffers that double their capacity when full; the
+    attributes are views of the filled part, so they must be re-read after
+    each extend. A LiveTrack is also a one-storm store, which lets the
+    tracker and the level-of-detail code treat it like a catalog storm.
+    """
+    def __init__(self, name, capacity=INITIAL_CAPACITY):
+        self.name = name
+        self.names = [name]
+        self.name_index = {name: 0}
+        self.index = 0
+        self.start = 0
+        self.n = 0
+        self.capacity = capacity
+        self.dropped = 0
+        self.version = 0
+        # Fixes appended since the level-of-detail importances were computed
+        self.lod_pending = 0
+        self._buffers = {column: np.empty(capacity, dtype=dtype)
+                         for column, dtype in (TRACK_COLUMNS | {"time": TIME_DTYPE} | MOTION_COLUMNS).items()}
+        self.derived = {}
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, name):
+        return name == self.name
+
+    @property
+    def stop(self):
+        return self.n
+
+    @property
+    def n_fixes(self):
+        return self.n
+
+    @property
+    def offsets(self):
+        return np.array([0, self.n], dtype=np.int64)
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def lat(self):
+        return self._buffers["lat"][:self.n]
+
+    @property
+    def lng(self):
+        return self._buffers["lng"][:self.n]
+
+    @property
+    def pressure(self):
+        return self._buffers["pressure"][:self.n]
+
+    @property
+    def wind(self):
+        return self._buffers["wind"][:self.n]
+
+    @property
+    def intensity(self):
+        return self._buffers["intensity"][:self.n]
+
+    @property
+    def timestamp(self):
+        return self._buffers["timestamp"][:self.n]
+
+    @property
+    def time(self):
+        return self._buffers["time"][:self.n]
+
+    @property
+    def motion(self):
+        """TrackKinematics views of the filled rows"""
+        return kinematics.TrackKinematics(*(self._buffers[column][:self.n] for column in MOTION_COLUMNS))
+
+    def storm(self, key=None):
+        return self
+
+    def intensity_level(self, i):
+        """Intensity category label of fix i"""
+        return INTENSITY_LEVELS[self.intensity[i]]
+
+    def timestamp_text(self, i):
+        """Timestamp of fix i as text"""
+        return self.timestamp[i].decode("ascii")
+
+    def extend(self, fixes):
+        """Append fixes newer than the last one; first new row, or None if none was new
+
+        Repeated and out-of-order advisories are counted in dropped.
+        """
+        last = self.timestamp[-1] if self.n else None
+        rows = []
+        for fix in fixes:
+            stamp = fix["timestamp"].encode("ascii")
+            if last is not None and stamp <= last:
+                self.dropped += 1
+                continue
+            rows.append(fix)
+            last = stamp
+        if not rows:
+            return None
+
+        first = self.n
+        self._reserve(first + len(rows))
+        for column in TRACK_COLUMNS:
+            self._buffers[column][first:first + len(rows)] = [fix[column] for fix in rows]
+        self.n = first + len(rows)
+        self._buffers["time"][first:self.n] = parse_timestamps(self._buffers["timestamp"][first:self.n])
+        self._extend_motion(first)
+
+        # Kinematics are maintained here and level-of-detail importances are
+        # only recomputed once the track grew by LOD_REFRESH_FRACTION since
+        # they were; other derived data is recomputed on demand
+        lod = self.derived.get("lod")
+        self.derived = {"kinematics": self.motion}
+        if lod is not None and self.lod_pending + len(rows) <= LOD_REFRESH_FRACTION * self.n:
+            self.derived["lod"] = lod.extended(self.n)
+            self.lod_pending += len(rows)
+        else:
+            self.lod_pending = 0
+        self.version += 1
+        return first
+
+    def _reserve(self, size):
+        """Grow every buffer to hold size rows, at least doubling the capacity"""
+        if size <= self.capacity:
+            return
+        capacity = max(size, 2 * self.capacity)
+        for column, buffer in self._buffers.items():
+            grown = np.empty(capacity, dtype=buffer.dtype)
+            grown[:self.n] = buffer[:self.n]
+            self._buffers[column] = grown
+        self.capacity = capacity
+
+    def _extend_motion(self, first):
+        """Kinematics of rows first: from their previous fixes, as in TrackKinematics.compute"""
+        buffers = self._buffers
+        rows = np.arange(max(first, 1), self.n)
+        previous = rows - 1
+        lat, lng, times = buffers["lat"], buffers["lng"], buffers["time"]
+
+        if first == 0:
+            buffers["segment_km"][0] = 0.0
+            buffers["bearing"][0] = np.nan
+            buffers["speed_kmh"][0] = np.nan
+            buffers["direction"][0] = kinematics.NO_DIRECTION
+            buffers["distance_km"][0] = 0.0
+        if len(rows) == 0:
+            return
+
+        segment_km = kinematics.haversine_km(lat[previous], lng[previous], lat[rows], lng[rows])
+        bearing = kinematics.initial_bearing(lat[previous], lng[previous], lat[rows], lng[rows])
+        hours = (times[rows] - times[previous]).astype(np.float64) / 60.0
+        direction = np.full(len(rows), kinematics.NO_DIRECTION, dtype=np.int8)
+        moving = segment_km >= kinematics.STATIONARY_KM
+        direction[moving] = kinematics.compass_index(bearing[moving])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed_kmh = np.where(hours > 0, segment_km / hours, np.nan)
+
+        buffers["segment_km"][rows] = segment_km
+        buffers["bearing"][rows] = bearing
+        buffers["direction"][rows] = direction
+        buffers["speed_kmh"][rows] = speed_kmh
+        buffers["distance_km"][rows] = buffers["distance_km"][rows[0] - 1] + np.cumsum(segment_km)
+
+
+class LiveCatalog:
+    """LiveTracks of every active storm, in order of their first advisory"""
+    def __init__(self):
+        self.tracks = {}
+
+    def __len__(self):
+        return len(self.tracks)
+
+    def __contains__(self, name):
+        return name in self.tracks
+
+    @property
+    def names(self):
+        return list(self.tracks)
+
+    def add(self, fixes):
+        """Append parsed fixes; {name: first new row} of every storm that grew"""
+        by_storm = {}
+        for fix in fixes:
+            by_storm.setdefault(fix["name"], []).append(fix)
+        grown = {}
+        for name, storm_fixes in by_storm.items():
+            track = self.tracks.get(name)
+            if track is None:
+                track = self.tracks[name] = LiveTrack(name)
+            first = track.extend(storm_fixes)
+            if first is not None:
+                grown[name] = first
+        return grown
+
+
+class AdvisoryFeed:
+    """asyncio service feeding advisory lines from files and a socket into a queue
+
+    Sources are registered with tail() and listen() before start(). The
+    event loop runs in a daemon thread; drain() is called from the GUI
+    thread and never blocks. Malformed lines are kept in errors.
+    """
+    def __init__(self):
+        self.queue = queue.SimpleQueue()
+        self.errors = deque(maxlen=100)
+        self.files = []
+        self.sockets = []
+        self.addresses = []
+        self.lines = 0
+        self.loop = None
+        self.thread = None
+        self._stopping = None
+        self._ready = threading.Event()
+        self._error = None
+
+    def tail(self, path, poll_interval=DEFAULT_POLL_INTERVAL, from_start=True):
+        """Follow a growing advisory file; existing lines are read first unless from_start is False"""
+        self.files.append((path, poll_interval, from_start))
+        return self
+
+    def listen(self, host="127.0.0.1", port=0):
+        """Accept advisory lines on a local TCP socket; port 0 picks a free port"""
+        self.sockets.append((host, port))
+        return self
+
+    def start(self):
+        """Run the event loop in a background thread; returns once sockets are bound
+
+        A socket that cannot be bound or an existing file that cannot be read
+        raises its OSError here, after the thread has stopped.
+        """
+        self.thread = threading.Thread(target=asyncio.run, args=(self._serve(),), name="advisory-feed",
+                                       daemon=True)
+        self.thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            self.thread.join()
+            raise self._error
+        return self
+
+    def stop(self, timeout=2.0):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self._stopping.set)
+            self.thread.join(timeout)
+
+    def drain(self, limit=None):
+        """Fixes received since the last call, oldest first"""
+        fixes = []
+        while limit is None or len(fixes) < limit:
+            try:
+                fixes.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return fixes
+
+    def accept(self, line, source=None):
+        """Parse one advisory line and queue its fix; callable from any thread"""
+        self.lines += 1
+        try:
+            fix = parse_advisory(line)
+        except (ValueError, KeyError, TypeError) as error:
+            self.errors.append({"source": str(source), "line": line.rstrip("\r\n"),
+                                "type": type(error).__name__, "message": str(error)})
+            return None
+        if fix is not None:
+            self.queue.put(fix)
+        return fix
+
+    async def _serve(self):
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        servers = []
+        try:
+            for host, port in self.sockets:
+                server = await asyncio.start_server(self._handle_client, host, port)
+                servers.append(server)
+                self.addresses.append(server.sockets[0].getsockname()[:2])
+            # A file that does not exist yet is waited for
+            for path, _, _ in self.files:
+                if os.path.exists(path):
+                    open(path, "rb").close()
+        except OSError as error:
+            self._error = error
+            for server in servers:
+                server.close()
+                await server.wait_closed()
+            return
+        finally:
+            self._ready.set()
+
+        tasks = [asyncio.create_task(self._tail(*source)) for source in self.files]
+        await self._stopping.wait()
+        for server in servers:
+            server.close()
+            await server.wait_closed()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _handle_client(self, reader, writer):
+        peer = writer.get_extra_info("peername")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self.accept(line.decode("utf-8", "replace"), peer)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _tail(self, path, poll_interval, from_start):
+        """Read lines appended to path; a truncated or replaced file is read again from the start"""
+        position = None
+        inode = None
+        partial = b""
+        while not self._stopping.is_set():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                stat = None
+            if stat is not None:
+                if position is None:
+                    position = 0 if from_start else stat.st_size
+                if (inode is not None and stat.st_ino != inode) or stat.st_size < position:
+                    position, partial = 0, b""
+                inode = stat.st_ino
+                if stat.st_size > position:
+                    try:
+                        with open(path, "rb") as stream:
+                            stream.seek(position)
+                            data = stream.read(stat.st_size - position)
+                    except OSError as error:
+                        self.errors.append({"source": str(path), "line": "", "type": type(error).__name__,
+                                            "message": str(error)})
+                        data = b""
+                    position += len(data)
+                    *lines, partial = (partial + data).split(b"\n")
+                    for line in lines:
+                        self.accept(line.decode("utf-8", "replace"), path)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), poll_interval)
+            except asyncio.TimeoutError:
+                pass
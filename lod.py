@@ -0,0 +1,225 @@
+"""Level-of-detail selection of track vertices and markers
+
+Every fix gets a Douglas-Peucker importance: the largest tolerance at which
+the simplification still keeps it. Importances are nested, so the vertices
+of any level are simply those with importance >= tolerance, and a level is
+chosen at draw time from the data size of a screen pixel. The first and last
+fix of a storm and both fixes of an intensity change are always kept.
+
+Markers cannot be thinned by line simplification without visibly moving
+them; instead only the first marker of each intensity per sub-pixel cell is
+kept, which hides nothing that would not be overdrawn anyway.
+"""
+import numpy as np
+
+from track_store import concat_ranges
+
+# Vertices deviating less than this many pixels from the simplified line are dropped
+DEFAULT_PIXEL_TOLERANCE = 0.5
+
+
+def forced_vertices(codes, offsets):
+    """Mask of fixes every level keeps: storm endpoints and intensity changes"""
+    codes = np.asarray(codes)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    first = np.zeros(len(codes), dtype=bool)
+    first[offsets[:-1][lengths > 0]] = True
+
+    # An intensity change keeps the fixes on both sides of it
+    change = np.zeros(len(codes), dtype=bool)
+    change[1:] = codes[1:] != codes[:-1]
+    change &= ~first
+    forced = first | change
+    forced[np.flatnonzero(change) - 1] = True
+    forced[offsets[1:][lengths > 0] - 1] = True
+    return forced
+
+
+def _chord_distance(x, y, a, b, rows, vertical):
+    """Distance of rows from the chord between fixes a and b"""
+    ax, ay, bx, by = x[a], y[a], x[b], y[b]
+    dx, dy = bx - ax, by - ay
+    px, py = x[rows] - ax, y[rows] - ay
+    with np.errstate(invalid="ignore", divide="ignore"):
+        if vertical:
+            # Series plotted against time: deviation along the value axis only
+            return np.abs(py - np.where(dx != 0, px / dx, 0.0) * dy)
+        length2 = dx * dx + dy * dy
+        t = np.clip(np.where(length2 > 0, (px * dx + py * dy) / length2, 0.0), 0.0, 1.0)
+        return np.hypot(px - t * dx, py - t * dy)
+
+
+def douglas_peucker_importance(x, y, offsets, forced, vertical=False):
+    """Nested Douglas-Peucker importance of every fix of every storm
+
+    All open intervals of all storms are split together, one vectorized pass
+    per recursion level. A vertex never gets a higher importance than the
+    split that exposed it, so selecting importance >= tolerance gives the
+    Douglas-Peucker result for that tolerance. NaN coordinates are kept.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    importance = np.zeros(len(x))
+    importance[forced] = np.inf
+
+    # Initial intervals run between consecutive forced fixes of the same storm
+    anchors = np.flatnonzero(forced)
+    last = np.zeros(len(x), dtype=bool)
+    last[np.asarray(offsets[1:], dtype=np.int64)[np.diff(offsets) > 0] - 1] = True
+    pairs = ~last[anchors[:-1]]
+    a, b = anchors[:-1][pairs], anchors[1:][pairs]
+    cap = np.full(len(a), np.inf)
+
+    while len(a):
+        inner = b - a - 1
+        open_ = inner > 0
+        a, b, cap, inner = a[open_], b[open_], cap[open_], inner[open_]
+        if len(a) == 0:
+            break
+        rows = concat_ranges(a + 1, b)
+        interval = np.repeat(np.arange(len(a)), inner)
+        distance = np.nan_to_num(_chord_distance(x, y, a[interval], b[interval], rows, vertical),
+                                 nan=np.inf)
+
+        # Farthest fix of each interval: segmented maximum, then its first occurrence
+        first = np.cumsum(inner) - inner
+        farthest = np.maximum.reduceat(distance, first)
+        hits = np.flatnonzero(distance == np.repeat(farthest, inner))
+        _, first_hit = np.unique(interval[hits], return_index=True)
+        split = rows[hits[first_hit]]
+
+        value = np.minimum(farthest, cap)
+        importance[split] = value
+        a, b, cap = np.concatenate((a, split)), np.concatenate((split, b)), np.concatenate((value, value))
+    return importance
+
+
+def marker_rows(columns, cell_sizes, codes):
+    """First fix of each intensity in each cell of the given size, in track order"""
+    keys = [np.floor(np.asarray(column, dtype=np.float64) / size).astype(np.int64)
+            for column, size in zip(columns, cell_sizes)]
+    keys.append(np.asarray(codes, dtype=np.int64))
+    if len(keys[0]) == 0:
+        return np.empty(0, dtype=np.int64)
+    _, first = np.unique(np.column_stack(keys), axis=0, return_index=True)
+    return np.sort(first)
+
+
+def pixel_size(ax, limits=None):
+    """Data units per display pixel along each axis of ax
+
+    For 3D axes the whole data box is assumed to fit into the smaller side of
+    the axes bounding box, which slightly overestimates the resolution.
+    """
+    limits = limits or (ax.get_xlim(), ax.get_ylim())
+    width, height = ax.bbox.width, ax.bbox.height
+    if len(limits) == 3:
+        width = height = min(width, height)
+    sizes = [abs(high - low) / max(pixels, 1.0)
+             for (low, high), pixels in zip(limits, (width, height, height))]
+    return sizes
+
+
+def view_key(axes):
+    """Limits and pixel sizes that determine the level of every axes"""
+    key = []
+    for ax in axes:
+        key.append(ax.get_xlim() + ax.get_ylim() + (ax.bbox.width, ax.bbox.height))
+        if hasattr(ax, "get_zlim"):
+            key.append(ax.get_zlim())
+    return tuple(key)
+
+
+class LODView:
+    """Rows of one track to draw in each axes for one view"""
+    def __init__(self, key, lines, markers):
+        self.key = key
+        self.lines = lines
+        self.markers = markers
+
+    @classmethod
+    def full(cls, n):
+        """Every fix in every axes, i.e. level of detail disabled"""
+        rows = np.arange(n)
+        names = ("3d", "map", "pressure", "wind")
+        return cls(None, dict.fromkeys(names, rows), dict.fromkeys(names, rows))
+
+    def line(self, name, end):
+        """Line vertices up to fix end - 1, which is always included"""
+        rows = self.lines[name]
+        rows = rows[:np.searchsorted(rows, end - 1)]
+        return np.append(rows, end - 1)
+
+    def marker(self, name, end):
+        """Marker rows before fix end"""
+        rows = self.markers[name]
+        return rows[:np.searchsorted(rows, end)]
+
+    @property
+    def n_vertices(self):
+        return sum(len(rows) for rows in self.lines.values()) + sum(len(rows) for rows in self.markers.values())
+
+
+class TrackLOD:
+    """Per-fix importances of the map track and both profiles"""
+    def __init__(self, track, pressure, wind):
+        self.track = track
+        self.pressure = pressure
+        self.wind = wind
+
+    @classmethod
+    def compute(cls, store):
+        """Importances of every storm in the catalog, one vectorized pass per column"""
+        forced = forced_vertices(store.intensity, store.offsets)
+        # Profiles are plotted against the time step, and rows are consecutive within a storm
+        steps = np.arange(store.n_fixes, dtype=np.float64)
+        return cls(
+            douglas_peucker_importance(store.lng, store.lat, store.offsets, forced),
+            douglas_peucker_importance(steps, store.pressure, store.offsets, forced, vertical=True),
+            douglas_peucker_importance(steps, store.wind, store.offsets, forced, vertical=True),
+        )
+
+    @classmethod
+    def for_store(cls, store):
+        """Importances of store, computed once and cached alongside its arrays"""
+        lod = store.derived.get("lod")
+        if lod is None:
+            lod = store.derived["lod"] = cls.compute(store)
+        return lod
+
+    def storm(self, track):
+        """Zero-copy slice of the importances for one StormTrack"""
+        part = slice(track.start, track.stop)
+        return TrackLOD(self.track[part], self.pressure[part], self.wind[part])
+
+    def extended(self, n_fixes):
+        """Importances of a track grown to n_fixes; the new fixes are kept at every level of detail"""
+        pad = np.full(n_fixes - len(self.track), np.inf)
+        return TrackLOD(*(np.concatenate([values, pad]) for values in (self.track, self.pressure, self.wind)))
+
+    def view(self, lng, lat, pressure, wind, codes, ax_3d, ax_map, ax_pressure, ax_wind,
+             pixel_tolerance=DEFAULT_PIXEL_TOLERANCE):
+        """Rows to draw in every axes at their current limits and size"""
+        steps = np.arange(len(lng))
+        map_x, map_y = pixel_size(ax_map)
+        lng_3d, lat_3d, pressure_3d = pixel_size(ax_3d, (ax_3d.get_xlim(), ax_3d.get_ylim(), ax_3d.get_zlim()))
+        pressure_x, pressure_y = pixel_size(ax_pressure)
+        wind_x, wind_y = pixel_size(ax_wind)
+
+        track_3d = ((self.track >= min(lng_3d, lat_3d) * pixel_tolerance)
+                    | (self.pressure >= pressure_3d * pixel_tolerance))
+        lines = {
+            "3d": np.flatnonzero(track_3d),
+            "map": np.flatnonzero(self.track >= min(map_x, map_y) * pixel_tolerance),
+            "pressure": np.flatnonzero(self.pressure >= pressure_y * pixel_tolerance),
+            "wind": np.flatnonzero(self.wind >= wind_y * pixel_tolerance),
+        }
+        cell = pixel_tolerance
+        markers = {
+            "3d": marker_rows((lng, lat, pressure), (lng_3d * cell, lat_3d * cell, pressure_3d * cell), codes),
+            "map": marker_rows((lng, lat), (map_x * cell, map_y * cell), codes),
+            "pressure": marker_rows((steps, pressure), (pressure_x * cell, pressure_y * cell), codes),
+            "wind": marker_rows((steps, wind), (wind_x * cell, wind_y * cell), codes),
+        }
+        return LODView(view_key((ax_3d, ax_map, ax_pressure, ax_wind)), lines, markers)
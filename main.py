@@ -1,142 +1,159 @@
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.animation as animation
-from mpl_toolkits.mplot3d import Axes3D
-from matplotlib.patches import FancyArrowPatch
-from mpl_toolkits.mplot3d import proj3d
-import matplotlib.colors as mcolors
-from datetime import datetime
+import argparse
+import os
 import warnings
 
+import best_track
+import export
+import lod
+from frame_cache import (DEFAULT_CACHE_MB, DEFAULT_PREFETCH, VIEW_REBUILD_DELAY_MS, FrameCache, FramePrefetcher,
+                         crop_frame, prefetch_order, region_rows)
+from core import DEFAULT_SPEED, FIX_INTERVAL_MS, SAMPLE_TYPHOONS, TrackerCore, plot_limits
+from instrumentation import Profiler
+from interpolation import TrackInterpolator, TrackSample
+from spatial_index import TrackIndex
+from track_store import INTENSITY_LEVELS, TrackStore
+
+# matplotlib, the 3D toolkit, the coastline/overlay layers and the asyncio
+# advisory feed are imported only when used, so scripts and batch workers
+# that just use the track data start fast
+
 # 忽略libpng警告
 warnings.filterwarnings("ignore", category=UserWarning, message="libpng warning: iCCP")
 
-class Arrow3D(FancyArrowPatch):
-    """Custom 3D arrow class for direction indicators"""
-    def __init__(self, xs, ys, zs, *args, **kwargs):
-        FancyArrowPatch.__init__(self, (0,0), (0,0), *args, **kwargs)
-        self._verts3d = xs, ys, zs
 
-    def draw(self, renderer):
-        xs3d, ys3d, zs3d = self._verts3d
-        xs, ys, zs = proj3d.proj_transform(xs3d, ys3d, zs3d, self.axes.M)
-        self.set_positions((xs[0],ys[0]),(xs[1],ys[1]))
-        FancyArrowPatch.draw(self, renderer)
+def __getattr__(name):
+    # Arrow3D subclasses a matplotlib patch; load it on first use
+    if name == "Arrow3D":
+        from arrow3d import Arrow3D
+        return Arrow3D
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-class TyphoonTracker3D:
-    def __init__(self):
-        # Typhoon data (English version)
-        self.typhoon_data = {
-            "Mangkhut": {
-                "name": "Mangkhut",
-                "points": [
-                    {"lat": 14.5, "lng": 138.2, "pressure": 1002, "wind": 65, "intensity": "TD", "timestamp": "2018-09-07 00:00"},
-                    {"lat": 15.2, "lng": 136.8, "pressure": 998, "wind": 75, "intensity": "TS", "timestamp": "2018-09-07 06:00"},
-                    {"lat": 16.1, "lng": 135.3, "pressure": 985, "wind": 95, "intensity": "STS", "timestamp": "2018-09-07 12:00"},
-                    {"lat": 17.0, "lng": 133.8, "pressure": 970, "wind": 120, "intensity": "TY", "timestamp": "2018-09-07 18:00"},
-                    {"lat": 17.9, "lng": 132.3, "pressure": 955, "wind": 140, "intensity": "TY", "timestamp": "2018-09-08 00:00"},
-                    {"lat": 18.8, "lng": 130.8, "pressure": 940, "wind": 160, "intensity": "STY", "timestamp": "2018-09-08 06:00"},
-                    {"lat": 19.7, "lng": 129.3, "pressure": 920, "wind": 185, "intensity": "SuperTY", "timestamp": "2018-09-08 12:00"},
-                    {"lat": 20.6, "lng": 127.8, "pressure": 905, "wind": 205, "intensity": "SuperTY", "timestamp": "2018-09-08 18:00"},
-                    {"lat": 21.5, "lng": 126.3, "pressure": 910, "wind": 195, "intensity": "SuperTY", "timestamp": "2018-09-09 00:00"},
-                    {"lat": 22.4, "lng": 124.8, "pressure": 925, "wind": 180, "intensity": "STY", "timestamp": "2018-09-09 06:00"}
-                ]
-            },
-            "Haiyan": {
-                "name": "Haiyan",
-                "points": [
-                    {"lat": 6.5, "lng": 155.2, "pressure": 1004, "wind": 55, "intensity": "TD", "timestamp": "2013-11-04 00:00"},
-                    {"lat": 7.2, "lng": 153.8, "pressure": 996, "wind": 70, "intensity": "TS", "timestamp": "2013-11-04 06:00"},
-                    {"lat": 8.1, "lng": 152.3, "pressure": 980, "wind": 100, "intensity": "STS", "timestamp": "2013-11-04 12:00"},
-                    {"lat": 9.0, "lng": 150.8, "pressure": 960, "wind": 130, "intensity": "TY", "timestamp": "2013-11-04 18:00"},
-                    {"lat": 9.9, "lng": 149.3, "pressure": 940, "wind": 155, "intensity": "STY", "timestamp": "2013-11-05 00:00"},
-                    {"lat": 10.8, "lng": 147.8, "pressure": 920, "wind": 180, "intensity": "SuperTY", "timestamp": "2013-11-05 06:00"},
-                    {"lat": 11.7, "lng": 146.3, "pressure": 895, "wind": 215, "intensity": "SuperTY", "timestamp": "2013-11-05 12:00"},
-                    {"lat": 12.6, "lng": 144.8, "pressure": 890, "wind": 230, "intensity": "SuperTY", "timestamp": "2013-11-05 18:00"},
-                    {"lat": 13.5, "lng": 143.3, "pressure": 895, "wind": 220, "intensity": "SuperTY", "timestamp": "2013-11-06 00:00"},
-                    {"lat": 14.4, "lng": 141.8, "pressure": 910, "wind": 200, "intensity": "SuperTY", "timestamp": "2013-11-06 06:00"}
-                ]
-            },
-            "Yutu": {
-                "name": "Yutu",
-                "points": [
-                    {"lat": 12.5, "lng": 147.2, "pressure": 1005, "wind": 60, "intensity": "TD", "timestamp": "2018-10-22 00:00"},
-                    {"lat": 13.2, "lng": 145.8, "pressure": 995, "wind": 75, "intensity": "TS", "timestamp": "2018-10-22 06:00"},
-                    {"lat": 14.1, "lng": 144.3, "pressure": 980, "wind": 100, "intensity": "STS", "timestamp": "2018-10-22 12:00"},
-                    {"lat": 15.0, "lng": 142.8, "pressure": 960, "wind": 125, "intensity": "TY", "timestamp": "2018-10-22 18:00"},
-                    {"lat": 15.9, "lng": 141.3, "pressure": 940, "wind": 150, "intensity": "STY", "timestamp": "2018-10-23 00:00"},
-                    {"lat": 16.8, "lng": 139.8, "pressure": 920, "wind": 175, "intensity": "SuperTY", "timestamp": "2018-10-23 06:00"},
-                    {"lat": 17.7, "lng": 138.3, "pressure": 900, "wind": 195, "intensity": "SuperTY", "timestamp": "2018-10-23 12:00"},
-                    {"lat": 18.6, "lng": 136.8, "pressure": 910, "wind": 185, "intensity": "SuperTY", "timestamp": "2018-10-23 18:00"},
-                    {"lat": 19.5, "lng": 135.3, "pressure": 925, "wind": 170, "intensity": "STY", "timestamp": "2018-10-24 00:00"},
-                    {"lat": 20.4, "lng": 133.8, "pressure": 940, "wind": 155, "intensity": "STY", "timestamp": "2018-10-24 06:00"}
-                ]
-            }
-        }
-        
-        # Intensity color mapping
-        self.intensity_colors = {
-            "TD": "#1a9850",
-            "TS": "#91cf60",
-            "STS": "#d9ef8b",
-            "TY": "#fee08b",
-            "STY": "#fc8d59",
-            "SuperTY": "#d73027"
-        }
-        
-        # Intensity full names
-        self.intensity_names = {
-            "TD": "Tropical Depression",
-            "TS": "Tropical Storm",
-            "STS": "Severe Tropical Storm",
-            "TY": "Typhoon",
-            "STY": "Severe Typhoon",
-            "SuperTY": "Super Typhoon"
-        }
-        
-        # Current state
-        self.current_typhoon = "Mangkhut"
-        self.current_points = []
-        self.current_index = 0
+class TyphoonTracker3D(TrackerCore):
+    def __init__(self, render_mode="blit", store=None, substeps=10, profile=False,
+                 level_of_detail=True, coastlines=None, offscreen=False):
         self.is_playing = False
-        self.speed = 5
+        self.speed = DEFAULT_SPEED
+        self.substeps = substeps
+        
+        # "blit" keeps persistent artists and updates them in place,
+        # "redraw" clears and rebuilds every axes on each frame
+        self.render_mode = render_mode
+        self.artists = []
+        self.frame_background = None
+        self.overlay_layers = []
+        
+        # Coastlines from a shapefile/GeoJSON (builtin outlines without one),
+        # clipped and simplified to the map view and drawn as one collection
+        self.coastline_source = coastlines
+        self.coastlines = None
+        
+        # Gridded field (wind swath, track density, ...) drawn beneath the 2D map
+        self.map_raster = None
+        
+        # Historical storms most similar to the current one, see show_analogs
+        self.analogs = None
+        self.analog_layer = None
+        
+        # Douglas-Peucker levels picked from the pixel size of each axes
+        self.level_of_detail = level_of_detail
+        self.lod_view = None
+        
+        # Timing spans and counters; a disabled profiler costs close to nothing
+        self.profiler = Profiler(enabled=profile)
+        self.show_fps = False
+        self.fps_text = None
+        
+        # The figure is built on first use, see build_figure; an offscreen
+        # figure has its own Agg canvas outside pyplot, so it can be used from
+        # a worker thread
+        self._fig = None
+        self.offscreen = offscreen
+        
+        # Rendered frames for scrubbing and storm switching, see enable_frame_cache
+        self.frame_cache = None
+        self.prefetcher = None
+        self.prefetch = DEFAULT_PREFETCH
+        self.home_view = None
+        self.event_artists = []
+        # Set while a cached first frame stands in for the views of a new storm
+        self.view_pending = False
+        self.view_timer = None
+        
+        # Animation control
+        self.anim = None
+        
+        # Several storms played back on a global clock, see show_season
+        self.timeline = None
+        self.clock = None
+        self.season_layer = None
+        
+        # Advisory feed of active storms, drained by a GUI timer
+        self.live_feed = None
+        self.live_catalog = None
+        self.live_timer = None
+        
+        # Track data, intensity tables and the initial storm
+        TrackerCore.__init__(self, store)
+        
+    @property
+    def fig(self):
+        """The figure, built when a view is first requested"""
+        if self._fig is None:
+            self.build_figure()
+        return self._fig
+    
+    def build_figure(self):
+        """Create the figure, its six axes and the artists of the current storm"""
+        import matplotlib.pyplot as plt
+        from coastlines import CoastlineLayer
+        
+        self.coastlines = CoastlineLayer(self.coastline_source)
         
         # Create figure with better layout
-        self.fig = plt.figure(figsize=(16, 12))
-        self.fig.suptitle('3D Typhoon Track Visualization', fontsize=16, fontweight='bold')
+        if self.offscreen:
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            from matplotlib.figure import Figure
+            
+            self._fig = Figure(figsize=(16, 12))
+            FigureCanvasAgg(self._fig)
+        else:
+            self._fig = plt.figure(figsize=(16, 12))
+        self._fig.suptitle('3D Typhoon Track Visualization', fontsize=16, fontweight='bold')
+        self.profiler.instrument(self._fig, 'draw')
+        if hasattr(self._fig.canvas, 'blit'):
+            self.profiler.instrument(self._fig.canvas, 'blit')
         
         # Create subplots with adjusted layout
-        self.ax_3d = self.fig.add_subplot(231, projection='3d')
+        self.ax_3d = self._fig.add_subplot(231, projection='3d')
         self.ax_3d.set_title('3D Typhoon Track', pad=10)
         
-        self.ax_map = self.fig.add_subplot(232)
+        self.ax_map = self._fig.add_subplot(232)
         self.ax_map.set_title('2D Map View', pad=10)
         
-        self.ax_pressure = self.fig.add_subplot(233)
+        self.ax_pressure = self._fig.add_subplot(233)
         self.ax_pressure.set_title('Pressure Profile', pad=10)
         
-        self.ax_wind = self.fig.add_subplot(234)
+        self.ax_wind = self._fig.add_subplot(234)
         self.ax_wind.set_title('Wind Speed Profile', pad=10)
         
-        self.ax_info = self.fig.add_subplot(235)
+        self.ax_info = self._fig.add_subplot(235)
         self.ax_info.set_title('Typhoon Information', pad=10)
         self.ax_info.axis('off')
         
-        self.ax_legend = self.fig.add_subplot(236)
+        self.ax_legend = self._fig.add_subplot(236)
         self.ax_legend.set_title('Intensity Legend', pad=10)
         self.ax_legend.axis('off')
         
         # Initialize visualization elements
         self.setup_plots()
         
-        # Load initial data
-        self.load_typhoon_data(self.current_typhoon)
-        
-        # Animation control
-        self.anim = None
+        # Views of the current storm
+        self.show_current_storm()
         
         # Adjust layout to prevent tight_layout warnings
-        plt.subplots_adjust(left=0.05, right=0.95, bottom=0.1, top=0.9, wspace=0.3, hspace=0.4)
+        self._fig.subplots_adjust(left=0.05, right=0.95, bottom=0.1, top=0.9, wspace=0.3, hspace=0.4)
+        return self._fig
         
     def setup_plots(self):
         """Setup all plot elements"""
@@ -145,23 +162,56 @@ class TyphoonTracker3D:
         self.setup_profiles()
         self.create_legend()
         
-    def load_typhoon_data(self, typhoon_name):
-        """Load typhoon data"""
-        self.current_typhoon = typhoon_name
-        self.current_points = self.typhoon_data[typhoon_name]["points"]
-        self.current_index = 0
+    def load_track(self, track, source, show=True):
+        """Load a storm and refresh the views once the figure exists
+        
+        With show=False the views are only rebuilt by show_pending_view, e.g.
+        after a cached frame of the storm was put on screen.
+        """
+        self.end_season()
+        self.analogs = None
+        TrackerCore.load_track(self, track, source)
+        self.bind_track_lod(source)
+        if self.map_raster is not None and self.map_raster.storm not in (None, track.name):
+            # The swath of the previous storm
+            self.clear_raster()
+        if self._fig is not None:
+            if show:
+                self.show_current_storm()
+            else:
+                self.view_pending = True
         
-        # Calculate data arrays
-        self.lats = np.array([point["lat"] for point in self.current_points])
-        self.lngs = np.array([point["lng"] for point in self.current_points])
-        self.pressures = np.array([point["pressure"] for point in self.current_points])
-        self.winds = np.array([point["wind"] for point in self.current_points])
-        self.intensities = [point["intensity"] for point in self.current_points]
-        self.colors = [self.intensity_colors[intensity] for intensity in self.intensities]
+    def bind_track_lod(self, source):
+        """Level-of-detail importances of the current track"""
+        self.track_lod = lod.TrackLOD.for_store(source).storm(self.track)
+        self.full_detail = lod.LODView.full(len(self.track))
+        self.lod_view = None
+        
+    def show_current_storm(self):
+        """Fit the views to the current storm"""
+        self.view_pending = False
+        
+        # Build the persistent artists once per storm
+        if self.render_mode == "blit":
+            self.init_artists()
         
         # Update plot limits
         self.update_plot_limits()
         
+        # Cached frames are only valid in this view, see frame_key
+        self.home_view = self.view_state()
+        
+    def show_pending_view(self):
+        """Rebuild the views of the current storm if a cached frame stood in for them"""
+        if self.view_pending:
+            self.show_current_storm()
+        
+    def view_state(self):
+        """Limits and 3D viewing angles of the data axes; changed by panning, zooming or rotating"""
+        axes = (self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind)
+        limits = tuple(ax.get_xlim() + ax.get_ylim() for ax in axes)
+        return limits, self.ax_3d.get_zlim(), self.ax_3d.elev, self.ax_3d.azim
+        
     def setup_3d_plot(self):
         """Setup 3D visualization"""
         self.ax_3d.set_xlabel('Longitude (°E)')
@@ -176,18 +226,88 @@ class TyphoonTracker3D:
         self.ax_map.set_ylabel('Latitude (°N)')
         self.ax_map.grid(True, alpha=0.3)
         self.add_coastlines()
+        if self.map_raster is not None:
+            self.map_raster.attach(self.ax_map)
         
     def add_coastlines(self):
-        """Add simplified coastlines to 2D map"""
-        # Asia coastline (simplified)
-        asia_lons = [100, 100, 120, 120, 140, 140, 120, 100]
-        asia_lats = [10, 30, 30, 40, 40, 20, 20, 10]
-        self.ax_map.plot(asia_lons, asia_lats, 'k-', linewidth=1, alpha=0.5)
+        """Add the coastline collection to 2D map; its paths follow the map view"""
+        with self.profiler.span('coastlines'):
+            self.coastlines.attach(self.ax_map)
+        
+    def init_artists(self):
+        """Create persistent artists for the current typhoon"""
+        import matplotlib.pyplot as plt
+        
+        for ax in (self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind, self.ax_info):
+            ax.clear()
+        
+        # Static background: drawn once and cached by the blitting animation
+        self.setup_3d_plot()
+        self.setup_2d_map()
+        self.setup_profiles()
+        self.init_event_artists()
+        self.attach_analogs()
+        self.ax_3d.set_title('3D Typhoon Track', pad=10)
+        self.ax_map.set_title('2D Map View', pad=10)
+        self.ax_pressure.set_title('Pressure Profile', pad=10)
+        self.ax_wind.set_title('Wind Speed Profile', pad=10)
+        self.ax_info.axis('off')
+        self.ax_info.set_title('Typhoon Information', pad=10)
+        
+        self.bind_offsets()
+        empty = np.empty((0, 2))
+        
+        # 3D track, past points and current position
+        self.track_3d, = self.ax_3d.plot([], [], [], 'b-', alpha=0.5, linewidth=2)
+        self.points_3d = self.ax_3d.scatter(self.lngs, self.lats, self.pressures,
+                                            c=self.colors, s=50, alpha=0.7, depthshade=False)
+        self.current_3d, = self.ax_3d.plot([], [], [], 'o', markersize=14,
+                                           markeredgecolor='white', markeredgewidth=2)
+        self.status_3d = self.ax_3d.text2D(0.02, 0.95, '', transform=self.ax_3d.transAxes, fontsize=9)
+        
+        # 2D map track, past points, current position and pulse circle
+        self.track_map, = self.ax_map.plot([], [], 'b-', alpha=0.5, linewidth=2)
+        self.points_map = self.ax_map.scatter(empty[:, 0], empty[:, 1], s=30, alpha=0.7)
+        self.current_map = self.ax_map.scatter(empty[:, 0], empty[:, 1], s=100, alpha=1.0,
+                                               edgecolors='white', linewidth=2)
+        self.pulse_circle = plt.Circle((self.lngs[0], self.lats[0]), 1.5, fill=False,
+                                       linewidth=2, alpha=0.7)
+        self.ax_map.add_patch(self.pulse_circle)
+        self.status_map = self.ax_map.text(0.02, 0.97, '', transform=self.ax_map.transAxes,
+                                           verticalalignment='top', fontsize=9)
+        
+        # Pressure and wind profiles
+        self.line_pressure, = self.ax_pressure.plot([], [], 'b-', linewidth=2)
+        self.points_pressure = self.ax_pressure.scatter(empty[:, 0], empty[:, 1], s=50)
+        self.current_pressure = self.ax_pressure.scatter(empty[:, 0], empty[:, 1], s=100,
+                                                         edgecolors='black', linewidth=2)
+        self.line_wind, = self.ax_wind.plot([], [], 'g-', linewidth=2)
+        self.points_wind = self.ax_wind.scatter(empty[:, 0], empty[:, 1], s=50)
+        self.current_wind = self.ax_wind.scatter(empty[:, 0], empty[:, 1], s=100,
+                                                 edgecolors='black', linewidth=2)
         
-        # Philippines coastline (simplified)
-        ph_lons = [117, 122, 126, 126, 122, 117]
-        ph_lats = [5, 5, 15, 20, 20, 15]
-        self.ax_map.plot(ph_lons, ph_lats, 'k-', linewidth=1, alpha=0.5)
+        # Information panel
+        self.info_text = self.ax_info.text(0.05, 0.95, '', transform=self.ax_info.transAxes,
+                                           verticalalignment='top', fontsize=9, fontfamily='monospace')
+        
+        self.frame_background = None
+        self.fps_text = None
+        self.artists = self.event_artists + [
+            self.track_3d, self.points_3d, self.current_3d, self.status_3d,
+            self.track_map, self.points_map, self.current_map, self.pulse_circle, self.status_map,
+            self.line_pressure, self.points_pressure, self.current_pressure,
+            self.line_wind, self.points_wind, self.current_wind,
+            self.info_text,
+        ]
+        if self.show_fps:
+            self.create_fps_text()
+        return self.artists
+        
+    def bind_offsets(self):
+        """Per-point arrays reused by every frame"""
+        self.map_offsets = np.column_stack((self.lngs, self.lats))
+        self.pressure_offsets = np.column_stack((self.steps, self.pressures))
+        self.wind_offsets = np.column_stack((self.steps, self.winds))
         
     def setup_profiles(self):
         """Setup pressure and wind profile plots"""
@@ -200,8 +320,47 @@ class TyphoonTracker3D:
         self.ax_wind.set_ylabel('Wind Speed (km/h)')
         self.ax_wind.grid(True, alpha=0.3)
         
+    def init_event_artists(self):
+        """Add the intensity event marks of the profiles, filled in by update_event_artists
+        
+        Rapid intensification (red) and weakening (blue) periods are shaded,
+        the LMI is starred and pressure-wind outliers are crossed.
+        """
+        from matplotlib.collections import PolyCollection
+        
+        self.event_spans = []
+        self.lmi_markers = []
+        for ax in (self.ax_pressure, self.ax_wind):
+            # Spans cover the full height of the axes whatever its limits
+            spans = PolyCollection([], alpha=0.12, linewidth=0, zorder=0, transform=ax.get_xaxis_transform())
+            self.event_spans.append(ax.add_collection(spans, autolim=False))
+            self.lmi_markers += ax.plot([], [], '*', color='black', markersize=12, zorder=1)
+        self.outlier_marker, = self.ax_wind.plot([], [], 'x', color='dimgray', markersize=8, zorder=1)
+        self.event_artists = self.event_spans + self.lmi_markers + [self.outlier_marker]
+        self.shown_marks = None
+        
+    def update_event_artists(self, frame):
+        """Show the events known at fix frame, or those of the whole track in the summary view"""
+        stats = self.frame_stats(frame)
+        marks = stats.event_marks()
+        if marks == self.shown_marks:
+            return
+        self.shown_marks = marks
+        rapid_intensification, rapid_weakening, peak, outliers = marks
+        periods = rapid_intensification + rapid_weakening
+        verts = [[(start, 0), (end, 0), (end, 1), (start, 1)] for start, end in periods]
+        colors = ['tab:red'] * len(rapid_intensification) + ['tab:blue'] * len(rapid_weakening)
+        for spans in self.event_spans:
+            spans.set_verts(verts)
+            spans.set_facecolor(colors)
+        for marker, values in zip(self.lmi_markers, (self.pressures, self.winds)):
+            marker.set_data(([peak], [values[peak]]) if peak >= 0 else ([], []))
+        self.outlier_marker.set_data(outliers, self.winds[outliers])
+        
     def create_legend(self):
         """Create intensity legend"""
+        import matplotlib.pyplot as plt
+        
         y_pos = 0.9
         for intensity, color in self.intensity_colors.items():
             self.ax_legend.add_patch(plt.Rectangle((0.1, y_pos-0.05), 0.1, 0.08, 
@@ -212,186 +371,380 @@ class TyphoonTracker3D:
             
     def update_plot_limits(self):
         """Update plot limits based on current data"""
-        # Add margins to limits
-        lat_margin = max((self.lats.max() - self.lats.min()) * 0.2, 2)
-        lon_margin = max((self.lngs.max() - self.lngs.min()) * 0.2, 2)
-        pressure_margin = max((self.pressures.max() - self.pressures.min()) * 0.2, 20)
-        
+        self.apply_plot_limits(self.plot_limits())
+    
+    def set_plot_limits(self, lngs, lats, pressures, winds, time_points):
+        """Fit every axes to the given fixes"""
+        self.apply_plot_limits(plot_limits(lngs, lats, pressures, winds, time_points))
+    
+    def apply_plot_limits(self, limits):
+        """Set the limits computed by core.plot_limits on every axes"""
         # 3D plot limits
-        self.ax_3d.set_xlim(self.lngs.min() - lon_margin, self.lngs.max() + lon_margin)
-        self.ax_3d.set_ylim(self.lats.min() - lat_margin, self.lats.max() + lat_margin)
-        self.ax_3d.set_zlim(self.pressures.min() - pressure_margin, self.pressures.max() + pressure_margin)
+        self.ax_3d.set_xlim(*limits["lng"])
+        self.ax_3d.set_ylim(*limits["lat"])
+        self.ax_3d.set_zlim(*limits["pressure"])
         
         # 2D map limits
-        self.ax_map.set_xlim(self.lngs.min() - lon_margin, self.lngs.max() + lon_margin)
-        self.ax_map.set_ylim(self.lats.min() - lat_margin, self.lats.max() + lat_margin)
+        self.ax_map.set_xlim(*limits["lng"])
+        self.ax_map.set_ylim(*limits["lat"])
         
         # Profile limits
-        time_points = len(self.current_points)
-        if time_points > 1:
-            self.ax_pressure.set_xlim(-0.5, time_points - 0.5)
-            self.ax_wind.set_xlim(-0.5, time_points - 0.5)
-        else:
-            self.ax_pressure.set_xlim(-0.5, 0.5)
-            self.ax_wind.set_xlim(-0.5, 0.5)
-            
-        self.ax_pressure.set_ylim(self.pressures.max() + 50, self.pressures.min() - 50)
-        self.ax_wind.set_ylim(0, max(self.winds.max() * 1.2, 100))
+        self.ax_pressure.set_xlim(*limits["steps"])
+        self.ax_wind.set_xlim(*limits["steps"])
+        self.ax_pressure.set_ylim(*limits["pressure_profile"])
+        self.ax_wind.set_ylim(*limits["wind"])
     
-    def update_typhoon_info(self, frame):
+    def update_typhoon_info(self, frame, sample=None):
         """Update typhoon information display"""
-        if frame < len(self.current_points):
-            point = self.current_points[frame]
-            
-            info_text = (
-                f"Typhoon: {self.typhoon_data[self.current_typhoon]['name']}\n"
-                f"Time: {point['timestamp']}\n"
-                f"Intensity: {self.intensity_names[point['intensity']]}\n"
-                f"Pressure: {point['pressure']} hPa\n"
-                f"Wind Speed: {point['wind']} km/h\n"
-                f"Position: {point['lat']:.1f}°N, {point['lng']:.1f}°E"
-            )
-            
-            # Calculate movement direction
-            if frame > 0:
-                prev_point = self.current_points[frame - 1]
-                direction = self.calculate_direction(prev_point["lat"], prev_point["lng"], 
-                                                   point["lat"], point["lng"])
-                info_text += f"\nMovement: {direction}"
-            
-            # Clear and display info
-            self.ax_info.clear()
-            self.ax_info.axis('off')
-            self.ax_info.set_title('Typhoon Information', pad=10)
-            self.ax_info.text(0.05, 0.95, info_text, transform=self.ax_info.transAxes, 
-                            verticalalignment='top', fontsize=9, fontfamily='monospace')
-    
-    def calculate_direction(self, lat1, lng1, lat2, lng2):
-        """Calculate movement direction"""
-        d_lat = lat2 - lat1
-        d_lng = lng2 - lng1
-        
-        if abs(d_lng) < 0.001:
-            return "North" if d_lat > 0 else "South"
-        
-        angle = np.arctan2(d_lat, d_lng) * 180 / np.pi
-        
-        if -22.5 <= angle < 22.5:
-            return "East"
-        elif 22.5 <= angle < 67.5:
-            return "Northeast"
-        elif 67.5 <= angle < 112.5:
-            return "North"
-        elif 112.5 <= angle < 157.5:
-            return "Northwest"
-        elif angle >= 157.5 or angle < -157.5:
-            return "West"
-        elif -157.5 <= angle < -112.5:
-            return "Southwest"
-        elif -112.5 <= angle < -67.5:
-            return "South"
-        elif -67.5 <= angle < -22.5:
-            return "Southeast"
-        
-        return "Unknown"
+        info_text = self.typhoon_info(frame, sample)
+        if info_text is None:
+            return
+        
+        if self.render_mode == "blit":
+            self.info_text.set_text(info_text)
+            return
+        
+        # Clear and display info
+        self.ax_info.clear()
+        self.ax_info.axis('off')
+        self.ax_info.set_title('Typhoon Information', pad=10)
+        self.ax_info.text(0.05, 0.95, info_text, transform=self.ax_info.transAxes, 
+                        verticalalignment='top', fontsize=9, fontfamily='monospace')
+    
+
+    def update_artists(self, frame):
+        """Update the persistent artists in place for current frame
+
+        frame is either a fix index or an interpolated TrackSample lying
+        between two fixes.
+        """
+        sample = frame if isinstance(frame, TrackSample) else None
+        if sample is not None:
+            frame = sample.index
+        if frame >= len(self.track):
+            return self.artists
+        
+        end = frame + 1
+        current_color = self.colors[frame]
+        if sample is None:
+            head = (self.lngs[frame], self.lats[frame], self.pressures[frame], self.winds[frame], frame)
+        else:
+            head = (sample.lng, sample.lat, sample.pressure, sample.wind, frame + sample.fraction)
+        head_lng, head_lat, head_pressure, head_wind, head_step = head
+        # Extend the trails from the last fix to the interpolated position
+        extend = sample is not None and sample.fraction > 0
+        
+        # Vertices and markers at the level of detail of the current view
+        view = self.current_lod()
+        
+        # 3D trajectory
+        self.track_3d.set_data_3d(*self.trail_data(view, '3d', end, (self.lngs, self.lats, self.pressures),
+                                                   (head_lng, head_lat, head_pressure) if extend else None))
+        markers = view.marker('3d', end)
+        self.points_3d._offsets3d = (self.lngs[markers], self.lats[markers], self.pressures[markers])
+        self.points_3d.set_facecolor(self.colors[markers])
+        if self.ax_3d.M is not None:
+            # Blitting skips Axes3D.draw, so project the moved points here
+            self.points_3d.do_3d_projection()
+        self.current_3d.set_data_3d([head_lng], [head_lat], [head_pressure])
+        self.current_3d.set_markerfacecolor(current_color)
+        self.status_3d.set_text(self.intensity_labels[self.intensities[frame]])
+        
+        # 2D map
+        self.track_map.set_data(*self.trail_data(view, 'map', end, (self.lngs, self.lats),
+                                                 (head_lng, head_lat) if extend else None))
+        markers = view.marker('map', end)
+        self.points_map.set_offsets(self.map_offsets[markers])
+        self.points_map.set_facecolor(self.colors[markers])
+        self.current_map.set_offsets([[head_lng, head_lat]])
+        self.current_map.set_facecolor(current_color)
+        self.pulse_circle.center = (head_lng, head_lat)
+        self.pulse_circle.set_edgecolor(current_color)
+        self.status_map.set_text(f'Frame: {end}/{len(self.track)}')
+        
+        # Profiles
+        self.line_pressure.set_data(*self.trail_data(view, 'pressure', end, (self.steps, self.pressures),
+                                                     (head_step, head_pressure) if extend else None))
+        markers = view.marker('pressure', end)
+        self.points_pressure.set_offsets(self.pressure_offsets[markers])
+        self.points_pressure.set_facecolor(self.colors[markers])
+        self.current_pressure.set_offsets([[head_step, head_pressure]])
+        self.current_pressure.set_facecolor(current_color)
+        self.line_wind.set_data(*self.trail_data(view, 'wind', end, (self.steps, self.winds),
+                                                 (head_step, head_wind) if extend else None))
+        markers = view.marker('wind', end)
+        self.points_wind.set_offsets(self.wind_offsets[markers])
+        self.points_wind.set_facecolor(self.colors[markers])
+        self.current_wind.set_offsets([[head_step, head_wind]])
+        self.current_wind.set_facecolor(current_color)
+        self.update_event_artists(frame)
+        
+        with self.profiler.span('info'):
+            self.update_typhoon_info(frame, sample)
+        return self.artists
+    
+    def trail_data(self, view, name, end, columns, head=None):
+        """Line data of one axes up to fix end - 1, optionally extended to head"""
+        rows = view.line(name, end)
+        data = [column[rows] for column in columns]
+        if head is not None:
+            data = [np.append(values, value) for values, value in zip(data, head)]
+        return data
+    
+    def current_lod(self):
+        """Rows to draw in each axes, reselected whenever limits or size change"""
+        if not self.level_of_detail:
+            return self.full_detail
+        axes = (self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind)
+        if self.lod_view is None or self.lod_view.key != lod.view_key(axes):
+            with self.profiler.span('lod'):
+                self.lod_view = self.track_lod.view(self.lngs, self.lats, self.pressures, self.winds,
+                                                    self.intensities, *axes)
+        return self.lod_view
     
     def update_visualization(self, frame):
         """Update all visualization elements for current frame"""
+        if self._fig is None:
+            self.build_figure()
+        self.show_pending_view()
+        profiler = self.profiler
+        profiler.begin_frame()
+        self.current_index = frame.index if isinstance(frame, TrackSample) else frame
+        if self.render_mode == "blit":
+            stage = 'artists'
+            try:
+                with profiler.span('update'):
+                    artists = self.update_artists(frame)
+                profiler.count('artists_updated', len(artists))
+                stage = 'fps'
+                return self.update_fps_overlay(artists)
+            except Exception as error:
+                # As in redraw mode; an empty frame leaves the last one on screen
+                self.stage_failed(stage, error)
+                return []
+        
+        stage = 'lod'
         try:
-            # Clear all plots
-            self.ax_3d.clear()
-            self.ax_map.clear()
-            self.ax_pressure.clear()
-            self.ax_wind.clear()
-            
-            # Re-setup plots
-            self.setup_3d_plot()
-            self.setup_2d_map()
-            self.setup_profiles()
-            self.add_coastlines()
-            
-            if frame < len(self.current_points):
-                # Current point data
-                current_lat = self.lats[frame]
-                current_lng = self.lngs[frame]
-                current_pressure = self.pressures[frame]
-                current_wind = self.winds[frame]
-                current_color = self.colors[frame]
+            with profiler.span('update'):
+                # Level of detail of the view left by the previous frame; clearing resets the limits
+                if frame < len(self.track):
+                    view = self.current_lod()
                 
-                # 3D trajectory
-                self.ax_3d.plot(self.lngs[:frame+1], self.lats[:frame+1], self.pressures[:frame+1], 
-                              'b-', alpha=0.5, linewidth=2)
+                stage = 'clear'
+                # Clear all plots
+                with profiler.span('clear'):
+                    self.ax_3d.clear()
+                    self.ax_map.clear()
+                    self.ax_pressure.clear()
+                    self.ax_wind.clear()
                 
-                # 3D scatter points
-                for i in range(frame + 1):
-                    self.ax_3d.scatter(self.lngs[i], self.lats[i], self.pressures[i],
-                                     c=self.colors[i], s=50, alpha=0.7)
+                # Re-setup plots
+                stage = 'setup'
+                with profiler.span('setup'):
+                    self.setup_3d_plot()
+                    self.setup_2d_map()
+                    self.setup_profiles()
+                    self.init_event_artists()
+                    self.attach_analogs()
                 
-                # Current position in 3D
-                self.ax_3d.scatter([current_lng], [current_lat], [current_pressure], 
-                                 c=[current_color], s=200, alpha=1.0, edgecolors='white', linewidth=2)
-                
-                # 2D map trajectory
-                self.ax_map.plot(self.lngs[:frame+1], self.lats[:frame+1], 'b-', alpha=0.5, linewidth=2)
-                
-                # 2D scatter points
-                for i in range(frame + 1):
-                    self.ax_map.scatter(self.lngs[i], self.lats[i], c=self.colors[i], s=30, alpha=0.7)
-                
-                # Current position in 2D
-                self.ax_map.scatter([current_lng], [current_lat], c=[current_color], s=100, alpha=1.0, 
-                                  edgecolors='white', linewidth=2)
-                
-                # Pulse effect in 2D
-                pulse_circle = plt.Circle((current_lng, current_lat), 1.5, fill=False, 
-                                        edgecolor=current_color, linewidth=2, alpha=0.7)
-                self.ax_map.add_patch(pulse_circle)
-                
-                # Pressure profile
-                if frame >= 1:
-                    self.ax_pressure.plot(range(frame+1), self.pressures[:frame+1], 'b-', linewidth=2)
-                    for i in range(frame + 1):
-                        self.ax_pressure.scatter(i, self.pressures[i], c=self.colors[i], s=50)
-                
-                # Current pressure point
-                self.ax_pressure.scatter(frame, current_pressure, c=[current_color], s=100, 
-                                       edgecolors='black', linewidth=2)
-                
-                # Wind speed profile
-                if frame >= 1:
-                    self.ax_wind.plot(range(frame+1), self.winds[:frame+1], 'g-', linewidth=2)
-                    for i in range(frame + 1):
-                        self.ax_wind.scatter(i, self.winds[i], c=self.colors[i], s=50)
-                
-                # Current wind point
-                self.ax_wind.scatter(frame, current_wind, c=[current_color], s=100, 
-                                   edgecolors='black', linewidth=2)
-                
-                # Update information and titles
-                self.update_typhoon_info(frame)
-                self.ax_3d.set_title(f'3D Typhoon Track\n{self.intensity_names[self.intensities[frame]]}', pad=10)
-                self.ax_map.set_title(f'2D Map View\nFrame: {frame+1}/{len(self.current_points)}', pad=10)
-                self.ax_pressure.set_title('Pressure Profile', pad=10)
-                self.ax_wind.set_title('Wind Speed Profile', pad=10)
-                
-            # Update plot limits
-            self.update_plot_limits()
+                if frame < len(self.track):
+                    stage = 'artists'
+                    with profiler.span('artists'):
+                        self.draw_frame_artists(frame, view)
+                        self.update_event_artists(frame)
+                    
+                    # Update information and titles
+                    stage = 'info'
+                    with profiler.span('info'):
+                        self.update_typhoon_info(frame)
+                        self.ax_3d.set_title(f'3D Typhoon Track\n{self.intensity_labels[self.intensities[frame]]}', pad=10)
+                        self.ax_map.set_title(f'2D Map View\nFrame: {frame+1}/{len(self.track)}', pad=10)
+                        self.ax_pressure.set_title('Pressure Profile', pad=10)
+                        self.ax_wind.set_title('Wind Speed Profile', pad=10)
+                    
+                # Update plot limits
+                stage = 'limits'
+                with profiler.span('limits'):
+                    self.update_plot_limits()
             
-        except Exception as e:
-            print(f"Error in update_visualization: {e}")
+            profiler.count_new_artists((self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind, self.ax_info))
+            self.update_fps_overlay()
+        except Exception as error:
+            self.stage_failed(stage, error)
             
         return []
     
+    def stage_failed(self, stage, error):
+        """Keep the animation running, but keep the traceback for inspection"""
+        self.profiler.record_error(stage, error)
+        warnings.warn(f"update_visualization failed in {stage}: {error!r}", RuntimeWarning)
+    
+    def draw_frame_artists(self, frame, view):
+        """Rebuild the track, point and current position artists of a frame"""
+        import matplotlib.pyplot as plt
+        
+        end = frame + 1
+        # Current point data
+        current_lat = self.lats[frame]
+        current_lng = self.lngs[frame]
+        current_pressure = self.pressures[frame]
+        current_wind = self.winds[frame]
+        current_color = self.colors[frame]
+        
+        # 3D trajectory
+        self.ax_3d.plot(*self.trail_data(view, '3d', end, (self.lngs, self.lats, self.pressures)),
+                      'b-', alpha=0.5, linewidth=2)
+        
+        # 3D scatter points, one collection per axes
+        markers = view.marker('3d', end)
+        self.ax_3d.scatter(self.lngs[markers], self.lats[markers], self.pressures[markers],
+                           c=self.colors[markers], s=50, alpha=0.7, depthshade=False)
+        
+        # Current position in 3D
+        self.ax_3d.scatter([current_lng], [current_lat], [current_pressure], 
+                         c=[current_color], s=200, alpha=1.0, edgecolors='white', linewidth=2,
+                         depthshade=False)
+        
+        # 2D map trajectory
+        self.ax_map.plot(*self.trail_data(view, 'map', end, (self.lngs, self.lats)), 'b-', alpha=0.5, linewidth=2)
+        
+        # 2D scatter points
+        markers = view.marker('map', end)
+        self.ax_map.scatter(self.lngs[markers], self.lats[markers], c=self.colors[markers], s=30, alpha=0.7)
+        
+        # Current position in 2D
+        self.ax_map.scatter([current_lng], [current_lat], c=[current_color], s=100, alpha=1.0, 
+                          edgecolors='white', linewidth=2)
+        
+        # Pulse effect in 2D
+        pulse_circle = plt.Circle((current_lng, current_lat), 1.5, fill=False, 
+                                edgecolor=current_color, linewidth=2, alpha=0.7)
+        self.ax_map.add_patch(pulse_circle)
+        
+        # Pressure profile
+        if frame >= 1:
+            self.ax_pressure.plot(*self.trail_data(view, 'pressure', end, (self.steps, self.pressures)),
+                                  'b-', linewidth=2)
+            markers = view.marker('pressure', end)
+            self.ax_pressure.scatter(markers, self.pressures[markers], c=self.colors[markers], s=50)
+        
+        # Current pressure point
+        self.ax_pressure.scatter(frame, current_pressure, c=[current_color], s=100, 
+                               edgecolors='black', linewidth=2)
+        
+        # Wind speed profile
+        if frame >= 1:
+            self.ax_wind.plot(*self.trail_data(view, 'wind', end, (self.steps, self.winds)), 'g-', linewidth=2)
+            markers = view.marker('wind', end)
+            self.ax_wind.scatter(markers, self.winds[markers], c=self.colors[markers], s=50)
+        
+        # Current wind point
+        self.ax_wind.scatter(frame, current_wind, c=[current_color], s=100, 
+                           edgecolors='black', linewidth=2)
+    
+    def update_fps_overlay(self, artists=None):
+        """Refresh the on-screen frame rate and latency line when it is shown"""
+        if not self.show_fps:
+            return artists
+        if self.fps_text is None or self.fps_text.axes is None:
+            self.create_fps_text()
+        self.fps_text.set_text(self.profiler.status_text())
+        return artists
+    
+    def create_fps_text(self):
+        """Add the FPS/latency text to the information panel"""
+        self.fps_text = self.ax_info.text(0.05, 0.02, '', transform=self.ax_info.transAxes,
+                                          fontsize=8, color='dimgray', fontfamily='monospace')
+        if self.render_mode == "blit" and self.artists:
+            self.artists.append(self.fps_text)
+            self.frame_background = None
+    
+    def set_fps_overlay(self, show):
+        """Show or hide the FPS/latency overlay; showing it enables profiling"""
+        if self._fig is not None:
+            self.show_pending_view()
+        self.show_fps = show
+        if show:
+            self.profiler.enabled = True
+            if self.fps_text is None and self.artists:
+                self.create_fps_text()
+        elif self.fps_text is not None:
+            if self.fps_text in self.artists:
+                self.artists.remove(self.fps_text)
+            if self.fps_text.axes is not None:
+                self.fps_text.remove()
+            self.fps_text = None
+            self.frame_background = None
+    
+    def render_frame(self, frame):
+        """Render one frame off-screen and return the canvas as an RGBA array
+
+        In blit mode the static background is rendered once per storm and
+        every later frame only restores it and draws the moving artists.
+        """
+        canvas = self.fig.canvas
+        self.show_pending_view()
+        if self.render_mode != "blit":
+            self.update_visualization(frame)
+            canvas.draw()
+            return np.asarray(canvas.buffer_rgba())
+        
+        # The background is reused while the canvas size and every axes view stay the same
+        key = (canvas.get_width_height(), lod.view_key((self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind)))
+        if self.frame_background is None or self.frame_background[0] != key:
+            for artist in self.artists:
+                artist.set_animated(True)
+            canvas.draw()
+            self.frame_background = (key, canvas.copy_from_bbox(self.fig.bbox))
+            for artist in self.artists:
+                artist.set_animated(False)
+        
+        artists = self.update_visualization(frame)
+        with self.profiler.span('blit'):
+            canvas.restore_region(self.frame_background[1])
+            for artist in artists:
+                artist.axes.draw_artist(artist)
+        return np.asarray(canvas.buffer_rgba())
+    
+    def playback_frames(self):
+        """Frames for FuncAnimation: lazily interpolated samples or fix indices"""
+        if self.render_mode != "blit" or self.substeps <= 1:
+            return iter(range(len(self.track)))
+        return iter(TrackInterpolator(self.lats, self.lngs, self.pressures, self.winds,
+                                      times=self.track.time,
+                                      substeps=self.substeps))
+    
+    def playback_interval(self):
+        """Milliseconds between animation frames for the current speed"""
+        if self.season_layer is not None:
+            # One fix interval (6 hours) of clock time per FIX_INTERVAL_MS at the default speed
+            fraction = self.clock.step / np.timedelta64(6, 'h')
+            return max(1, int(FIX_INTERVAL_MS * DEFAULT_SPEED / self.speed * fraction))
+        substeps = self.substeps if self.render_mode == "blit" else 1
+        return max(1, int(FIX_INTERVAL_MS * DEFAULT_SPEED / self.speed / max(1, substeps)))
+    
+    def set_speed(self, speed):
+        """Change the playback speed; DEFAULT_SPEED shows one fix per 800 ms"""
+        self.speed = min(max(speed, 1), 20)
+        if self.anim:
+            self.anim.event_source.interval = self.playback_interval()
+    
     def start_animation(self):
         """Start the animation"""
+        import matplotlib.animation as animation
+        import matplotlib.pyplot as plt
+        
+        self.show_pending_view()
         if self.anim is None:
+            season = self.season_layer is not None
             self.anim = animation.FuncAnimation(
                 self.fig, 
-                self.update_visualization, 
-                frames=len(self.current_points), 
-                interval=800,  # Slower interval for better viewing
-                blit=False, 
-                repeat=True
+                self.update_season if season else self.update_visualization, 
+                frames=self.season_frames if season else self.playback_frames, 
+                interval=self.playback_interval(),
+                blit=self.render_mode == "blit", 
+                repeat=True,
+                cache_frame_data=False
             )
             self.is_playing = True
         
@@ -407,25 +760,630 @@ class TyphoonTracker3D:
                 self.anim.event_source.start()
                 self.is_playing = True
     
-    def change_typhoon(self, typhoon_name):
-        """Change current typhoon"""
-        self.load_typhoon_data(typhoon_name)
+    def stop_animation(self):
+        """Stop and discard the running animation"""
         if self.anim:
             self.anim.event_source.stop()
             self.anim = None
-        self.current_index = 0
         self.is_playing = False
+    
+    def add_overlay_layer(self, storms, **style):
+        """Draw storms (names or indices) as one collection-based layer"""
+        from overlay import OverlayLayer
+        
+        if self._fig is None:
+            self.build_figure()
+        indices = [self.store.name_index[storm] if isinstance(storm, str) else int(storm) for storm in storms]
+        layer = OverlayLayer(self.store, indices, self.intensity_rgba, ax_3d=self.ax_3d, ax_map=self.ax_map,
+                             ax_pressure=self.ax_pressure, ax_wind=self.ax_wind, **style)
+        self.overlay_layers.append(layer)
+        return layer
+    
+    def clear_overlay(self):
+        """Remove every overlay layer"""
+        for layer in self.overlay_layers:
+            layer.remove()
+        self.overlay_layers = []
+    
+    def show_overlay(self, storms, **style):
+        """Replace the single-storm view by an overlay of many storms"""
+        if self._fig is None:
+            self.build_figure()
+        self.view_pending = False
+        self.stop_animation()
+        self.end_season()
+        self.analogs = None
+        self.overlay_layers = []
+        self.artists = []
+        self.frame_background = None
+        
+        for ax in (self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind, self.ax_info):
+            ax.clear()
+        self.setup_3d_plot()
+        self.setup_2d_map()
+        self.setup_profiles()
+        self.ax_info.axis('off')
+        
+        layer = self.add_overlay_layer(storms, **style)
+        if layer.n_fixes:
+            self.set_plot_limits(layer.lng, layer.lat, layer.pressure,
+                                 self.store.wind[layer.rows], layer.lengths.max())
+        
+        self.ax_3d.set_title(f'3D Typhoon Tracks\n{len(layer)} storms', pad=10)
+        self.ax_map.set_title(f'2D Map View\n{layer.n_fixes} fixes', pad=10)
+        self.ax_pressure.set_title('Pressure Profiles', pad=10)
+        self.ax_wind.set_title('Wind Speed Profiles', pad=10)
+        self.ax_info.set_title('Typhoon Information', pad=10)
+        names = [self.store.names[i] for i in layer.indices[:10]]
+        more = f"\n... and {len(layer) - 10} more" if len(layer) > 10 else ""
+        self.ax_info.text(0.05, 0.95, f"Overlay of {len(layer)} storms\n" + "\n".join(names) + more,
+                          transform=self.ax_info.transAxes, verticalalignment='top',
+                          fontsize=9, fontfamily='monospace')
+        self.fig.canvas.draw_idle()
+        return layer
+    
+    def show_analogs(self, count=None, method="dtw"):
+        """Overlay the catalog storms most similar to the current storm up to the shown fix
+        
+        Track shape and intensity evolution since the first fix are compared
+        with the start of every archived storm, see analogs.AnalogIndex.
+        """
+        from analogs import DEFAULT_ANALOGS, AnalogIndex
+        
+        if self._fig is None:
+            self.build_figure()
+        self.show_pending_view()
+        index = AnalogIndex.for_store(self.store)
+        end = self.current_index + 1
+        query = index.query_signature(self.lats[:end], self.lngs[:end], self.pressures[:end], self.winds[:end],
+                                      self.track.time[:end])
+        exclude = self.store.name_index.get(self.track.name) if self.track_source is self.store else None
+        with self.profiler.span('analogs'):
+            self.analogs = index.search(query, count or DEFAULT_ANALOGS, method, exclude=exclude)
+        self.attach_analogs()
+        self.frame_background = None
+        self.fig.canvas.draw_idle()
+        return self.analogs
+    
+    def attach_analogs(self):
+        """Draw the current analogs beneath the storm in the 3D and map views"""
+        from overlay import OverlayLayer
+        
+        if self.analog_layer is not None:
+            self.analog_layer.remove()
+            self.analog_layer = None
+        if self.analogs is None:
+            return None
+        self.analog_layer = OverlayLayer(self.store, self.analogs.indices, self.intensity_rgba, ax_3d=self.ax_3d,
+                                         ax_map=self.ax_map, linewidth=1.0, alpha=0.45, marker_size=4, zorder=1)
+        names = "\n".join(f"{name} ({distance:.2f})" for name, distance in self.analogs)
+        self.analog_layer.artists.append(
+            self.ax_map.text(0.98, 0.97, f"Analogs ({self.analogs.method}):\n{names}",
+                             transform=self.ax_map.transAxes, ha='right', va='top', fontsize=7,
+                             color='dimgray', zorder=1))
+        return self.analog_layer
+    
+    def clear_analogs(self):
+        self.analogs = None
+        self.attach_analogs()
+        self.frame_background = None
+        self.fig.canvas.draw_idle()
+    
+    def toggle_analogs(self):
+        """Show the analogs of the current storm so far, or hide them"""
+        if self.analogs is None:
+            return self.show_analogs()
+        self.clear_analogs()
+        return None
+    
+    def show_raster(self, values, grid, **style):
+        """Draw gridded values (e.g. a swath.SwathGrids field) beneath the 2D map"""
+        from swath import RasterLayer
+        
+        if self._fig is None:
+            self.build_figure()
+        self.show_pending_view()
+        self.clear_raster()
+        self.map_raster = RasterLayer(values, grid, **style)
+        self.map_raster.attach(self.ax_map)
+        self.frame_background = None
+        self.fig.canvas.draw_idle()
+        return self.map_raster
+    
+    def clear_raster(self):
+        """Remove the raster beneath the 2D map"""
+        if self.map_raster is not None:
+            self.map_raster.remove()
+            self.map_raster = None
+            self.frame_background = None
+    
+    def toggle_storm_swath(self):
+        """Show or hide the maximum-wind swath of the current storm"""
+        if self.map_raster is not None:
+            self.clear_raster()
+            self.fig.canvas.draw_idle()
+            return None
+        from swath import storm_swath
+        
+        with self.profiler.span('swath'):
+            values, grid = storm_swath(self.track_source, self.track.index)
+        return self.show_raster(values, grid, storm=self.track.name)
+    
+    def show_season(self, storms, start=None, end=None, step_minutes=None):
+        """Play several storms (names or indices) back together in true time order
+        
+        A global SimulationClock drives the animation; at every tick each
+        storm's active fix is found by binary search in a StormTimeline.
+        """
+        from clock import DEFAULT_STEP_MINUTES, SimulationClock, StormTimeline
+        from overlay import PlaybackLayer
+        
+        if self._fig is None:
+            self.build_figure()
+        self.view_pending = False
+        self.stop_animation()
+        self.end_season()
+        self.analogs = None
+        self.overlay_layers = []
+        self.frame_background = None
+        for ax in (self.ax_3d, self.ax_map, self.ax_pressure, self.ax_wind, self.ax_info):
+            ax.clear()
+        self.setup_3d_plot()
+        self.setup_2d_map()
+        self.setup_profiles()
+        self.ax_pressure.set_xlabel('Hours')
+        self.ax_wind.set_xlabel('Hours')
+        self.ax_info.axis('off')
+        
+        indices = [self.store.name_index[storm] if isinstance(storm, str) else int(storm) for storm in storms]
+        self.timeline = StormTimeline(self.store, indices)
+        self.clock = SimulationClock(self.timeline.start if start is None else start,
+                                     self.timeline.end if end is None else end,
+                                     step_minutes or DEFAULT_STEP_MINUTES)
+        self.season_layer = PlaybackLayer(self.timeline, self.intensity_rgba, self.ax_3d, self.ax_map,
+                                          self.ax_pressure, self.ax_wind)
+        
+        rows = self.timeline.rows
+        limits = plot_limits(self.store.lng[rows], self.store.lat[rows], self.store.pressure[rows],
+                             self.store.wind[rows], 2)
+        origin = self.season_layer.origin
+        limits["steps"] = ((self.clock.start - origin).astype(np.float64) / 60.0,
+                           (self.clock.end - origin).astype(np.float64) / 60.0 + 1.0)
+        self.apply_plot_limits(limits)
+        
+        self.ax_3d.set_title(f'3D Typhoon Tracks\n{len(self.timeline)} storms', pad=10)
+        self.ax_map.set_title('2D Map View', pad=10)
+        self.ax_pressure.set_title('Pressure Profiles', pad=10)
+        self.ax_wind.set_title('Wind Speed Profiles', pad=10)
+        self.ax_info.set_title('Typhoon Information', pad=10)
+        self.info_text = self.ax_info.text(0.05, 0.95, '', transform=self.ax_info.transAxes,
+                                           verticalalignment='top', fontsize=9, fontfamily='monospace')
+        self.fps_text = None
+        self.artists = self.season_layer.artists + [self.info_text]
+        if self.show_fps:
+            self.create_fps_text()
+        self.seek_time(self.clock.start)
+        return self.timeline
+    
+    def end_season(self):
+        """Leave season playback; the caller rebuilds the axes"""
+        if self.season_layer is None:
+            return
+        self.stop_animation()
+        self.season_layer.remove()
+        self.timeline = None
+        self.clock = None
+        self.season_layer = None
+        self.artists = []
+    
+    def update_season(self, time):
+        """Move every storm of the season to clock time"""
+        if self._fig is None:
+            self.build_figure()
+        profiler = self.profiler
+        profiler.begin_frame()
+        with profiler.span('update'):
+            state = self.timeline.state(time)
+            self.season_layer.update(state)
+            with profiler.span('info'):
+                self.info_text.set_text(self.season_info(state))
+        profiler.count('artists_updated', len(self.artists))
+        return self.update_fps_overlay(self.artists)
+    
+    def season_info(self, state):
+        """Clock time and the current fix of every active storm"""
+        time = np.datetime_as_string(state.time).replace('T', ' ')
+        lines = [f"Season playback ({len(self.timeline)} storms)", f"Time: {time}", ""]
+        for i in np.flatnonzero(state.active):
+            lines.append(f"{self.season_layer.names[i][:16]:<16} {INTENSITY_LEVELS[state.intensity[i]]:<7} "
+                         f"{state.pressure[i]:4.0f} hPa {state.wind[i]:3.0f} km/h")
+        upcoming = int(np.count_nonzero(~state.started))
+        finished = int(np.count_nonzero(state.finished))
+        lines.append(f"\n{upcoming} upcoming, {finished} finished")
+        return "\n".join(lines)
+    
+    def season_frames(self):
+        """Clock ticks for FuncAnimation, restarting once the clock reached its end"""
+        if self.clock.now >= self.clock.end:
+            return self.clock.replay()
+        return self.clock.ticks()
+    
+    def seek_time(self, time):
+        """Show the season at time; O(log n) per storm wherever the clock was"""
+        self.update_season(self.clock.seek(time))
+        self.fig.canvas.draw_idle()
+        return self.clock.now
+    
+    def show_concurrent_storms(self):
+        """Play back every storm that was active during the current storm"""
+        from clock import storms_between
+        
+        storms = storms_between(self.store, self.track.time[0], self.track.time[-1])
+        return self.show_season(storms)
+    
+    def select_storms(self, storms):
+        """Show storms (names or indices): a single storm is animated, several are overlaid"""
+        storms = list(storms)
+        if len(storms) == 1:
+            storm = storms[0]
+            self.change_typhoon(storm if isinstance(storm, str) else self.store.names[int(storm)])
+        elif storms:
+            self.show_overlay(storms)
+        return storms
+    
+    def show_storms_near(self, lat, lng, radius_km, start=None, end=None):
+        """Select every storm that passed within radius_km of a point in a time window"""
+        index = TrackIndex.for_store(self.store)
+        return self.select_storms(index.storms_within(lat, lng, radius_km, start, end))
+    
+    def change_typhoon(self, typhoon_name):
+        """Change current typhoon"""
+        self.stop_animation()
+        self.overlay_layers = []
+        if self.show_cached_storm(typhoon_name):
+            return
+        self.load_typhoon_data(typhoon_name)
+        self.current_index = 0
+        
+        if self.frame_cache is not None:
+            self.show_frame(0)
+            return
         
         # Redraw with new data
         self.update_visualization(0)
-        plt.draw()
+        self.fig.canvas.draw_idle()
+    
+    def show_cached_storm(self, typhoon_name):
+        """Put the cached first frame of a catalog storm on screen; False when it is not cached
+        
+        A recently viewed storm then comes straight from the cache: only its
+        data is bound, and the artists and views are rebuilt by
+        show_pending_view once the GUI is idle, or before anything else
+        draws.
+        """
+        from matplotlib.transforms import Bbox
+        
+        if self.frame_cache is None or self._fig is None:
+            return False
+        canvas = self.fig.canvas
+        size = self.frame_size()
+        renderer = getattr(canvas, 'renderer', None)
+        # The conditions of frame_key once the storm is loaded; analogs and a
+        # season end with the switch, a catalog-wide raster stays
+        if (renderer is None or (renderer.width, renderer.height) != size or self.show_fps
+                or self.map_raster is not None and self.map_raster.storm in (None, typhoon_name)):
+            return False
+        cached = self.frame_cache.get((typhoon_name, 0, size))
+        if cached is None:
+            return False
+        
+        with self.profiler.span('frame_cache'):
+            self.load_track(self.store.storm(typhoon_name), self.store, show=False)
+            buffer = np.asarray(canvas.buffer_rgba())
+            top, bottom = region_rows(buffer.shape[0])
+            buffer[top:bottom] = cached
+            width, height = size
+            canvas.blit(Bbox.from_extents(0, height - bottom, width, height - top))
+        self.profiler.count('frame_cache_hits', 1)
+        
+        self.view_timer = canvas.new_timer(interval=VIEW_REBUILD_DELAY_MS)
+        self.view_timer.single_shot = True
+        self.view_timer.add_callback(self.show_pending_view)
+        self.view_timer.start()
+        return True
+    
+    def enable_frame_cache(self, max_bytes=None, prefetch=DEFAULT_PREFETCH, background=False):
+        """Cache rendered frames for show_frame, optionally prefetching on a background thread
+        
+        By default only the frames that were shown are cached. With
+        background=True a prefetcher renders the frames around the shown one
+        with an offscreen tracker of the same catalog, render mode and
+        coastlines; that second figure is drawn on another thread, so it is
+        opt-in.
+        """
+        self.frame_cache = FrameCache(max_bytes or DEFAULT_CACHE_MB * 2 ** 20)
+        self.prefetch = prefetch
+        if background and prefetch > 0:
+            def make_tracker():
+                return TyphoonTracker3D(render_mode=self.render_mode, store=self.store, substeps=self.substeps,
+                                        level_of_detail=self.level_of_detail, coastlines=self.coastline_source,
+                                        offscreen=True)
+            self.prefetcher = FramePrefetcher(self.frame_cache, make_tracker).start()
+        return self.frame_cache
+    
+    def disable_frame_cache(self):
+        if self.prefetcher is not None:
+            self.prefetcher.stop()
+        self.frame_cache = None
+        self.prefetcher = None
+    
+    def frame_size(self):
+        """Canvas size in pixels, part of every frame cache key"""
+        width, height = self.fig.bbox.size
+        return int(width), int(height)
+    
+    def frame_key(self, frame):
+        """Cache key of a frame of the current storm, None when the view cannot be cached
+        
+        Frames are cached for catalog storms in the view fitted at load time,
+        without overlays, rasters, analogs, season playback, the event summary
+        or the FPS overlay.
+        """
+        if (self.frame_cache is None or self.track_source is not self.store or self.overlay_layers
+                or self.map_raster is not None or self.season_layer is not None or self.show_fps
+                or self.analogs is not None or self.event_summary
+                or self.view_state() != self.home_view):
+            return None
+        return (self.track.name, frame, self.frame_size())
+    
+    def show_frame(self, frame):
+        """Show a fix of the current storm, from the frame cache when it was rendered before
+        
+        A cached frame is copied into the canvas buffer and blitted. In blit
+        mode the persistent artists still move to it, so a later full draw
+        matches; redraw mode skips that rebuild. Afterwards the frames around it are prefetched in the direction of
+        travel.
+        """
+        from matplotlib.transforms import Bbox
+        
+        self.show_pending_view()
+        frame = min(max(int(frame), 0), len(self.track) - 1)
+        direction = 1 if frame >= self.current_index else -1
+        canvas = self.fig.canvas
+        key = self.frame_key(frame)
+        cached = self.frame_cache.get(key) if key is not None else None
+        renderer = getattr(canvas, 'renderer', None)
+        if cached is not None and renderer is not None and (renderer.width, renderer.height) == key[2]:
+            with self.profiler.span('frame_cache'):
+                if self.render_mode == "blit":
+                    self.update_artists(frame)
+                self.current_index = frame
+                buffer = np.asarray(canvas.buffer_rgba())
+                top, bottom = region_rows(buffer.shape[0])
+                buffer[top:bottom] = cached
+                width, height = key[2]
+                canvas.blit(Bbox.from_extents(0, height - bottom, width, height - top))
+            self.profiler.count('frame_cache_hits', 1)
+        else:
+            rgba = self.render_frame(frame)
+            if self.render_mode == "blit":
+                canvas.blit(self.fig.bbox)
+            if key is not None and rgba.shape[1::-1] == key[2]:
+                self.frame_cache.put(key, crop_frame(rgba))
+        
+        if self.prefetcher is not None and key is not None:
+            frames = prefetch_order(frame, len(self.track), direction, self.prefetch)
+            self.prefetcher.request(self.track.name, frames, key[2], self.fig.get_size_inches(), self.fig.dpi)
+        return frame
+    
+    def toggle_event_summary(self):
+        """Switch the profiles and information panel between the events known
+        at the shown fix and those of the whole track"""
+        self.event_summary = not self.event_summary
+        return self.show_frame(self.current_index)
+    
+    def step_frame(self, steps):
+        """Scrub steps fixes forward (or back when negative) from the shown one"""
+        self.stop_animation()
+        return self.show_frame(self.current_index + steps)
+    
+    def attach_live_feed(self, feed, catalog=None, interval_ms=None):
+        """Drain a started AdvisoryFeed into a LiveCatalog from a GUI timer"""
+        from live_ingest import DEFAULT_DRAIN_INTERVAL_MS, LiveCatalog
+        
+        interval_ms = interval_ms or DEFAULT_DRAIN_INTERVAL_MS
+        self.live_feed = feed
+        self.live_catalog = catalog if catalog is not None else LiveCatalog()
+        self.live_timer = self.fig.canvas.new_timer(interval=interval_ms)
+        self.live_timer.add_callback(self.poll_live_feed)
+        self.live_timer.start()
+        return self.live_catalog
+    
+    def poll_live_feed(self):
+        """Append queued advisories to their live tracks and show the new fixes
+        
+        The first live storm replaces the catalog view; afterwards only the
+        followed storm touches the figure, and only through its new fixes.
+        """
+        fixes = self.live_feed.drain()
+        if not fixes:
+            return {}
+        with self.profiler.span('live'):
+            grown = self.live_catalog.add(fixes)
+            self.profiler.count('live_fixes', len(fixes))
+            if not self.following_live():
+                if grown:
+                    self.show_live_track(self.live_catalog.tracks[next(iter(grown))])
+            elif self.track.name in grown:
+                self.refresh_live_track(grown[self.track.name])
+        return grown
+    
+    def following_live(self):
+        """Whether the current storm is a track of the live catalog"""
+        return self.live_catalog is not None and self.live_catalog.tracks.get(self.track.name) is self.track
+    
+    def show_live_track(self, track):
+        """Follow a LiveTrack, showing its latest fix"""
+        self.stop_animation()
+        self.overlay_layers = []
+        self.load_track(track, track)
+        self.update_visualization(len(track) - 1)
+        self.fig.canvas.draw_idle()
+    
+    def show_next_live_track(self):
+        """Follow the next storm of the live catalog"""
+        if not self.live_catalog:
+            return None
+        names = self.live_catalog.names
+        index = names.index(self.track.name) + 1 if self.following_live() else 0
+        track = self.live_catalog.tracks[names[index % len(names)]]
+        self.show_live_track(track)
+        return track
+    
+    def refresh_live_track(self, first):
+        """Show fixes first: just appended to the followed LiveTrack
+        
+        The persistent artists take the grown arrays and move to the newest
+        fix; nothing is rebuilt, and the limits are only refitted when a new
+        fix leaves the visible window. The time axis is refitted to twice the
+        track length, so refits become rarer as the storm ages. Kinematics
+        and level-of-detail importances are kept up to date by the LiveTrack
+        (see LiveTrack.extend); the event marks of the profiles follow the
+        newest fix like the other persistent artists.
+        """
+        self.bind_track_arrays(self.track)
+        self.bind_track_lod(self.track)
+        if self._fig is None:
+            return
+        frame = len(self.track) - 1
+        if self.render_mode == "blit" and self.artists:
+            self.bind_offsets()
+        
+        refit = not self.live_fixes_visible(first)
+        if refit:
+            limits = self.plot_limits()
+            limits["steps"] = (-0.5, 2 * len(self.track) - 0.5)
+            self.apply_plot_limits(limits)
+        
+        canvas = self.fig.canvas
+        if self.anim is not None:
+            # The running animation draws the new fixes with its next frame;
+            # a refit needs one full draw so that it caches the new background
+            if refit:
+                canvas.draw()
+        elif self.render_mode == "blit" and self.artists:
+            self.render_frame(frame)
+            canvas.blit(self.fig.bbox)
+        else:
+            self.update_visualization(frame)
+            canvas.draw_idle()
+    
+    def live_fixes_visible(self, first):
+        """Whether fixes first: of the current track lie inside every axes view"""
+        rows = slice(first, None)
+        
+        def within(values, limits):
+            values = values[~np.isnan(values)]
+            return bool(np.all((values >= min(limits)) & (values <= max(limits))))
+        
+        return (within(self.lngs[rows], self.ax_map.get_xlim())
+                and within(self.lats[rows], self.ax_map.get_ylim())
+                and within(self.pressures[rows], self.ax_3d.get_zlim())
+                and within(self.pressures[rows], self.ax_pressure.get_ylim())
+                and within(self.winds[rows], self.ax_wind.get_ylim())
+                and len(self.track) - 1 <= max(self.ax_pressure.get_xlim()))
+
+def parse_args(argv=None):
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='3D typhoon track visualization')
+    parser.add_argument('--catalog', help='best-track file (IBTrACS CSV, CMA or JTWC b-deck)')
+    parser.add_argument('--format', choices=sorted(best_track.PARSERS),
+                        help='catalog format (detected from the file when omitted)')
+    parser.add_argument('--no-cache', action='store_true', help='always re-parse the catalog')
+    parser.add_argument('--coastlines', metavar='FILE',
+                        help='Natural Earth-style coastline shapefile (.shp) or GeoJSON')
+    parser.add_argument('--near', nargs=2, type=float, metavar=('LAT', 'LNG'),
+                        help='only show storms passing near this point')
+    parser.add_argument('--radius', type=float, default=300, help='search radius for --near in km')
+    parser.add_argument('--start', help='earliest fix time for --near, e.g. 2000-01-01')
+    parser.add_argument('--end', help='latest fix time for --near, e.g. 2020-12-31')
+    parser.add_argument('--export', metavar='DIR',
+                        help='render headlessly into DIR instead of opening a window')
+    parser.add_argument('--storm', action='append',
+                        help='storm to export (repeatable, default: every storm)')
+    parser.add_argument('--export-format', choices=export.EXPORT_FORMATS, default='png',
+                        help='png frame sequence, gif or mp4 (mp4 needs ffmpeg)')
+    parser.add_argument('--workers', type=int, help='render processes (default: CPU count)')
+    parser.add_argument('--fps', type=float, default=4, help='frames per second of gif/mp4 output')
+    parser.add_argument('--dpi', type=float, help='export resolution')
+    parser.add_argument('--profile', metavar='FILE',
+                        help='write per-stage timings, counters and errors as JSON on exit')
+    parser.add_argument('--trace', metavar='FILE',
+                        help='write a Chrome trace (chrome://tracing, Perfetto) on exit')
+    parser.add_argument('--show-fps', action='store_true', help='show the FPS/latency overlay')
+    parser.add_argument('--raster', metavar='FILE', help='grids written by swath.py to show beneath the map')
+    parser.add_argument('--raster-field', default='density',
+                        help='field of --raster: max_wind, density, landfall or exceedance_<i>')
+    parser.add_argument('--season', nargs=2, metavar=('START', 'END'),
+                        help='play back every storm active between two dates on a global clock')
+    parser.add_argument('--step-minutes', type=int, help='clock step of --season playback (default: 60)')
+    parser.add_argument('--frame-cache', type=float, default=0, metavar='MB',
+                        help='memory for rendered frames used when scrubbing and switching storms '
+                             f'(e.g. {DEFAULT_CACHE_MB}; default 0 disables)')
+    parser.add_argument('--prefetch', type=int, default=0, metavar='N',
+                        help='with --frame-cache, render N frames ahead on a background thread '
+                             f'(e.g. {DEFAULT_PREFETCH}; experimental)')
+    parser.add_argument('--live-file', action='append', metavar='FILE',
+                        help='follow active storms from a growing advisory file (repeatable)')
+    parser.add_argument('--live-port', type=int, metavar='PORT',
+                        help='accept advisory lines on a local TCP port (0 picks a free port)')
+    return parser.parse_args(argv)
+
+def run_export(args, store):
+    """Headless batch export of the requested storms"""
+    if store is None:
+        store = TrackStore.from_typhoon_data(SAMPLE_TYPHOONS)
+    storms = args.storm or store.names
+    if args.near and not args.storm:
+        index = TrackIndex.for_store(store)
+        storms = [store.names[i] for i in index.storms_within(*args.near, args.radius, args.start, args.end)]
+    os.makedirs(args.export, exist_ok=True)
+    jobs = []
+    for storm in storms:
+        filename = "".join(c if c.isalnum() or c in "-_" else "_" for c in storm)
+        if args.export_format != 'png':
+            filename += '.' + args.export_format
+        jobs.append((storm, os.path.join(args.export, filename)))
+    
+    for output in export.export_storms(jobs, fmt=args.export_format, workers=args.workers,
+                                       catalog=args.catalog, catalog_format=args.format,
+                                       dpi=args.dpi, fps=args.fps, coastlines=args.coastlines,
+                                       use_cache=not args.no_cache):
+        print(f"Exported {output}")
 
-def main():
+def main(argv=None):
     """Main function to run the 3D typhoon tracker"""
+    import matplotlib.pyplot as plt
+    
+    args = parse_args(argv)
+    store = None
+    if args.catalog:
+        store = best_track.open_catalog(args.catalog, fmt=args.format, use_cache=not args.no_cache)
+    
+    if args.export:
+        plt.switch_backend('Agg')
+        run_export(args, store)
+        return
+    
     # Set matplotlib backend to avoid GUI issues
     plt.switch_backend('TkAgg')
     
-    tracker = TyphoonTracker3D()
+    tracker = TyphoonTracker3D(store=store, profile=bool(args.profile or args.trace),
+                               coastlines=args.coastlines)
+    tracker.set_fps_overlay(args.show_fps)
+    if args.frame_cache > 0:
+        tracker.enable_frame_cache(int(args.frame_cache * 2 ** 20), prefetch=args.prefetch,
+                                   background=args.prefetch > 0)
     
     # Create control buttons with better positioning
     button_y = 0.02
@@ -433,49 +1391,139 @@ def main():
     button_width = 0.12
     button_spacing = 0.13
     
-    ax_mangkhut = plt.axes([0.05, button_y, button_width, button_height])
-    btn_mangkhut = plt.Button(ax_mangkhut, 'Mangkhut')
-    btn_mangkhut.on_clicked(lambda x: tracker.change_typhoon("Mangkhut"))
+    # One button for each of the first three storms in the catalog
+    storm_buttons = []
+    for i, name in enumerate(tracker.store.names[:3]):
+        ax_storm = tracker.fig.add_axes([0.05 + i*button_spacing, button_y, button_width, button_height])
+        btn_storm = plt.Button(ax_storm, name)
+        btn_storm.on_clicked(lambda x, name=name: tracker.change_typhoon(name))
+        storm_buttons.append(btn_storm)
     
-    ax_haiyan = plt.axes([0.05 + button_spacing, button_y, button_width, button_height])
-    btn_haiyan = plt.Button(ax_haiyan, 'Haiyan')
-    btn_haiyan.on_clicked(lambda x: tracker.change_typhoon("Haiyan"))
-    
-    ax_yutu = plt.axes([0.05 + 2*button_spacing, button_y, button_width, button_height])
-    btn_yutu = plt.Button(ax_yutu, 'Yutu')
-    btn_yutu.on_clicked(lambda x: tracker.change_typhoon("Yutu"))
-    
-    ax_play = plt.axes([0.05 + 3*button_spacing, button_y, button_width, button_height])
+    ax_play = tracker.fig.add_axes([0.05 + 3*button_spacing, button_y, button_width, button_height])
     btn_play = plt.Button(ax_play, 'Play/Pause')
     btn_play.on_clicked(lambda x: tracker.toggle_animation())
     
-    ax_start = plt.axes([0.05 + 4*button_spacing, button_y, button_width, button_height])
+    ax_start = tracker.fig.add_axes([0.05 + 4*button_spacing, button_y, button_width, button_height])
     btn_start = plt.Button(ax_start, 'Start Animation')
     btn_start.on_clicked(lambda x: tracker.start_animation())
     
+    # The arrow keys scrub through the storm instead of the view history
+    for keymap, key in (('keymap.back', 'left'), ('keymap.forward', 'right')):
+        if key in plt.rcParams[keymap]:
+            plt.rcParams[keymap].remove(key)
+    
     # Add keyboard controls
     def on_key(event):
         if event.key == ' ':
             tracker.toggle_animation()
         elif event.key == 'r' or event.key == 'R':
             tracker.change_typhoon(tracker.current_typhoon)
+        elif event.key == 'o' or event.key == 'O':
+            tracker.show_overlay(tracker.store.names)
+        elif event.key in ('+', '='):
+            tracker.set_speed(tracker.speed + 1)
+        elif event.key in ('-', '_'):
+            tracker.set_speed(tracker.speed - 1)
+        elif event.key == 'F':
+            # Plain f is matplotlib's fullscreen key
+            tracker.set_fps_overlay(not tracker.show_fps)
+            tracker.fig.canvas.draw_idle()
+        elif event.key == 'w':
+            tracker.toggle_storm_swath()
+        elif event.key == 'e' and tracker.season_layer is None:
+            tracker.toggle_event_summary()
+        elif event.key == 'L':
+            # Plain l toggles matplotlib's log scale
+            tracker.show_next_live_track()
+        elif event.key == 'A' and tracker.season_layer is None:
+            matches = tracker.toggle_analogs()
+            if matches is not None:
+                print(f"Analogs of {tracker.track.name} after {tracker.current_index + 1} fixes:")
+                for name, distance in matches:
+                    print(f"  {name:<24} {distance:.3f}")
+        elif event.key == 'S':
+            # Plain s is matplotlib's save key
+            tracker.show_concurrent_storms()
+        elif event.key in ('left', 'right', 'shift+left', 'shift+right') and tracker.season_layer is None:
+            step = 10 if event.key.startswith('shift') else 1
+            tracker.step_frame(step if event.key.endswith('right') else -step)
+        elif event.key in ('[', ']') and tracker.clock is not None:
+            tracker.stop_animation()
+            tracker.seek_time(tracker.clock.now + (1 if event.key == ']' else -1) * tracker.clock.step)
     
     tracker.fig.canvas.mpl_connect('key_press_event', on_key)
     
     # Add instructions
-    tracker.fig.text(0.05, 0.97, "Controls: Space=Play/Pause, R=Reset", 
+    tracker.fig.text(0.05, 0.97, "Controls: Space=Play/Pause, R=Reset, +/-=Speed, O=Overlay all storms, Shift+F=FPS, W=Swath, Shift+S=Season, [/]=Step, Arrows=Scrub, Shift+A=Analogs, Shift+L=Live storms, E=Event summary", 
                     fontsize=10, style='italic')
     
     # Initial display
     tracker.update_visualization(0)
+    if args.near:
+        selected = tracker.show_storms_near(*args.near, args.radius, args.start, args.end)
+        print(f"{len(selected)} storms passed within {args.radius:.0f} km of {args.near[0]}, {args.near[1]}")
+    
+    if args.season:
+        from clock import storms_between
+        
+        storms = storms_between(tracker.store, *args.season)
+        if len(storms):
+            tracker.show_season(storms, *args.season, step_minutes=args.step_minutes)
+        print(f"{len(storms)} storms active between {args.season[0]} and {args.season[1]}")
+    
+    if args.raster:
+        from swath import SwathGrids
+        
+        grids = SwathGrids.load(args.raster)
+        tracker.show_raster(grids.field(args.raster_field), grids.grid)
+    
+    # Advisories of active storms; the first one received replaces the catalog view
+    feed = None
+    if args.live_file or args.live_port is not None:
+        from live_ingest import AdvisoryFeed
+        
+        feed = AdvisoryFeed()
+        for path in args.live_file or []:
+            feed.tail(path)
+        if args.live_port is not None:
+            feed.listen(port=args.live_port)
+        feed.start()
+        tracker.attach_live_feed(feed)
+        for host, port in feed.addresses:
+            print(f"Listening for advisories on {host}:{port}")
     
     print("3D Typhoon Tracker Started!")
     print("Controls:")
     print("- Press Space to play/pause animation")
     print("- Press R to reset animation")
+    print("- Press +/- to change playback speed")
+    print("- Press O to overlay every storm")
+    print("- Press Shift+F to toggle the FPS/latency overlay")
+    print("- Press W to toggle the wind swath of the current storm")
+    print("- Press Shift+S to play back every storm concurrent with the current one")
+    print("- Press [ / ] to step the season clock")
+    print("- Press Left/Right (Shift for 10 fixes) to scrub through the storm")
+    print("- Press Shift+A to overlay the most similar historical storms")
+    print("- Press E to switch between the events so far and those of the whole storm")
+    if feed is not None:
+        print("- Press Shift+L to follow the next live storm")
     print("- Use buttons to switch between typhoons")
     
     plt.show()
+    
+    tracker.disable_frame_cache()
+    if feed is not None:
+        feed.stop()
+        if feed.errors:
+            print(f"{len(feed.errors)} malformed advisory lines skipped")
+    if args.profile:
+        tracker.profiler.write_json(args.profile)
+        print(f"Profile written to {args.profile}")
+    if args.trace:
+        tracker.profiler.write_chrome_trace(args.trace)
+        print(f"Trace written to {args.trace}")
+    if tracker.profiler.errors:
+        print(f"{len(tracker.profiler.errors)} frame errors recorded")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,207 @@
+"""Collection-based rendering of many storms at once
+
+Each overlay layer draws all of its storms with one line collection and one
+scatter per axes, colored by intensity code, instead of one artist per fix.
+Tracks are split into runs of constant intensity, so a line collection holds
+one path per run rather than one per segment. A playback layer animates a
+set of storms on a global clock with the same one-collection-per-axes
+layout.
+"""
+import numpy as np
+from matplotlib.collections import LineCollection
+from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+from track_store import concat_ranges
+
+
+def storm_rows(store, indices):
+    """Row numbers of every fix of the given storms, in storm order"""
+    indices = np.asarray(indices, dtype=np.int64)
+    starts = store.offsets[indices]
+    lengths = store.offsets[indices + 1] - starts
+    rows = concat_ranges(starts, starts + lengths)
+    steps = rows - np.repeat(starts, lengths)
+    return rows, steps, lengths
+
+
+def intensity_runs(lengths, codes):
+    """Split concatenated storm tracks into runs of constant intensity
+
+    Returns (begin, end, code) arrays; a run that follows an intensity change
+    begins at the previous fix so the drawn track stays connected.
+    """
+    n = len(codes)
+    storm_start = np.zeros(n, dtype=bool)
+    storm_start[(np.cumsum(lengths) - lengths)[np.asarray(lengths) > 0]] = True
+    change = np.zeros(n, dtype=bool)
+    change[1:] = codes[1:] != codes[:-1]
+    change &= ~storm_start
+
+    run_start = np.flatnonzero(storm_start | change)
+    end = np.append(run_start[1:], n)
+    begin = run_start - change[run_start]
+    return begin, end, codes[run_start]
+
+
+def polylines(begin, end, *columns):
+    """Views of the concatenated columns, one (k, n_columns) array per run"""
+    points = np.column_stack(columns)
+    return [points[b:e] for b, e in zip(begin.tolist(), end.tolist())]
+
+
+class OverlayLayer:
+    """Storm tracks drawn with one collection per axes"""
+    def __init__(self, store, indices, color_table, ax_3d=None, ax_map=None,
+                 ax_pressure=None, ax_wind=None, linewidth=1.0, alpha=0.8, marker_size=6,
+                 zorder=2):
+        self.store = store
+        self.indices = np.asarray(indices, dtype=np.int64)
+        self.rows, self.steps, self.lengths = storm_rows(store, self.indices)
+        codes = store.intensity[self.rows]
+        begin, end, run_codes = intensity_runs(self.lengths, codes)
+
+        lat = store.lat[self.rows]
+        lng = store.lng[self.rows]
+        pressure = store.pressure[self.rows]
+        wind = store.wind[self.rows]
+
+        # One polyline per run of constant intensity keeps the path count low
+        colors = color_table[codes]
+        run_colors = color_table[run_codes]
+
+        self.lng = lng
+        self.lat = lat
+        self.pressure = pressure
+        self.artists = []
+        if ax_3d is not None:
+            lines = Line3DCollection(polylines(begin, end, lng, lat, pressure), colors=run_colors,
+                                     linewidths=linewidth, alpha=alpha, zorder=zorder)
+            ax_3d.add_collection3d(lines)
+            points = ax_3d.scatter(lng, lat, pressure, c=colors, s=marker_size, alpha=alpha,
+                                   depthshade=False, zorder=zorder)
+            self.artists += [lines, points]
+        if ax_map is not None:
+            lines = LineCollection(polylines(begin, end, lng, lat), colors=run_colors,
+                                   linewidths=linewidth, alpha=alpha, zorder=zorder)
+            ax_map.add_collection(lines, autolim=False)
+            points = ax_map.scatter(lng, lat, c=colors, s=marker_size, alpha=alpha, zorder=zorder)
+            self.artists += [lines, points]
+        for ax, values in ((ax_pressure, pressure), (ax_wind, wind)):
+            if ax is None:
+                continue
+            lines = LineCollection(polylines(begin, end, self.steps, values), colors=run_colors,
+                                   linewidths=linewidth, alpha=alpha, zorder=zorder)
+            ax.add_collection(lines, autolim=False)
+            self.artists.append(lines)
+
+    def __len__(self):
+        return len(self.indices)
+
+    @property
+    def n_fixes(self):
+        return len(self.rows)
+
+    def remove(self):
+        for artist in self.artists:
+            # Artists of a cleared axes are already detached
+            if artist.axes is not None:
+                artist.remove()
+        self.artists = []
+
+
+class PlaybackLayer:
+    """Trails and current positions of the storms of a StormTimeline
+
+    One collection per axes holds every trail; update() replaces their
+    segments with the fixes passed at the clock time plus the interpolated
+    head. Profiles are plotted against hours since the timeline origin, and
+    finished storms keep their whole track, faded.
+    """
+    def __init__(self, timeline, color_table, ax_3d, ax_map, ax_pressure, ax_wind, linewidth=2.0,
+                 marker_size=80, finished_color=(0.5, 0.5, 0.5, 0.35), zorder=3):
+        store = timeline.store
+        rows = timeline.rows
+        self.timeline = timeline
+        self.color_table = color_table
+        self.finished_color = finished_color
+        self.names = [store.names[i] for i in timeline.indices]
+        self.origin = np.datetime64(timeline.origin, "m")
+        self.ax_3d = ax_3d
+
+        self.columns = {
+            "3d": (store.lng[rows], store.lat[rows], store.pressure[rows]),
+            "map": (store.lng[rows], store.lat[rows]),
+        }
+        hours = (timeline.times - self.origin).astype(np.float64) / 60.0
+        self.columns["pressure"] = (hours, store.pressure[rows])
+        self.columns["wind"] = (hours, store.wind[rows])
+
+        style = {"linewidths": linewidth, "zorder": zorder}
+        self.trails = {"3d": Line3DCollection([], **style), "map": LineCollection([], **style),
+                       "pressure": LineCollection([], **style), "wind": LineCollection([], **style)}
+        # Already 3D, so a plain add_collection; the limits are fitted by the caller
+        for name, ax in (("3d", ax_3d), ("map", ax_map), ("pressure", ax_pressure), ("wind", ax_wind)):
+            ax.add_collection(self.trails[name], autolim=False)
+
+        empty = np.empty(0)
+        head = {"s": marker_size, "edgecolors": "white", "linewidth": 1.5, "zorder": zorder + 1}
+        self.head_3d = ax_3d.scatter(empty, empty, empty, depthshade=False, **head)
+        self.heads = {name: ax.scatter(empty, empty, **head)
+                      for name, ax in (("map", ax_map), ("pressure", ax_pressure), ("wind", ax_wind))}
+        self.labels = [ax_map.text(0, 0, name, fontsize=8, visible=False, zorder=zorder + 1)
+                       for name in self.names]
+        self.artists = list(self.trails.values()) + [self.head_3d] + list(self.heads.values()) + self.labels
+
+    def __len__(self):
+        return len(self.names)
+
+    def update(self, state):
+        """Move every artist to state, a TimelineState of the timeline"""
+        first = self.timeline.first
+        active = state.active
+        head_hours = (state.time - self.origin).astype(np.float64) / 60.0
+        heads = {
+            "3d": (state.lng, state.lat, state.pressure),
+            "map": (state.lng, state.lat),
+            "pressure": (np.full(len(active), head_hours), state.pressure),
+            "wind": (np.full(len(active), head_hours), state.wind),
+        }
+
+        # A handful of storms at a time: one slice per storm and axes
+        shown = np.flatnonzero(state.started)
+        for name, columns in self.columns.items():
+            segments = []
+            for i in shown:
+                stop = first[i] + state.index[i] + 1
+                trail = np.column_stack([column[first[i]:stop] for column in columns])
+                if active[i] and state.fraction[i] > 0:
+                    trail = np.vstack((trail, [values[i] for values in heads[name]]))
+                segments.append(trail)
+            self.trails[name].set_segments(segments)
+        colors = np.where(active[shown, None], self.color_table[state.intensity[shown]],
+                          np.asarray(self.finished_color))
+        for trail in self.trails.values():
+            trail.set_color(colors)
+
+        head_colors = self.color_table[state.intensity[active]]
+        self.head_3d._offsets3d = tuple(values[active] for values in heads["3d"])
+        self.head_3d.set_facecolor(head_colors)
+        for name, scatter in self.heads.items():
+            scatter.set_offsets(np.column_stack([values[active] for values in heads[name]]))
+            scatter.set_facecolor(head_colors)
+        for i, label in enumerate(self.labels):
+            label.set_visible(bool(active[i]))
+            if active[i]:
+                label.set_position((state.lng[i] + 0.5, state.lat[i] + 0.5))
+
+        if self.ax_3d.M is not None:
+            # Blitting skips Axes3D.draw, so project the moved artists here
+            self.trails["3d"].do_3d_projection()
+            self.head_3d.do_3d_projection()
+        return self.artists
+
+    def remove(self):
+        for artist in self.artists:
+            if artist.axes is not None:
+                artist.remove()
+        self.artists = []
@@ -0,0 +1,210 @@
+"""Spatial-temporal index over every fix of a TrackStore
+
+Fixes are bucketed into a regular lat/lng grid (rows sorted by cell key) and
+sorted by time. Bounding-box, radius and time-window queries only touch the
+candidate cells or the matching time slice, whichever is smaller, and finish
+with an exact vectorized filter.
+"""
+import numpy as np
+
+from interpolation import slerp_positions
+from kinematics import EARTH_RADIUS_KM, haversine_km
+from track_store import concat_ranges
+
+KM_PER_DEGREE = np.pi * EARTH_RADIUS_KM / 180.0
+
+DEFAULT_CELL_DEG = 2.0
+
+
+def _datetime(value):
+    return None if value is None else np.datetime64(value, "m")
+
+
+class ClosestApproach:
+    """Closest approach of each storm to a point, aligned with storm_index"""
+    def __init__(self, storm_index, distance_km, row, time):
+        self.storm_index = storm_index
+        self.distance_km = distance_km
+        self.row = row
+        self.time = time
+
+    def __len__(self):
+        return len(self.storm_index)
+
+    def order(self):
+        """Positions sorted from the closest storm to the farthest"""
+        return np.argsort(self.distance_km, kind="stable")
+
+
+class TrackIndex:
+    """Grid-bucket spatial index combined with a sorted time index"""
+    def __init__(self, store, cell_deg=DEFAULT_CELL_DEG):
+        self.store = store
+        self.cell_deg = float(cell_deg)
+        self.n_cols = int(np.ceil(360.0 / self.cell_deg))
+        self.n_rows = int(np.ceil(180.0 / self.cell_deg))
+
+        self.lat = store.lat.astype(np.float64)
+        self.lng = store.lng.astype(np.float64) % 360.0
+        self.times = store.time
+        self.storm_id = store.storm_ids()
+
+        # Rows grouped by grid cell
+        keys = self._cell_row(self.lat) * self.n_cols + self._cell_col(self.lng)
+        self.cell_order = np.argsort(keys, kind="stable")
+        self.cell_keys = keys[self.cell_order]
+
+        # Rows sorted by time
+        self.time_order = np.argsort(self.times, kind="stable")
+        self.sorted_times = self.times[self.time_order]
+
+    @classmethod
+    def for_store(cls, store, cell_deg=DEFAULT_CELL_DEG):
+        """Index of store, built once and cached alongside its arrays"""
+        index = store.derived.get("spatial_index")
+        if index is None or index.cell_deg != cell_deg:
+            index = store.derived["spatial_index"] = cls(store, cell_deg)
+        return index
+
+    def _cell_row(self, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90.0) / self.cell_deg), 0, self.n_rows - 1).astype(np.int64)
+
+    def _cell_col(self, lng):
+        return (np.floor((np.asarray(lng) % 360.0) / self.cell_deg).astype(np.int64)) % self.n_cols
+
+    def _cell_candidates(self, lat_min, lat_max, lng_min, lng_max):
+        """Rows in the grid cells overlapping a box; lng_min > lng_max wraps around 360"""
+        rows = np.arange(self._cell_row(lat_min), self._cell_row(lat_max) + 1)
+        span = lng_max - lng_min if lng_max >= lng_min else lng_max - lng_min + 360.0
+        if span >= 360.0:
+            cols = np.arange(self.n_cols)
+        else:
+            first = self._cell_col(lng_min)
+            count = (self._cell_col(lng_max) - first) % self.n_cols + 1
+            cols = (first + np.arange(count)) % self.n_cols
+        keys = (rows[:, None] * self.n_cols + cols[None, :]).ravel()
+        starts = np.searchsorted(self.cell_keys, keys, side="left")
+        stops = np.searchsorted(self.cell_keys, keys, side="right")
+        return starts, stops
+
+    def _time_slice(self, start, end):
+        lo = 0 if start is None else np.searchsorted(self.sorted_times, start, side="left")
+        hi = len(self.sorted_times) if end is None else np.searchsorted(self.sorted_times, end, side="right")
+        return lo, hi
+
+    def _candidates(self, lat_min, lat_max, lng_min, lng_max, start, end):
+        """Candidate rows from the cheaper of the spatial and temporal indexes"""
+        start, end = _datetime(start), _datetime(end)
+        starts, stops = self._cell_candidates(lat_min, lat_max, lng_min, lng_max)
+        if start is None and end is None:
+            return self.cell_order[concat_ranges(starts, stops)]
+
+        lo, hi = self._time_slice(start, end)
+        if hi - lo < np.sum(stops - starts):
+            # The time window is more selective; the caller filters by position
+            return self.time_order[lo:hi]
+        rows = self.cell_order[concat_ranges(starts, stops)]
+        times = self.times[rows]
+        keep = np.ones(len(rows), dtype=bool)
+        if start is not None:
+            keep &= times >= start
+        if end is not None:
+            keep &= times <= end
+        return rows[keep]
+
+    def time_window(self, start=None, end=None):
+        """Rows of every fix with start <= time <= end, in time order"""
+        lo, hi = self._time_slice(_datetime(start), _datetime(end))
+        return self.time_order[lo:hi]
+
+    def bbox(self, lat_min, lat_max, lng_min, lng_max, start=None, end=None):
+        """Rows of fixes inside a lat/lng box (lng_min > lng_max crosses 0°E)"""
+        rows = self._candidates(lat_min, lat_max, lng_min, lng_max, start, end)
+        lat = self.lat[rows]
+        lng = self.lng[rows]
+        lng_min, lng_max = lng_min % 360.0, lng_max % 360.0
+        if lng_min <= lng_max:
+            inside_lng = (lng >= lng_min) & (lng <= lng_max)
+        else:
+            inside_lng = (lng >= lng_min) | (lng <= lng_max)
+        return np.sort(rows[(lat >= lat_min) & (lat <= lat_max) & inside_lng])
+
+    def radius(self, lat, lng, radius_km, start=None, end=None):
+        """Rows of fixes within radius_km of (lat, lng)"""
+        d_lat = radius_km / KM_PER_DEGREE
+        lat_min, lat_max = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+        cos_lat = np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+        if cos_lat * 180.0 * KM_PER_DEGREE <= radius_km:
+            lng_min, lng_max = 0.0, 360.0
+        else:
+            d_lng = min(radius_km / (KM_PER_DEGREE * cos_lat), 180.0)
+            lng_min, lng_max = lng - d_lng, lng + d_lng
+        rows = self._candidates(lat_min, lat_max, lng_min, lng_max, start, end)
+        distance = haversine_km(lat, lng, self.lat[rows], self.lng[rows])
+        return np.sort(rows[distance <= radius_km])
+
+    def storms(self, rows):
+        """Unique storm indices of the given rows"""
+        return np.unique(self.storm_id[rows])
+
+    def storm_names(self, rows):
+        return [self.store.names[i] for i in self.storms(rows)]
+
+    def storms_within(self, lat, lng, radius_km, start=None, end=None):
+        """Storm indices with a fix within radius_km of a point in a time window"""
+        return self.storms(self.radius(lat, lng, radius_km, start, end))
+
+    def closest_approach(self, lat, lng, storms=None):
+        """Per-storm closest approach to (lat, lng), refined along track segments
+
+        The closest fix of each storm is found with one vectorized distance
+        pass; the segments on both sides of it are then checked in a local
+        tangent plane to catch a closer approach between fixes.
+        """
+        store = self.store
+        storms = np.arange(len(store)) if storms is None else np.asarray(storms, dtype=np.int64)
+        storms = storms[store.lengths[storms] > 0]
+        if len(storms) == 0:
+            return ClosestApproach(storms, np.empty(0), np.empty(0, dtype=np.int64),
+                                   np.empty(0, dtype="datetime64[m]"))
+        starts = store.offsets[storms]
+        stops = store.offsets[storms + 1]
+        rows = concat_ranges(starts, stops)
+        distance = haversine_km(lat, lng, self.lat[rows], self.lng[rows])
+
+        # Closest fix per storm: segmented minimum, then its first occurrence
+        lengths = stops - starts
+        first = np.cumsum(lengths) - lengths
+        best_distance = np.minimum.reduceat(distance, first)
+        hits = np.flatnonzero(distance == np.repeat(best_distance, lengths))
+        _, first_hit = np.unique(np.repeat(np.arange(len(storms)), lengths)[hits], return_index=True)
+        best = rows[hits[first_hit]]
+
+        # Refine on the segments before and after the closest fix
+        cos_lat = np.cos(np.radians(lat))
+        best_time = self.times[best].copy()
+        for neighbour in (best - 1, best + 1):
+            valid = (neighbour >= starts) & (neighbour < stops)
+            a, b = best[valid], neighbour[valid]
+            ax = (((self.lng[a] - lng + 180.0) % 360.0) - 180.0) * cos_lat * KM_PER_DEGREE
+            ay = (self.lat[a] - lat) * KM_PER_DEGREE
+            bx = (((self.lng[b] - lng + 180.0) % 360.0) - 180.0) * cos_lat * KM_PER_DEGREE
+            by = (self.lat[b] - lat) * KM_PER_DEGREE
+            dx, dy = bx - ax, by - ay
+            length2 = dx * dx + dy * dy
+            with np.errstate(invalid="ignore", divide="ignore"):
+                t = np.clip(np.where(length2 > 0, -(ax * dx + ay * dy) / length2, 0.0), 0.0, 1.0)
+            # Same metric as best_distance, so projection error never wins
+            along_lat, along_lng = slerp_positions(self.lat[a], self.lng[a], self.lat[b], self.lng[b], t)
+            along = haversine_km(lat, lng, along_lat, along_lng)
+            closer = along < best_distance[valid]
+            positions = np.flatnonzero(valid)[closer]
+            best_distance[positions] = along[closer]
+            # The time is interpolated only between two known fix times; with
+            # one of them missing the other one is taken
+            time_a, time_b = self.times[a][closer], self.times[b][closer]
+            dated = ~np.isnat(time_a) & ~np.isnat(time_b)
+            step = np.where(dated, (time_b - time_a).astype(np.int64), 0)
+            base = np.where(np.isnat(time_a), time_b, time_a)
+            best_time[positions] = base + np.round(step * t[closer]).astype(np.int64).astype("timedelta64[m]")
+        return ClosestApproach(storms, best_distance, best, best_time)
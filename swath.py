@@ -0,0 +1,501 @@
+"""Gridded wind swaths, track density and landfall frequency for whole catalogs
+
+Every storm is densified into sub-steps between its fixes. Around each
+sub-step a modified Rankine vortex spreads the sustained wind over a window
+of raster cells, and the footprint of a storm is the maximum over its
+sub-steps. From the per-storm footprints the catalog grids hold
+
+    max_wind    highest footprint wind of any storm (km/h)
+    exceedance  storms whose footprint reached each wind threshold
+    density     storms passing within density_radius_km of the cell centre
+    landfall    sea-to-land crossings of a land mask, by landing cell
+
+Storms are processed in chunks, optionally by a process pool; inside a chunk all
+sub-steps of a block are handled with one set of broadcast array
+operations, and (storm, cell) pairs are reduced by sorting instead of
+Python loops.
+
+Usage:
+    python swath.py --catalog ibtracs.WP.list.v04r00.csv --output wp.npz
+"""
+import argparse
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from interpolation import slerp_positions
+from kinematics import EARTH_RADIUS_KM, haversine_km
+from track_store import INTENSITY_WIND_THRESHOLDS, TrackStore, concat_ranges, storm_chunks
+
+FIELDS = ("max_wind", "exceedance", "density", "landfall")
+
+# Raster cell size in degrees
+DEFAULT_RESOLUTION = 0.25
+
+# Sub-steps per 6-hourly segment; hourly positions keep 0.25 degree swaths gap-free
+DEFAULT_SUBSTEPS = 6
+
+# Winds below tropical-storm force do not count towards a swath
+DEFAULT_MIN_WIND = float(INTENSITY_WIND_THRESHOLDS[0])
+
+# Tropical-storm and typhoon force
+DEFAULT_THRESHOLDS = (float(INTENSITY_WIND_THRESHOLDS[0]), float(INTENSITY_WIND_THRESHOLDS[2]))
+
+# Outer decay exponent of the modified Rankine vortex
+DECAY_EXPONENT = 0.5
+
+# Footprints never reach further than this from the centre
+MAX_RADIUS_KM = 600.0
+
+DEFAULT_DENSITY_RADIUS_KM = 100.0
+
+# Fixes per pool task; samples and window cells per vectorized block
+DEFAULT_CHUNK_FIXES = 20000
+BLOCK_SAMPLES = 4096
+BLOCK_CELLS = 4_000_000
+
+KM_PER_DEGREE = EARTH_RADIUS_KM * math.pi / 180
+
+_worker = None
+
+
+class Grid:
+    """Regular lat/lng raster; cell (i, j) is centred on (lat[i], lng[j])"""
+    def __init__(self, lng_min, lng_max, lat_min, lat_max, resolution=DEFAULT_RESOLUTION):
+        self.resolution = float(resolution)
+        self.lng_min = float(lng_min)
+        self.lat_min = float(lat_min)
+        self.nx = max(1, int(math.ceil((lng_max - lng_min) / self.resolution)))
+        self.ny = max(1, int(math.ceil((lat_max - lat_min) / self.resolution)))
+
+    @classmethod
+    def around(cls, lat, lng, resolution=DEFAULT_RESOLUTION, margin_km=MAX_RADIUS_KM):
+        """Grid covering the given positions plus a margin, snapped to the resolution"""
+        margin = margin_km / KM_PER_DEGREE
+        lat = np.asarray(lat, dtype=np.float64)
+        lng = np.asarray(lng, dtype=np.float64)
+        lat_min = max(np.nanmin(lat) - margin, -90.0)
+        lat_max = min(np.nanmax(lat) + margin, 90.0)
+        # Degrees of longitude widen towards the poles
+        lng_margin = margin / max(math.cos(math.radians(min(max(abs(lat_min), abs(lat_max)), 85.0))), 0.1)
+        lat_min = math.floor(lat_min / resolution) * resolution
+        lng_min = math.floor((np.nanmin(lng) - lng_margin) / resolution) * resolution
+        return cls(lng_min, np.nanmax(lng) + lng_margin, lat_min, lat_max, resolution)
+
+    @property
+    def shape(self):
+        return (self.ny, self.nx)
+
+    @property
+    def size(self):
+        return self.ny * self.nx
+
+    @property
+    def lat(self):
+        return self.lat_min + (np.arange(self.ny) + 0.5) * self.resolution
+
+    @property
+    def lng(self):
+        return self.lng_min + (np.arange(self.nx) + 0.5) * self.resolution
+
+    @property
+    def extent(self):
+        """(left, right, bottom, top) for imshow"""
+        return (self.lng_min, self.lng_min + self.nx * self.resolution,
+                self.lat_min, self.lat_min + self.ny * self.resolution)
+
+    def cell(self, lat, lng):
+        """Row and column of the cells holding the positions (possibly outside the grid)"""
+        lng = self.lng_min + (np.asarray(lng, dtype=np.float64) - self.lng_min) % 360.0
+        row = np.floor((np.asarray(lat, dtype=np.float64) - self.lat_min) / self.resolution).astype(np.int64)
+        col = np.floor((lng - self.lng_min) / self.resolution).astype(np.int64)
+        return row, col
+
+    def inside(self, row, col):
+        return (row >= 0) & (row < self.ny) & (col >= 0) & (col < self.nx)
+
+    def to_dict(self):
+        return {"lng_min": self.lng_min, "lat_min": self.lat_min, "nx": self.nx, "ny": self.ny,
+                "resolution": self.resolution}
+
+    @classmethod
+    def from_dict(cls, values):
+        resolution = float(values["resolution"])
+        lng_min, lat_min = float(values["lng_min"]), float(values["lat_min"])
+        return cls(lng_min, lng_min + int(values["nx"]) * resolution,
+                   lat_min, lat_min + int(values["ny"]) * resolution, resolution)
+
+
+def radius_of_max_wind_km(wind, lat):
+    """Radius of maximum wind from wind (km/h) and latitude, Willoughby et al. (2006)"""
+    return 46.4 * np.exp(-0.0155 * np.asarray(wind) / 3.6 + 0.0169 * np.abs(lat))
+
+
+def rankine_wind(distance_km, max_wind, rmw_km, exponent=DECAY_EXPONENT):
+    """Modified Rankine vortex: linear inside the radius of maximum wind, (rmw / r) ** exponent outside"""
+    ratio = np.asarray(distance_km) / rmw_km
+    with np.errstate(divide="ignore"):
+        return max_wind * np.where(ratio < 1.0, ratio, ratio ** -exponent)
+
+
+def land_mask(grid, geometry):
+    """Cells whose centre lies inside the rings of geometry (a CoastlineGeometry)
+
+    Only closed lines (polygon rings) count: open coastline linework has no
+    inside, so it is skipped. The rings are filled with the even-odd rule,
+    one scanline per grid row, with longitudes matched modulo 360. Crossings
+    are scattered into per-row toggles whose running parity marks the inside.
+    """
+    rings = geometry.closed()
+    starts, stops = geometry.offsets[:-1][rings], geometry.offsets[1:][rings]
+    rows = concat_ranges(starts, stops)
+    x, y = geometry.x[rows], geometry.y[rows]
+    offsets = np.append(0, np.cumsum(stops - starts))
+    if len(x) < 3:
+        return np.zeros(grid.shape, dtype=bool)
+    # Edges from each vertex to the next one of the same ring, wrapping around
+    following = np.arange(1, len(x) + 1)
+    lengths = np.diff(offsets)
+    ends = offsets[1:][lengths > 0] - 1
+    following[ends] = offsets[:-1][lengths > 0]
+    x0, y0, x1, y1 = x, y, x[following], y[following]
+
+    # Rows whose centre satisfies min(y0, y1) <= y < max(y0, y1)
+    low, high = np.minimum(y0, y1), np.maximum(y0, y1)
+    first_row = np.clip(np.ceil((low - grid.lat_min) / grid.resolution - 0.5), 0, grid.ny).astype(np.int64)
+    stop_row = np.clip(np.ceil((high - grid.lat_min) / grid.resolution - 0.5), 0, grid.ny).astype(np.int64)
+    crossings = stop_row - first_row
+    edge = np.repeat(np.arange(len(x)), np.maximum(crossings, 0))
+    row = concat_ranges(first_row, stop_row)
+    yc = grid.lat_min + (row + 0.5) * grid.resolution
+    xc = x0[edge] + (yc - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+
+    toggles = np.zeros((grid.ny, grid.nx + 1), dtype=np.int64)
+    for shift in (-360.0, 0.0, 360.0):
+        # A crossing at x flips every cell centred right of it
+        col = np.clip(np.ceil((xc + shift - grid.lng_min) / grid.resolution - 0.5), 0, grid.nx).astype(np.int64)
+        np.add.at(toggles, (row, col), 1)
+    return (np.cumsum(toggles[:, :-1], axis=1) % 2).astype(bool)
+
+
+def track_samples(store, first_storm, stop_storm, substeps=DEFAULT_SUBSTEPS):
+    """Sub-step samples of storms first_storm:stop_storm, in track order
+
+    Positions follow the great circle between fixes and wind is interpolated
+    linearly; the last fix of each storm closes its track. Missing winds
+    count as calm.
+    """
+    start, stop = int(store.offsets[first_storm]), int(store.offsets[stop_storm])
+    lengths = np.diff(store.offsets[first_storm:stop_storm + 1])
+    storm = np.repeat(np.arange(first_storm, stop_storm), lengths)
+    lat = np.asarray(store.lat[start:stop], dtype=np.float64)
+    lng = np.asarray(store.lng[start:stop], dtype=np.float64)
+    wind = np.nan_to_num(np.asarray(store.wind[start:stop], dtype=np.float64), nan=0.0)
+
+    # Fixes followed by a fix of the same storm start a segment of substeps samples
+    segment = np.zeros(len(lat), dtype=bool)
+    segment[:-1] = storm[1:] == storm[:-1]
+    counts = np.where(segment, substeps, 1)
+    row = np.repeat(np.arange(len(lat)), counts)
+    step = np.arange(len(row)) - np.repeat(np.cumsum(counts) - counts, counts)
+    fraction = step / substeps
+    following = np.where(segment[row], row + 1, row)
+
+    sample_lat, sample_lng = slerp_positions(lat[row], lng[row], lat[following], lng[following], fraction)
+    return {
+        "storm": storm[row],
+        "lat": sample_lat,
+        "lng": sample_lng,
+        "wind": wind[row] + (wind[following] - wind[row]) * fraction,
+    }
+
+
+def _max_by_key(keys, values):
+    """Unique keys and the maximum value of each"""
+    if len(keys) == 0:
+        return keys, values
+    order = np.argsort(keys, kind="stable")
+    keys, values = keys[order], values[order]
+    first = np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1])))
+    return keys[first], np.maximum.reduceat(values, first)
+
+
+def footprint_pairs(grid, samples, min_wind=DEFAULT_MIN_WIND, density_radius_km=DEFAULT_DENSITY_RADIUS_KM,
+                    exponent=DECAY_EXPONENT, max_radius_km=MAX_RADIUS_KM):
+    """Per-storm footprints of samples as (storm * cells + cell) keys
+
+    Returns the swath keys with their maximum wind and the unique density
+    keys. Samples are ordered by reach and processed in blocks, each spread
+    over a window of cells sized for the longest reach and highest latitude
+    in the block, so weak storms do not pay for the window of strong ones.
+    """
+    lat, lng, wind, storm = samples["lat"], samples["lng"], samples["wind"], samples["storm"]
+    rmw = radius_of_max_wind_km(wind, lat)
+    with np.errstate(divide="ignore"):
+        reach = np.where(wind > min_wind, rmw * (wind / min_wind) ** (1.0 / exponent), 0.0)
+    reach = np.maximum(np.minimum(reach, max_radius_km), density_radius_km)
+    if len(lat) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, np.empty(0), empty
+
+    cell_km = KM_PER_DEGREE * grid.resolution
+    order = np.argsort(reach, kind="stable")
+    row0, col0 = grid.cell(lat, lng)
+    swath_keys, swath_wind, density_keys = [], [], []
+    first = 0
+    while first < len(order):
+        # Window of the longest reach among the next samples; it only grows along the order
+        candidates = order[first:first + BLOCK_SAMPLES]
+        longest = reach[candidates[-1]]
+        half_rows = int(math.ceil(longest / cell_km))
+        poleward = min(float(np.abs(lat[candidates]).max()) + (half_rows + 1) * grid.resolution, 89.0)
+        half_cols = int(math.ceil(longest / (cell_km * math.cos(math.radians(poleward)))))
+        d_row = np.arange(-half_rows, half_rows + 1)[:, None]
+        d_col = np.arange(-half_cols, half_cols + 1)[None, :]
+        block = min(BLOCK_SAMPLES, max(1, BLOCK_CELLS // (d_row.size * d_col.size)))
+        part = order[first:first + block]
+        first += block
+
+        rows = row0[part, None, None] + d_row
+        cols = col0[part, None, None] + d_col
+        valid = grid.inside(rows, cols)
+        distance = haversine_km(lat[part, None, None], lng[part, None, None],
+                                grid.lat_min + (rows + 0.5) * grid.resolution,
+                                grid.lng_min + (cols + 0.5) * grid.resolution)
+        keys = storm[part, None, None] * grid.size + rows * grid.nx + cols
+
+        field = rankine_wind(distance, wind[part, None, None], rmw[part, None, None], exponent)
+        swath = valid & (field >= min_wind) & (distance <= max_radius_km)
+        keys_block, wind_block = _max_by_key(keys[swath], field[swath])
+        swath_keys.append(keys_block)
+        swath_wind.append(wind_block)
+        density_keys.append(np.unique(keys[valid & (distance <= density_radius_km)]))
+
+    swath_keys, swath_wind = _max_by_key(np.concatenate(swath_keys), np.concatenate(swath_wind))
+    return swath_keys, swath_wind, np.unique(np.concatenate(density_keys))
+
+
+def landfall_cells(grid, samples, land):
+    """Cells of the first land sample after sea, for every landfall in samples"""
+    row, col = grid.cell(samples["lat"], samples["lng"])
+    inside = grid.inside(row, col)
+    cell = np.where(inside, row * grid.nx + col, 0)
+    on_land = inside & land.ravel()[cell]
+    storm = samples["storm"]
+    landfall = on_land[1:] & ~on_land[:-1] & (storm[1:] == storm[:-1])
+    return cell[1:][landfall]
+
+
+def grid_storms(store, first_storm, stop_storm, grid, land=None, thresholds=DEFAULT_THRESHOLDS,
+                substeps=DEFAULT_SUBSTEPS, min_wind=DEFAULT_MIN_WIND,
+                density_radius_km=DEFAULT_DENSITY_RADIUS_KM):
+    """Flat partial grids of storms first_storm:stop_storm, combined by combine()"""
+    samples = track_samples(store, first_storm, stop_storm, substeps)
+    swath_keys, swath_wind, density_keys = footprint_pairs(grid, samples, min_wind, density_radius_km)
+    cells = swath_keys % grid.size
+
+    max_wind = np.zeros(grid.size, dtype=np.float32)
+    np.maximum.at(max_wind, cells, swath_wind)
+    exceedance = np.stack([np.bincount(cells[swath_wind >= threshold], minlength=grid.size)
+                           for threshold in thresholds]).astype(np.int32)
+    density = np.bincount(density_keys % grid.size, minlength=grid.size).astype(np.int32)
+    landfall = np.zeros(grid.size, dtype=np.int32)
+    if land is not None:
+        landfall = np.bincount(landfall_cells(grid, samples, land), minlength=grid.size).astype(np.int32)
+    return {"max_wind": max_wind, "exceedance": exceedance, "density": density, "landfall": landfall}
+
+
+def combine(total, part):
+    """Merge the partial grids of one chunk into total"""
+    if total is None:
+        return part
+    np.maximum(total["max_wind"], part["max_wind"], out=total["max_wind"])
+    for field in ("exceedance", "density", "landfall"):
+        total[field] += part[field]
+    return total
+
+
+class SwathGrids:
+    """Catalog grids of one gridding run, each shaped like the grid"""
+    def __init__(self, grid, max_wind, exceedance, density, landfall, thresholds, n_storms, years):
+        self.grid = grid
+        self.max_wind = np.asarray(max_wind).reshape(grid.shape)
+        self.exceedance = np.asarray(exceedance).reshape((len(thresholds),) + grid.shape)
+        self.density = np.asarray(density).reshape(grid.shape)
+        self.landfall = np.asarray(landfall).reshape(grid.shape)
+        self.thresholds = tuple(float(threshold) for threshold in thresholds)
+        self.n_storms = int(n_storms)
+        self.years = int(years)
+
+    def field(self, name, per_year=False):
+        """2D array of a field; exceedance fields are named exceedance_<threshold index>"""
+        if name.startswith("exceedance"):
+            values = self.exceedance[int(name.rpartition("_")[2] or 0)]
+        else:
+            values = getattr(self, name)
+        if per_year and name != "max_wind":
+            return values / max(self.years, 1)
+        return values
+
+    def save(self, path):
+        np.savez_compressed(path, max_wind=self.max_wind, exceedance=self.exceedance, density=self.density,
+                            landfall=self.landfall, thresholds=np.asarray(self.thresholds),
+                            n_storms=self.n_storms, years=self.years,
+                            **{f"grid_{key}": value for key, value in self.grid.to_dict().items()})
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            grid = Grid.from_dict({key[5:]: data[key] for key in data.files if key.startswith("grid_")})
+            return cls(grid, data["max_wind"], data["exceedance"], data["density"], data["landfall"],
+                       data["thresholds"], data["n_storms"], data["years"])
+
+
+def _init_worker(catalog, catalog_format, store, grid, land, options):
+    """Open the catalog (memory-mapped from its cache) once per worker process"""
+    global _worker
+    if store is None:
+        import best_track
+        store = best_track.open_catalog(catalog, fmt=catalog_format)
+    _worker = (store, grid, land, options)
+
+
+def _grid_chunk(first_storm, stop_storm):
+    store, grid, land, options = _worker
+    return grid_storms(store, first_storm, stop_storm, grid, land, **options)
+
+
+def catalog_years(store):
+    """Distinct calendar years with a fix"""
+    years = np.unique(store.time.astype("datetime64[Y]"))
+    return int(np.count_nonzero(~np.isnat(years)))
+
+
+def resolve_land(grid, land):
+    """Boolean land raster from None (builtin outlines), a coastline file, a geometry or an array"""
+    if land is None or isinstance(land, str):
+        from coastlines import builtin_geometry, read_coastlines
+        path = land
+        land = builtin_geometry(polygons=True) if path is None else read_coastlines(path, polygons=True)
+        if path is not None and len(land) == 0:
+            raise ValueError(f"{path} holds no polygons; a land mask needs land polygons, not coastline lines")
+    if hasattr(land, "offsets"):
+        land = land_mask(grid, land)
+    land = np.asarray(land, dtype=bool)
+    if land.shape != grid.shape:
+        raise ValueError(f"land mask shape {land.shape} does not match the grid {grid.shape}")
+    return land
+
+
+def grid_catalog(store=None, grid=None, land=None, catalog=None, catalog_format=None, workers=1,
+                 chunk_fixes=DEFAULT_CHUNK_FIXES, resolution=DEFAULT_RESOLUTION, thresholds=DEFAULT_THRESHOLDS,
+                 substeps=DEFAULT_SUBSTEPS, min_wind=DEFAULT_MIN_WIND,
+                 density_radius_km=DEFAULT_DENSITY_RADIUS_KM):
+    """Swath, density and landfall grids of a whole catalog
+
+    Pass either an in-memory store or a catalog path. By default the grids
+    are computed in this process. workers > 1 (None for every CPU) grids
+    storm chunks in a process pool, which only pays off for large catalogs:
+    every chunk sends back full-size grids. With a catalog path every worker
+    memory-maps the parsed cache instead of receiving the arrays.
+    """
+    if store is None:
+        import best_track
+        store = best_track.open_catalog(catalog, fmt=catalog_format)
+    if grid is None:
+        grid = Grid.around(store.lat, store.lng, resolution)
+    land = resolve_land(grid, land)
+    options = {"thresholds": thresholds, "substeps": substeps, "min_wind": min_wind,
+               "density_radius_km": density_radius_km}
+    chunks = storm_chunks(store.offsets, chunk_fixes)
+
+    total = None
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(chunks) <= 1:
+        for first, stop in chunks:
+            total = combine(total, grid_storms(store, first, stop, grid, land, **options))
+    else:
+        # Workers reopen a catalog themselves; an in-memory store is sent once per worker
+        shipped = None if catalog else TrackStore(store.names, store.offsets, store.lat, store.lng,
+                                                  store.pressure, store.wind, store.intensity, store.timestamp,
+                                                  store.time)
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), initializer=_init_worker,
+                                 initargs=(catalog, catalog_format, shipped, grid, land, options)) as pool:
+            for part in pool.map(_grid_chunk, *zip(*chunks)):
+                total = combine(total, part)
+    if total is None:
+        total = grid_storms(store, 0, 0, grid, land, **options)
+    return SwathGrids(grid, total["max_wind"], total["exceedance"], total["density"], total["landfall"],
+                      thresholds, len(store), catalog_years(store))
+
+
+def storm_swath(store, index, grid=None, resolution=DEFAULT_RESOLUTION, substeps=DEFAULT_SUBSTEPS,
+                min_wind=DEFAULT_MIN_WIND):
+    """Maximum footprint wind of one storm and its grid"""
+    track = store.storm(index)
+    if grid is None:
+        grid = Grid.around(track.lat, track.lng, resolution)
+    part = grid_storms(store, track.index, track.index + 1, grid, substeps=substeps, min_wind=min_wind)
+    return part["max_wind"].reshape(grid.shape), grid
+
+
+class RasterLayer:
+    """Grid values drawn with imshow beneath the tracks of a 2D map axes
+
+    Cells that are zero or NaN stay transparent. The image does not change
+    the axes limits, and is re-added by attach() after the axes are cleared.
+    """
+    def __init__(self, values, grid, cmap="YlOrRd", alpha=0.6, vmin=None, vmax=None, zorder=0, storm=None):
+        # Name of the storm a per-storm swath belongs to, None for catalog grids
+        self.storm = storm
+        values = np.asarray(values, dtype=np.float64)
+        self.values = np.ma.masked_invalid(np.where(values > 0, values, np.nan))
+        self.grid = grid
+        self.style = {"cmap": cmap, "alpha": alpha, "vmin": vmin, "vmax": vmax, "zorder": zorder}
+        self.image = None
+
+    def attach(self, ax):
+        """Add the image to ax, keeping its current limits"""
+        xlim, ylim = ax.get_xlim(), ax.get_ylim()
+        self.image = ax.imshow(self.values, extent=self.grid.extent, origin="lower", aspect="auto",
+                               interpolation="nearest", **self.style)
+        ax.set_xlim(xlim)
+        ax.set_ylim(ylim)
+        return self.image
+
+    def remove(self):
+        if self.image is not None and self.image.axes is not None:
+            self.image.remove()
+        self.image = None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Wind-swath, track-density and landfall grids of a catalog")
+    parser.add_argument("--catalog", help="best-track file (default: the sample storms)")
+    parser.add_argument("--format", help="catalog format (detected from the file when omitted)")
+    parser.add_argument("--land", metavar="FILE", help="land polygons (.shp or GeoJSON) for landfall counts")
+    parser.add_argument("--resolution", type=float, default=DEFAULT_RESOLUTION, help="cell size in degrees")
+    parser.add_argument("--substeps", type=int, default=DEFAULT_SUBSTEPS, help="samples per fix interval")
+    parser.add_argument("--density-radius", type=float, default=DEFAULT_DENSITY_RADIUS_KM,
+                        help="track-density search radius in km")
+    parser.add_argument("--workers", type=int, default=1, help="gridding processes (default: 1; 0 for every CPU)")
+    parser.add_argument("--output", default="swath.npz", help="output .npz path")
+    args = parser.parse_args(argv)
+
+    store = None
+    if not args.catalog:
+        from core import SAMPLE_TYPHOONS
+        store = TrackStore.from_typhoon_data(SAMPLE_TYPHOONS)
+    grids = grid_catalog(store, land=args.land, catalog=args.catalog, catalog_format=args.format,
+                         workers=args.workers or None, resolution=args.resolution, substeps=args.substeps,
+                         density_radius_km=args.density_radius)
+    grids.save(args.output)
+    print(f"{grids.n_storms} storms over {grids.years} years on a {grids.grid.ny} x {grids.grid.nx} grid, "
+          f"peak wind {grids.max_wind.max():.0f} km/h, {int(grids.landfall.sum())} landfalls")
+    print(f"Grids written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
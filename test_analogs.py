@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+import analogs
+from analogs import AnalogIndex, dtw_cost, lb_keogh, query_envelope
+from track_store import TrackStore, classify_wind
+
+
+def random_store(n_storms=200, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(4, 30, n_storms)
+    n = int(lengths.sum())
+    offsets = np.append(0, np.cumsum(lengths))
+    step = np.arange(n) - np.repeat(offsets[:-1], lengths)
+    # Random walks from random genesis points, 6-hourly with a few uneven steps
+    walk = np.cumsum(rng.normal(0.3, 0.5, n))
+    lat = np.repeat(rng.uniform(5, 25, n_storms), lengths) + walk - np.repeat(walk[offsets[:-1]], lengths)
+    lng = np.repeat(rng.uniform(120, 160, n_storms), lengths) - step
+    wind = rng.uniform(40, 200, n)
+    hours = 6 * step + rng.integers(0, 3, n) * (step > 0)
+    times = np.datetime64("2000-01-01T00:00") + hours.astype("timedelta64[h]")
+    return TrackStore(names=[f"S{i}" for i in range(n_storms)], offsets=offsets, lat=lat, lng=lng,
+                      pressure=1010.0 - wind / 2, wind=wind, intensity=classify_wind(wind),
+                      timestamp=np.array(np.datetime_as_string(times), dtype="S16"))
+
+
+def banded_dtw(a, b, window):
+    """Squared DTW cost of two equal-length sequences, one cell at a time"""
+    m = len(a)
+    cost = np.full((m + 1, m + 1), np.inf)
+    cost[0, 0] = 0.0
+    for i in range(1, m + 1):
+        for j in range(max(1, i - window), min(m, i + window) + 1):
+            step = float(((a[i - 1].astype(np.float64) - b[j - 1]) ** 2).sum())
+            cost[i, j] = step + min(cost[i - 1, j], cost[i, j - 1], cost[i - 1, j - 1])
+    return cost[m, m]
+
+
+def test_dtw_cost_and_lower_bound_match_reference():
+    rng = np.random.default_rng(1)
+    candidates = rng.normal(size=(20, 9, 4)).astype(np.float32)
+    query = rng.normal(size=(9, 4)).astype(np.float32)
+    expected = [banded_dtw(query, candidate, 2) for candidate in candidates]
+    np.testing.assert_allclose(dtw_cost(candidates, query, 2), expected, rtol=1e-5)
+    upper, lower = query_envelope(query, 2)
+    assert np.all(lb_keogh(candidates, upper, lower) <= np.array(expected) * (1 + 1e-5))
+
+
+@pytest.mark.parametrize("storm, fixes", [(0, 10), (7, 16), (42, 6)])
+def test_pruned_search_matches_brute_force(monkeypatch, storm, fixes):
+    # Small batches so that the threshold tightens between them
+    monkeypatch.setattr(analogs, "DTW_BATCH", 8)
+    store = random_store()
+    index = AnalogIndex(store)
+    matches = index.storm_analogs(storm, fixes, count=5)
+
+    track = store.storm(storm)
+    query = index.query_signature(track.lat[:fixes], track.lng[:fixes], track.pressure[:fixes],
+                                  track.wind[:fixes], track.time[:fixes])
+    m = len(query)
+    candidates = np.setdiff1d(np.flatnonzero(index.n_steps >= m), [storm])
+    cost = np.array([banded_dtw(query, index.signatures[i, :m], min(analogs.DEFAULT_WINDOW, m - 1))
+                     for i in candidates])
+    order = np.argsort(cost, kind="stable")[:5]
+
+    assert matches.compared < matches.candidates
+    np.testing.assert_array_equal(matches.indices, candidates[order])
+    np.testing.assert_allclose(matches.distances, np.sqrt(cost[order] / m), rtol=1e-5)
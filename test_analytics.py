@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+from analytics import RAPID_CHANGE_KMH, CatalogStats
+from track_store import TrackStore, classify_wind
+
+# Fix hours with an uneven 12- and 15-hour gap; 6h-18h intensify by 30 kt within 24 hours
+HOURS = [0, 6, 12, 18, 30, 33, 48, 54, 60]
+WIND = [50, 50, 55, 70, 120, 125, 130, 100, 60]
+
+
+def make_store(hours_per_storm, wind_per_storm):
+    hours = np.concatenate(hours_per_storm)
+    wind = np.concatenate(wind_per_storm).astype(np.float64)
+    times = np.datetime64("2018-09-07T00:00") + hours.astype("timedelta64[h]")
+    return TrackStore(names=[f"S{i}" for i in range(len(hours_per_storm))],
+                      offsets=np.append(0, np.cumsum([len(h) for h in hours_per_storm])),
+                      lat=np.linspace(10, 20, len(wind)), lng=np.linspace(140, 130, len(wind)),
+                      pressure=1010.0 - wind / 2, wind=wind, intensity=classify_wind(wind),
+                      timestamp=np.array(np.datetime_as_string(times), dtype="S16"))
+
+
+@pytest.fixture
+def stats():
+    # A steady storm after the test storm checks that windows stay within their storm
+    store = make_store([np.array(HOURS), np.arange(0, 48, 6)], [np.array(WIND), np.full(8, 200.0)])
+    return CatalogStats.compute(store, workers=1).storm(store.storm(0))
+
+
+def test_rapid_intensification_with_uneven_gap(stats):
+    hours = np.array(HOURS, dtype=np.float64)
+    inside = hours + 24 <= hours[-1]
+    expected = np.where(inside, np.interp(hours + 24, hours, WIND) - WIND, np.nan)
+    np.testing.assert_allclose(stats.wind_change_24h, expected)
+    past = np.where(hours >= 24, WIND - np.interp(hours - 24, hours, WIND), np.nan)
+    np.testing.assert_allclose(stats.wind_change_past_24h, past)
+
+    assert stats.rapid_intensification.tolist() == [False, True, True, True] + [False] * 5
+    assert not stats.rapid_weakening.any()
+    assert np.all(stats.wind_change_24h[1:4] >= RAPID_CHANGE_KMH)
+    # The window of the 18h fix ends at 42h, 9 of the 15 hours from 33h to 48h
+    assert stats.rapid_periods(stats.rapid_intensification) == [(1, pytest.approx(5.6))]
+    assert stats.ri_events == 1
+    assert stats.lmi_row == 6
+
+
+def test_events_known_during_playback(stats):
+    outliers = stats.event_marks()[3]
+
+    def shown(frame):
+        return [row for row in outliers if row <= frame]
+
+    # The 6h fix's window ends at the 30h fix; later windows end after 33h
+    assert stats.until(3).event_marks() == ([], [], 3, shown(3))
+    assert stats.until(4).event_marks() == ([(1, 4.0)], [], 4, shown(4))
+    assert stats.until(5).event_marks() == ([(1, 4.0)], [], 5, shown(5))
+    assert stats.until(6).event_marks() == ([(1, pytest.approx(5.6))], [], 6, shown(6))
+    assert stats.until(len(HOURS) - 1).event_marks() == stats.event_marks()
+
+    known = stats.until(4)
+    assert known.ri_events == 1
+    assert known.max_intensification == pytest.approx(70.0)
+    assert known.lmi_wind == 120.0
+    assert len(known.wind_change_24h) == 5
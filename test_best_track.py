@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+import best_track
+from track_store import INTENSITY_CODES
+
+IBTRACS = """SID,SEASON,NAME,ISO_TIME,LAT,LON,WMO_WIND,WMO_PRES,USA_WIND,USA_PRES
+ ,Year, ,yyyy-mm-dd hh:mm:ss,degrees_north,degrees_east,kts,mb,kts,mb
+2018250N12170,2018,MANGKHUT,2018-09-07 06:00:00,12.0,170.0,35,1000,,
+2018250N12170,2018,MANGKHUT,2018-09-07 12:00:00,12.5,168.5,,,60,985
+2018250N12170,2018,MANGKHUT,2018-09-07 18:00:00,13.0,167.0,,,,
+2018280N08170,2018,YUTU,2018-10-21 00:00:00,8.0,-170.0,25,1006,,
+"""
+
+CMA = """66666 0000 3 0022 0026 0 6 Mangkhut 20180916
+2018090706 1 120 1700 1000 18
+2018090712 4 125 1685 0 33
+2018090718 9 130 1670 985 0
+"""
+
+JTWC = """WP, 26, 2018090706,   , BEST,   0, 120N, 1700E,  35, 1000, TS,  34, NEQ,    0,    0,    0,    0, 1008,  150,  20,  45,   0,   L,   0,    ,   0,   0,    MANGKHUT
+WP, 26, 2018090706,   , BEST,   0, 120N, 1700E,  35, 1000, TS,  50, NEQ,    0,    0,    0,    0, 1008,  150,  20,  45,   0,   L,   0,    ,   0,   0,    MANGKHUT
+WP, 26, 2018090712,   , BEST,   0, 125N, 1685E,  65,    0, TY,  34, NEQ,    0,    0,    0,    0, 1008,  150,  20,  45,   0,   L,   0,    ,   0,   0,    MANGKHUT
+SH, 03, 2018091000,   , BEST,   0, 152S, 0755W,  30, 1002, TD,   0,    ,    0,    0,    0,    0, 1008,  150,  20,  45,   0,   L,   0,    ,   0,   0,    INVEST
+"""
+
+
+def write(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("name, text, fmt", [("ib.csv", IBTRACS, "ibtracs"), ("cma.txt", CMA, "cma"),
+                                             ("b.dat", JTWC, "jtwc")])
+def test_detect_format(tmp_path, name, text, fmt):
+    assert best_track.detect_format(write(tmp_path, name, text)) == fmt
+
+
+def test_parse_ibtracs(tmp_path):
+    store = best_track.parse_catalog(write(tmp_path, "ib.csv", IBTRACS))
+    assert store.names == ["Mangkhut (2018)", "Yutu (2018)"]
+    np.testing.assert_array_equal(store.offsets, [0, 3, 4])
+    # USA columns fill in for missing WMO values; nothing is missing as NaN
+    np.testing.assert_allclose(store.wind[:3], [35 * 1.852, 60 * 1.852, np.nan])
+    np.testing.assert_allclose(store.pressure[:3], [1000, 985, np.nan])
+    assert store.lng[3] == pytest.approx(190.0)
+    assert store.time[1] == np.datetime64("2018-09-07T12:00")
+
+
+def test_parse_cma_treats_zero_pressure_as_missing(tmp_path):
+    store = best_track.parse_catalog(write(tmp_path, "cma.txt", CMA))
+    assert store.names == ["Mangkhut"]
+    np.testing.assert_allclose(store.lat, [12.0, 12.5, 13.0])
+    np.testing.assert_allclose(store.pressure, [1000, np.nan, 985])
+    np.testing.assert_allclose(store.wind, [18 * 3.6, 33 * 3.6, 0.0], rtol=1e-6)
+    # Grades 1-6 map to the categories (grade 4 is TY)
+    assert store.intensity[0] == INTENSITY_CODES["TD"]
+    assert store.intensity[1] == INTENSITY_CODES["TY"]
+
+
+def test_parse_jtwc_treats_zero_mslp_as_missing(tmp_path):
+    store = best_track.parse_catalog(write(tmp_path, "b.dat", JTWC))
+    assert store.names == ["Mangkhut", "Invest"]
+    # The repeated wind-radii row of a fix is skipped
+    np.testing.assert_array_equal(store.offsets, [0, 2, 3])
+    np.testing.assert_allclose(store.pressure, [1000, np.nan, 1002])
+    np.testing.assert_allclose(store.lat, [12.0, 12.5, -15.2], rtol=1e-6)
+    np.testing.assert_allclose(store.lng, [170.0, 168.5, 284.5], rtol=1e-6)
+    assert not np.any(store.pressure <= 0)
+
+
+def test_cache_is_reused(tmp_path, monkeypatch):
+    path = write(tmp_path, "cma.txt", CMA)
+    first = best_track.open_catalog(path)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("catalog parsed again")
+
+    monkeypatch.setattr(best_track, "parse_catalog", fail)
+    second = best_track.open_catalog(path)
+    assert second.names == first.names
+    np.testing.assert_array_equal(second.pressure, first.pressure)
+
+
+def test_cache_is_rebuilt_for_a_new_cache_version(tmp_path, monkeypatch):
+    path = write(tmp_path, "cma.txt", CMA)
+    best_track.open_catalog(path)
+    parsed = []
+    parse = best_track.parse_catalog
+    monkeypatch.setattr(best_track, "parse_catalog", lambda *args: parsed.append(args) or parse(*args))
+    monkeypatch.setattr(best_track, "CACHE_VERSION", best_track.CACHE_VERSION + 1)
+    best_track.open_catalog(path)
+    assert len(parsed) == 1
+    best_track.open_catalog(path)
+    assert len(parsed) == 1
+
+
+def test_cache_is_rebuilt_when_the_source_changes(tmp_path):
+    path = write(tmp_path, "cma.txt", CMA)
+    assert len(best_track.open_catalog(path)) == 1
+    write(tmp_path, "cma.txt", CMA + CMA.replace("Mangkhut", "Barijat"))
+    store = best_track.open_catalog(path)
+    assert store.names == ["Mangkhut", "Barijat"]
+
+
+def test_no_cache_leaves_no_cache_directory(tmp_path):
+    path = write(tmp_path, "cma.txt", CMA)
+    best_track.open_catalog(path, use_cache=False)
+    assert not (tmp_path / "cma.txt.trackcache").exists()
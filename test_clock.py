@@ -0,0 +1,51 @@
+import numpy as np
+
+from clock import StormTimeline
+from track_store import TrackStore, classify_wind, elapsed_minutes, fill_missing_times
+
+
+def make_store(timestamps, lengths):
+    n = len(timestamps)
+    wind = np.linspace(50, 150, n)
+    return TrackStore(names=[f"S{i}" for i in range(len(lengths))], offsets=np.append(0, np.cumsum(lengths)),
+                      lat=np.linspace(10, 20, n), lng=np.linspace(120, 130, n),
+                      pressure=np.linspace(1000, 950, n), wind=wind, intensity=classify_wind(wind),
+                      timestamp=timestamps)
+
+
+def test_timeline_with_missing_fix_time():
+    store = make_store([b"2018-10-01T00:00", b"", b"2018-10-01T12:00"], [3])
+    timeline = StormTimeline(store, [0])
+    assert timeline.start == np.datetime64("2018-10-01T00:00")
+    assert timeline.end == np.datetime64("2018-10-01T12:00")
+    # The missing time takes the previous fix's time
+    assert timeline.times[1] == np.datetime64("2018-10-01T00:00")
+    state = timeline.state("2018-10-01T06:00")
+    assert state.started[0] and not state.finished[0]
+    assert state.index[0] == 1
+    assert np.isfinite(state.lat[0])
+
+
+def test_timeline_with_undated_storm():
+    store = make_store([b"", b"", b"2018-10-01T00:00", b"2018-10-01T06:00"], [2, 2])
+    timeline = StormTimeline(store, [0, 1])
+    assert timeline.start == np.datetime64("2018-10-01T00:00")
+    state = timeline.state(timeline.end)
+    assert not state.started[0]
+    assert state.started[1] and state.index[1] == 1
+
+
+def test_fill_missing_times():
+    time = np.array(["NaT", "2018-10-01T00:00", "NaT", "NaT", "2018-10-02T00:00"], dtype="datetime64[m]")
+    filled = fill_missing_times(time, [0, 3, 4, 5])
+    expected = np.array(["2018-10-01T00:00", "2018-10-01T00:00", "2018-10-01T00:00", "NaT",
+                         "2018-10-02T00:00"], dtype="datetime64[m]")
+    np.testing.assert_array_equal(filled, expected)
+
+
+def test_elapsed_minutes_with_missing_fix_time():
+    time = np.array(["2018-10-01T00:00", "NaT", "2018-10-01T12:00", "2018-10-01T00:00",
+                     "2018-10-01T06:00"], dtype="datetime64[m]")
+    elapsed, duration = elapsed_minutes(time, [0, 3, 5], 360)
+    np.testing.assert_array_equal(elapsed, [0, 360, 720, 0, 360])
+    np.testing.assert_array_equal(duration, [720, 360])
@@ -0,0 +1,31 @@
+import pytest
+
+import instrumentation
+from instrumentation import Profiler
+
+
+def test_frame_intervals_are_bounded(monkeypatch):
+    # The first reading is the trace origin
+    clock = iter([0.0, 0.1, 0.3, 0.4, 0.5, 1.5])
+    monkeypatch.setattr(instrumentation.time, "perf_counter", lambda: next(clock))
+    profiler = Profiler(enabled=True, max_frames=3)
+    for _ in range(5):
+        profiler.begin_frame()
+    assert len(profiler.frame_intervals) == 3
+    frames = profiler.summary()["frames"]
+    # Mean and maximum cover every frame, percentiles only the kept ones
+    assert frames["count"] == 5
+    assert frames["mean_ms"] == pytest.approx(350.0)
+    assert frames["max_ms"] == pytest.approx(1000.0)
+    assert frames["p50_ms"] == pytest.approx(100.0)
+
+
+def test_disabled_profiler_keeps_errors():
+    profiler = Profiler()
+    profiler.begin_frame()
+    try:
+        raise ValueError("bad frame")
+    except ValueError as error:
+        profiler.record_error("artists", error)
+    assert profiler.summary()["frames"]["fps"] is None
+    assert [(error["stage"], error["type"]) for error in profiler.errors] == [("artists", "ValueError")]
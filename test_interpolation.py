@@ -0,0 +1,36 @@
+import numpy as np
+
+from interpolation import TrackInterpolator
+
+
+def make_interpolator(times, substeps=4):
+    n = len(times)
+    return TrackInterpolator(np.linspace(10, 12, n), np.linspace(130, 128, n), np.linspace(1000, 980, n),
+                             np.linspace(60, 120, n), times=np.array(times, dtype="datetime64[m]"),
+                             substeps=substeps)
+
+
+def test_sample_times_with_missing_fix_time():
+    samples = list(make_interpolator(["2018-10-01T00:00", "NaT", "2018-10-01T12:00"]))
+    times = np.array([sample.time for sample in samples])
+    assert not np.isnat(times).any()
+    # The missing fix takes the previous time, so its segment stays at that time
+    assert times[0] == np.datetime64("2018-10-01T00:00")
+    assert np.all(times[:5] == np.datetime64("2018-10-01T00:00"))
+    assert times[6] == np.datetime64("2018-10-01T06:00")
+    assert times[-1] == np.datetime64("2018-10-01T12:00")
+    assert np.all(np.diff(times).astype(np.int64) >= 0)
+
+
+def test_undated_track_has_no_sample_times():
+    samples = list(make_interpolator(["NaT", "NaT"]))
+    assert len(samples) == 5
+    assert all(sample.time is None for sample in samples)
+
+
+def test_sample_count_and_fix_positions():
+    interpolator = make_interpolator(["2018-10-01T00:00", "2018-10-01T06:00", "2018-10-01T12:00"], substeps=3)
+    samples = list(interpolator)
+    assert len(samples) == len(interpolator) == 7
+    assert [sample.index for sample in samples if sample.fraction == 0] == [0, 1, 2]
+    np.testing.assert_allclose(samples[3].lat, 11.0, atol=1e-6)
@@ -0,0 +1,82 @@
+import numpy as np
+
+from kinematics import TrackKinematics
+from live_ingest import LOD_REFRESH_FRACTION, AdvisoryFeed, LiveTrack
+from lod import TrackLOD
+from track_store import TrackStore
+
+
+def advisory_lines(n, name="TEST"):
+    times = np.datetime64("2024-09-01T00:00") + np.arange(n) * np.timedelta64(6, "h")
+    return [f"{name},{np.datetime_as_string(time)},{10 + 0.3 * i:.1f},{140 - 0.5 * i:.1f},"
+            f"{1000 - i},{60 + 2 * i}," for i, time in enumerate(times)]
+
+
+def parsed(lines):
+    feed = AdvisoryFeed()
+    for line in lines:
+        feed.accept(line)
+    return feed.drain()
+
+
+def catalog_copy(track):
+    return TrackStore([track.name], track.offsets, track.lat.copy(), track.lng.copy(), track.pressure.copy(),
+                      track.wind.copy(), track.intensity.copy(), track.timestamp.copy())
+
+
+def test_extend_grows_capacity_and_keeps_kinematics():
+    fixes = parsed(advisory_lines(40))
+    track = LiveTrack("TEST", capacity=4)
+    for start in range(0, 40, 3):
+        assert track.extend(fixes[start:start + 3]) == start
+    assert len(track) == 40
+    assert track.capacity == 64
+    np.testing.assert_allclose(track.lat, [fix["lat"] for fix in fixes])
+    assert track.timestamp_text(39) == fixes[39]["timestamp"]
+
+    # Incremental kinematics match those of the whole track computed at once
+    expected = TrackKinematics.compute(catalog_copy(track))
+    motion = track.motion
+    for column in ("segment_km", "distance_km", "speed_kmh", "bearing", "direction"):
+        np.testing.assert_allclose(getattr(motion, column), getattr(expected, column))
+
+
+def test_bad_and_stale_advisories():
+    lines = advisory_lines(3)
+    feed = AdvisoryFeed()
+    for line in lines + ["TEST,2024-13-45T00:00,10,140,1000,60,", "TEST,yesterday,10,140,1000,60,",
+                         "TEST,2024-09-01T18:00,north,140,1000,60,", "TEST,2024-09-01T18:00", "# comment", ""]:
+        feed.accept(line, source="test")
+    assert [error["type"] for error in feed.errors] == ["ValueError"] * 4
+    assert all(error["source"] == "test" for error in feed.errors)
+    assert feed.lines == 9
+
+    track = LiveTrack("TEST")
+    fixes = feed.drain()
+    assert track.extend(fixes) == 0
+    # Repeated and out-of-order advisories are dropped
+    assert track.extend(fixes[1:]) is None
+    assert track.extend([fixes[0]] + parsed(advisory_lines(4)[3:])) == 3
+    assert len(track) == 4
+    assert track.dropped == 3
+
+
+def test_lod_refreshed_after_growth():
+    fixes = parsed(advisory_lines(60))
+    track = LiveTrack("TEST")
+    track.extend(fixes[:20])
+    computed = TrackLOD.for_store(track)
+    np.testing.assert_array_equal(computed.track, TrackLOD.compute(catalog_copy(track)).track)
+
+    # Appended fixes are kept at every level until the importances are recomputed
+    added = int(LOD_REFRESH_FRACTION * 20)
+    track.extend(fixes[20:20 + added])
+    extended = TrackLOD.for_store(track)
+    assert extended is not computed
+    np.testing.assert_array_equal(extended.track[:20], computed.track)
+    assert np.all(np.isinf(extended.track[20:]))
+
+    track.extend(fixes[20 + added:40])
+    assert "lod" not in track.derived
+    refreshed = TrackLOD.for_store(track)
+    np.testing.assert_array_equal(refreshed.wind, TrackLOD.compute(catalog_copy(track)).wind)
@@ -0,0 +1,62 @@
+import numpy as np
+
+from lod import TrackLOD, douglas_peucker_importance, forced_vertices
+from track_store import TrackStore, classify_wind
+
+TOLERANCES = [0.0, 0.01, 0.05, 0.2, 1.0, 5.0, np.inf]
+
+
+def random_store(n_storms=50, seed=0):
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(1, 60, n_storms)
+    n = int(lengths.sum())
+    wind = rng.uniform(30, 250, n)
+    times = np.datetime64("2000-01-01T00:00") + np.arange(n) * np.timedelta64(6, "h")
+    return TrackStore(names=[f"S{i}" for i in range(n_storms)], offsets=np.append(0, np.cumsum(lengths)),
+                      lat=np.cumsum(rng.normal(0.2, 0.4, n)), lng=np.cumsum(rng.normal(-0.5, 0.4, n)),
+                      pressure=1010.0 - wind / 2, wind=wind, intensity=classify_wind(wind),
+                      timestamp=np.array(np.datetime_as_string(times), dtype="S16"))
+
+
+def douglas_peucker(x, y, tolerance):
+    """Rows kept by the recursive Douglas-Peucker simplification of one line"""
+    keep = {0, len(x) - 1}
+    stack = [(0, len(x) - 1)]
+    while stack:
+        a, b = stack.pop()
+        if b - a < 2:
+            continue
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[a + 1:b] - x[a], y[a + 1:b] - y[a]
+        t = np.clip((px * dx + py * dy) / (dx * dx + dy * dy), 0.0, 1.0)
+        distance = np.hypot(px - t * dx, py - t * dy)
+        split = a + 1 + int(np.argmax(distance))
+        if distance.max() >= tolerance:
+            keep.add(split)
+            stack += [(a, split), (split, b)]
+    return sorted(keep)
+
+
+def test_levels_are_nested_and_keep_endpoints():
+    store = random_store()
+    lod = TrackLOD.compute(store)
+    lengths = np.diff(store.offsets)
+    endpoints = np.concatenate([store.offsets[:-1][lengths > 0], store.offsets[1:][lengths > 0] - 1])
+    for importance in (lod.track, lod.pressure, lod.wind):
+        finer = None
+        for tolerance in TOLERANCES:
+            rows = set(np.flatnonzero(importance >= tolerance).tolist())
+            assert rows.issuperset(endpoints.tolist())
+            if finer is not None:
+                assert rows <= finer
+            finer = rows
+
+
+def test_importance_matches_douglas_peucker():
+    rng = np.random.default_rng(1)
+    x, y = np.cumsum(rng.normal(size=(2, 80)), axis=1)
+    offsets = np.array([0, 80])
+    # Forcing only the endpoints leaves a plain Douglas-Peucker simplification
+    importance = douglas_peucker_importance(x, y, offsets, forced_vertices(np.zeros(80), offsets))
+    for tolerance in TOLERANCES[1:-1]:
+        assert np.flatnonzero(importance >= tolerance).tolist() == douglas_peucker(x, y, tolerance)
@@ -0,0 +1,70 @@
+import numpy as np
+
+from kinematics import haversine_km
+from spatial_index import TrackIndex
+from track_store import TrackStore, classify_wind
+
+
+def make_store(lat, lng, lengths, times):
+    wind = np.full(len(lat), 100.0)
+    return TrackStore(names=[f"S{i}" for i in range(len(lengths))], offsets=np.append(0, np.cumsum(lengths)),
+                      lat=lat, lng=lng, pressure=np.full(len(lat), 980.0), wind=wind,
+                      intensity=classify_wind(wind), timestamp=np.array(times, dtype="S16"))
+
+
+def random_store(n_storms=300, length=10, seed=0):
+    rng = np.random.default_rng(seed)
+    n = n_storms * length
+    times = (np.datetime64("2000-01-01T00:00") + rng.integers(0, 20 * 365 * 4, n) * np.timedelta64(6, "h"))
+    return make_store(rng.uniform(-89, 89, n), rng.uniform(-180, 360, n), [length] * n_storms,
+                      np.datetime_as_string(times))
+
+
+def test_radius_matches_brute_force():
+    store = random_store()
+    index = TrackIndex(store)
+    for lat, lng, radius, start, end in [(20, 130, 800, None, None), (-45, 179.5, 1500, None, None),
+                                         (75, 10, 2000, None, None), (88, -60, 500, None, None),
+                                         (0, 0, 3000, "2005-01-01", "2010-12-31")]:
+        expected = haversine_km(lat, lng, store.lat, store.lng) <= radius
+        if start is not None:
+            expected &= (store.time >= np.datetime64(start)) & (store.time <= np.datetime64(end))
+        np.testing.assert_array_equal(index.radius(lat, lng, radius, start, end), np.flatnonzero(expected))
+
+
+def test_bbox_matches_brute_force():
+    store = random_store(seed=1)
+    index = TrackIndex(store)
+    lng = store.lng % 360.0
+    for lat_min, lat_max, lng_min, lng_max in [(0, 30, 100, 160), (-60, 60, 350, 20), (-90, 90, 0, 360),
+                                               (10, 11, 179, 181)]:
+        lo, hi = lng_min % 360.0, lng_max % 360.0
+        inside = (lng >= lo) & (lng <= hi) if lo <= hi else (lng >= lo) | (lng <= hi)
+        expected = np.flatnonzero((store.lat >= lat_min) & (store.lat <= lat_max) & inside)
+        np.testing.assert_array_equal(index.bbox(lat_min, lat_max, lng_min, lng_max), expected)
+
+
+def test_closest_approach_between_fixes():
+    # The track crosses the point halfway between two fixes 12 hours apart
+    store = make_store([10.0, 10.0, 10.0], [128.0, 129.0, 131.0], [3],
+                       ["2018-10-01T00:00", "2018-10-01T06:00", "2018-10-01T18:00"])
+    approach = TrackIndex(store).closest_approach(10.0, 130.0)
+    assert approach.distance_km[0] < 1.0
+    assert approach.time[0] == np.datetime64("2018-10-01T12:00")
+
+
+def test_closest_approach_at_high_latitude_is_great_circle_distance():
+    store = make_store([58.0, 58.0], [120.0, 140.0], [2], ["2018-10-01T00:00", "2018-10-02T00:00"])
+    approach = TrackIndex(store).closest_approach(60.5, 130.0)
+    # Densely sampled great circle between the fixes
+    from interpolation import slerp_positions
+    lat, lng = slerp_positions(58.0, 120.0, 58.0, 140.0, np.linspace(0, 1, 20001))
+    true = haversine_km(60.5, 130.0, lat, lng).min()
+    assert true - 1e-3 <= approach.distance_km[0] <= true + 1.0
+
+
+def test_closest_approach_with_missing_fix_time():
+    store = make_store([10.0, 10.0], [129.0, 131.0], [2], ["2018-10-01T00:00", ""])
+    approach = TrackIndex(store).closest_approach(10.0, 130.0)
+    assert approach.distance_km[0] < 1.0
+    assert approach.time[0] == np.datetime64("2018-10-01T00:00")
@@ -0,0 +1,236 @@
+"""Columnar, array-backed storage for typhoon best-track data"""
+import os
+
+import numpy as np
+
+# Intensity categories from weakest to strongest; the position in this tuple
+# is the small integer code stored for every fix
+INTENSITY_LEVELS = ("TD", "TS", "STS", "TY", "STY", "SuperTY")
+INTENSITY_CODES = {level: code for code, level in enumerate(INTENSITY_LEVELS)}
+
+# Lower wind bounds (km/h) of TS, STS, TY, STY and SuperTY on the CMA scale
+INTENSITY_WIND_THRESHOLDS = np.array([61.9, 88.2, 117.7, 149.4, 183.6])
+
+# Column name -> dtype of the per-fix arrays
+TRACK_COLUMNS = {
+    "lat": np.float32,
+    "lng": np.float32,
+    "pressure": np.float32,
+    "wind": np.float32,
+    "intensity": np.int8,
+    "timestamp": "S16",
+}
+
+# Fix times parsed from the text timestamps, which are kept for display
+TIME_DTYPE = "datetime64[m]"
+
+
+def classify_wind(wind):
+    """Vectorized intensity code for sustained wind speeds in km/h"""
+    wind = np.nan_to_num(np.asarray(wind, dtype=np.float64), nan=0.0)
+    return np.searchsorted(INTENSITY_WIND_THRESHOLDS, wind, side="right").astype(np.int8)
+
+
+def parse_timestamps(timestamp):
+    """Vectorized 'YYYY-MM-DD HH:MM' text to datetime64[m]; empty text gives NaT"""
+    return np.asarray(timestamp, dtype=TRACK_COLUMNS["timestamp"]).astype(TIME_DTYPE)
+
+
+def concat_ranges(starts, stops):
+    """Concatenation of range(starts[i], stops[i]) for all i, without a Python loop"""
+    starts = np.asarray(starts, dtype=np.int64)
+    lengths = np.maximum(np.asarray(stops, dtype=np.int64) - starts, 0)
+    first = np.cumsum(lengths) - lengths
+    return np.arange(int(lengths.sum()), dtype=np.int64) + np.repeat(starts - first, lengths)
+
+
+def storm_chunks(offsets, chunk_fixes):
+    """(first, stop) storm ranges holding about chunk_fixes fixes each"""
+    n_storms = len(offsets) - 1
+    bounds = np.searchsorted(offsets, np.arange(0, offsets[-1], max(1, chunk_fixes)), side="right") - 1
+    bounds = np.unique(np.append(np.clip(bounds, 0, n_storms), n_storms))
+    return [(int(first), int(stop)) for first, stop in zip(bounds[:-1], bounds[1:]) if stop > first]
+
+
+def fill_missing_times(time, offsets):
+    """Copy of time with every missing fix time (NaT) replaced within its storm
+
+    A missing time takes the storm's previous valid time, or its next one at
+    the start of the storm. Storms without any valid time stay NaT.
+    """
+    time = np.asarray(time, dtype=TIME_DTYPE)
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    n_rows = len(time)
+    missing = np.isnat(time)
+    if not missing.any():
+        return time.copy()
+    position = np.arange(n_rows)
+    starts = np.repeat(offsets[:-1], lengths)
+    stops = np.repeat(offsets[1:], lengths)
+    previous = np.maximum.accumulate(np.where(missing, -1, position))
+    following = np.minimum.accumulate(np.where(missing, n_rows, position)[::-1])[::-1]
+    source = np.where(previous >= starts, previous, np.where(following < stops, following, position))
+    return time[source]
+
+
+def elapsed_minutes(time, offsets, step_minutes):
+    """Minutes since the first fix of its storm for every fix, and every storm's duration
+
+    time holds the concatenated fixes of the storms delimited by offsets
+    (starting at 0). Storms with a missing time are taken as evenly spaced
+    by step_minutes, and times never decrease within a storm.
+    """
+    offsets = np.asarray(offsets, dtype=np.int64)
+    lengths = np.diff(offsets)
+    starts = offsets[:-1]
+    n_storms = len(lengths)
+    n_rows = int(offsets[-1])
+    rank = np.repeat(np.arange(n_storms), lengths)
+    step = np.arange(n_rows) - np.repeat(starts, lengths)
+
+    missing = np.isnat(time)
+    minutes = np.where(missing, 0, time.astype(np.int64))
+    elapsed = minutes - np.repeat(minutes[np.minimum(starts, max(n_rows - 1, 0))], lengths)
+    undated = np.bincount(rank, weights=missing, minlength=n_storms) > 0
+    elapsed = np.where(undated[rank], step * step_minutes, np.maximum(elapsed, 0))
+    # A running maximum within each band keeps the times non-decreasing
+    span = int(elapsed.max(initial=0)) + 1
+    elapsed = np.maximum.accumulate(rank * span + elapsed) - rank * span if n_rows else elapsed
+    duration = np.zeros(n_storms, dtype=np.int64)
+    nonempty = lengths > 0
+    duration[nonempty] = elapsed[starts[nonempty] + lengths[nonempty] - 1]
+    return elapsed, duration
+
+
+class StormTrack:
+    """Zero-copy view of a single storm inside a TrackStore"""
+    def __init__(self, store, index):
+        start, stop = store.offsets[index], store.offsets[index + 1]
+        self.index = index
+        self.name = store.names[index]
+        self.start = int(start)
+        self.stop = int(stop)
+
+        # Basic slices of the catalog columns, no data is copied
+        self.lat = store.lat[start:stop]
+        self.lng = store.lng[start:stop]
+        self.pressure = store.pressure[start:stop]
+        self.wind = store.wind[start:stop]
+        self.intensity = store.intensity[start:stop]
+        self.timestamp = store.timestamp[start:stop]
+        self.time = store.time[start:stop]
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def intensity_level(self, i):
+        """Intensity category label of fix i"""
+        return INTENSITY_LEVELS[self.intensity[i]]
+
+    def timestamp_text(self, i):
+        """Timestamp of fix i as text"""
+        return self.timestamp[i].decode("ascii")
+
+
+class TrackStore:
+    """Catalog of storms held as one set of typed arrays plus an offset index
+
+    Fixes of storm i occupy rows offsets[i]:offsets[i + 1] of every column.
+    time holds the timestamps parsed once into datetime64; it is parsed here
+    when not given.
+    """
+    def __init__(self, names, offsets, lat, lng, pressure, wind, intensity, timestamp, time=None):
+        self.names = list(names)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.lat = np.asarray(lat, dtype=TRACK_COLUMNS["lat"])
+        self.lng = np.asarray(lng, dtype=TRACK_COLUMNS["lng"])
+        self.pressure = np.asarray(pressure, dtype=TRACK_COLUMNS["pressure"])
+        self.wind = np.asarray(wind, dtype=TRACK_COLUMNS["wind"])
+        self.intensity = np.asarray(intensity, dtype=TRACK_COLUMNS["intensity"])
+        self.timestamp = np.asarray(timestamp, dtype=TRACK_COLUMNS["timestamp"])
+        self.time = parse_timestamps(self.timestamp) if time is None else np.asarray(time, dtype=TIME_DTYPE)
+        self.name_index = {name: i for i, name in enumerate(self.names)}
+
+        # Lazily computed per-fix columns (kinematics, ...), keyed by name
+        self.derived = {}
+
+        if len(self.offsets) != len(self.names) + 1:
+            raise ValueError("offsets must have one entry more than names")
+        if self.offsets[-1] != len(self.lat):
+            raise ValueError("offsets do not cover the track columns")
+
+    @classmethod
+    def from_typhoon_data(cls, typhoon_data):
+        """Build a store from the {name: {"name", "points": [...]}} layout"""
+        names = []
+        lengths = []
+        points = []
+        for key, storm in typhoon_data.items():
+            names.append(storm.get("name", key))
+            lengths.append(len(storm["points"]))
+            points.extend(storm["points"])
+
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        return cls(
+            names, offsets,
+            lat=[point["lat"] for point in points],
+            lng=[point["lng"] for point in points],
+            pressure=[point["pressure"] for point in points],
+            wind=[point["wind"] for point in points],
+            intensity=[INTENSITY_CODES[point["intensity"]] for point in points],
+            timestamp=[point["timestamp"] for point in points],
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.name_index
+
+    @property
+    def n_fixes(self):
+        return int(self.offsets[-1])
+
+    @property
+    def lengths(self):
+        return np.diff(self.offsets)
+
+    @property
+    def nbytes(self):
+        """Memory held by the track columns and offset index"""
+        return (self.offsets.nbytes + self.time.nbytes
+                + sum(getattr(self, column).nbytes for column in TRACK_COLUMNS))
+
+    def storm(self, key):
+        """Return a zero-copy StormTrack by storm name or index"""
+        index = self.name_index[key] if isinstance(key, str) else int(key)
+        return StormTrack(self, index)
+
+    def storm_ids(self):
+        """Storm index of every fix"""
+        return np.repeat(np.arange(len(self.names)), self.lengths)
+
+    def save(self, directory):
+        """Write every column as a .npy file that can be memory-mapped"""
+        os.makedirs(directory, exist_ok=True)
+        np.save(os.path.join(directory, "names.npy"), np.array(self.names, dtype=str))
+        np.save(os.path.join(directory, "offsets.npy"), self.offsets)
+        for column in TRACK_COLUMNS:
+            np.save(os.path.join(directory, f"{column}.npy"), getattr(self, column))
+        np.save(os.path.join(directory, "time.npy"), self.time)
+
+    @classmethod
+    def load(cls, directory, mmap_mode="r"):
+        """Open a store written by save(); columns stay on disk when memory-mapped"""
+        names = np.load(os.path.join(directory, "names.npy")).tolist()
+        offsets = np.load(os.path.join(directory, "offsets.npy"))
+        columns = {
+            column: np.load(os.path.join(directory, f"{column}.npy"), mmap_mode=mmap_mode)
+            for column in TRACK_COLUMNS
+        }
+        # Stores saved before times were parsed get them parsed on load
+        time_path = os.path.join(directory, "time.npy")
+        time = np.load(time_path, mmap_mode=mmap_mode) if os.path.exists(time_path) else None
+        return cls(names, offsets, time=time, **columns)